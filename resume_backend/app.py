@@ -1,16 +1,31 @@
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, request, jsonify, send_file, redirect, Response, stream_with_context
 import os
-from werkzeug.utils import secure_filename
+import copy
 import resume_parser
+import local_parser
 import resume_analyzer
 import db
+import jobs
 from bson.objectid import ObjectId
-from openai import OpenAI
 from dotenv import load_dotenv
 import json
 from flasgger import Swagger, swag_from
 from flask_cors import CORS  # 导入CORS
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from llm_cache import llm_cache
+from llm_limiter import llm_limiter
+from singleflight import singleflight
+from hashing import content_hash, file_hash
+from storage import upload_storage
+from upload_stream import receive_upload, UploadError
+from http_cache import make_etag, not_modified, add_validators
+from pdf_cache import pdf_cache
+import llm_provider
+import prompt_budget
+import pdf_extract
+import extractors
+import pdf_export
 
 # 导入Swagger配置
 from swagger_config import swagger_config, swagger_template
@@ -23,11 +38,12 @@ from swagger_docs import (
     get_analysis_docs, 
     job_suggestions_docs, 
     compatibility_docs, 
-    health_check_docs
+    health_check_docs,
+    job_status_docs
 )
 
 # 导入PDF生成器
-from resume_pdf_generator import pdf_generator
+from resume_pdf_generator import pdf_generator, section_cache
 
 # Load environment variables
 load_dotenv()
@@ -39,7 +55,7 @@ CORS(app, resources={
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
-        "expose_headers": ["Content-Disposition"],
+        "expose_headers": ["Content-Disposition", "X-PDF-Pages", "X-PDF-Fit"],
         "supports_credentials": False
     }
 })
@@ -47,6 +63,13 @@ CORS(app, resources={
 app.config['UPLOAD_FOLDER'] = 'uploads/'
 app.config['ALLOWED_EXTENSIONS'] = {'pdf'}  # 只允许PDF文件
 
+# 上传文件大小上限；整个请求体另外留出表单字段和 multipart 分隔符的余量
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
+
+# 兼容接口的流水线模式：combined 一次 LLM 调用同时完成解析和分析，separate 为先解析再分析两次调用
+ONE_SHOT_PIPELINE = os.getenv("ONE_SHOT_PIPELINE", "combined")
+
 # 初始化Swagger
 swagger = Swagger(app, config=swagger_config, template=swagger_template)
 
@@ -69,28 +92,67 @@ def after_request(response):
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,X-Requested-With')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
-    response.headers.add('Access-Control-Expose-Headers', 'Content-Disposition')
+    response.headers.add('Access-Control-Expose-Headers', 'Content-Disposition,X-PDF-Pages,X-PDF-Fit')
     return response
 
 # Check MongoDB availability
 mongodb_available = db.mongodb_available
 
-# Configure OpenAI
-openai_client = None
-try:
-    # 使用兼容新版本的方式初始化OpenAI客户端
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        # 简化客户端初始化，仅使用api_key参数
-        openai_client = OpenAI(api_key=api_key)
-        print("OpenAI client initialized successfully")
-    else:
-        print("Warning: OPENAI_API_KEY not found in environment variables")
-except Exception as e:
-    print(f"Error initializing OpenAI client: {e}")
+# 删除上传文件前由数据库确认没有简历再引用它（多个实例共享对象存储时各实例的引用计数不完整）
+upload_storage.is_referenced = db.file_hash_referenced
+
+# Configure OpenAI - the pooled client is owned by llm_provider; this is only used for availability checks
+openai_client = llm_provider.openai_client
+
+def file_extension(filename):
+    """返回小写的文件扩展名（带点）"""
+    return os.path.splitext(filename)[1].lower()
+
+def reject_upload(upload, message, status_code=400):
+    """请求参数无效时释放已保存文件的引用并返回错误响应"""
+    upload_storage.release(upload['file_hash'], file_extension(upload['filename']))
+    return jsonify({'status': 'error', 'message': message}), status_code
+
+def analysis_unavailable(e, **data):
+    """LLM 提供方限流或暂时不可用时返回 503，并通过 Retry-After 告知客户端何时重试"""
+    body = {'status': 'error', 'message': str(e)}
+    if data:
+        body['data'] = data
+    response = jsonify(body)
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def resume_etag(resume):
+    """简历文档的 ETag：解析内容的哈希和处理状态"""
+    return make_etag('resume', resume.get('content_hash') or content_hash(resume.get('content')), resume.get('status'), resume.get('error'))
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
+def resume_last_modified(resume):
+    return resume.get('updated_at') or resume.get('upload_date')
+
+def add_fit_headers(response, fit_pages, pages):
+    """fit_pages 请求的结果：实际页数，以及缩到最小仍放不下时的提示"""
+    response.headers['X-PDF-Pages'] = str(pages)
+    response.headers['X-PDF-Fit'] = 'fits' if pages <= fit_pages else 'overflow'
+    return response
+
+def resume_content_hash(resume):
+    """简历内容的哈希，同时作为 PDF 缓存中这份内容所有变体的分组"""
+    return resume.get('content_hash') or content_hash(resume.get('content'))
+
+def generated_pdf_key(resume, fit_pages=None):
+    """生成的 PDF 的 ETag，同时作为 PDF 缓存的键：内容哈希 + 生成器版本和配置（+ 目标页数）"""
+    parts = ['pdf', resume_content_hash(resume), pdf_generator.version_key()]
+    if fit_pages:
+        parts.append(f"fit{fit_pages}")
+    return make_etag(*parts)
+
+@app.errorhandler(413)
+def request_entity_too_large(e):
+    """请求体超过 MAX_CONTENT_LENGTH"""
+    return jsonify({
+        'status': 'error',
+        'message': f'File exceeds the maximum upload size of {MAX_UPLOAD_BYTES} bytes'
+    }), 413
 
 # RESTful API Endpoints
 
@@ -99,29 +161,84 @@ def allowed_file(filename):
 @swag_from(upload_docs)
 def upload_file():
     """Upload a resume file, parse it, and store everything in one go"""
-    if 'file' not in request.files:
+    # 流式接收上传：分块写盘，同时计算哈希、检查 PDF 文件头和大小上限
+    # 文件按内容哈希存储在 uploads/ab/cd/<sha256>.pdf，同名文件不会互相覆盖
+    try:
+        form, upload = receive_upload(request, upload_storage, MAX_UPLOAD_BYTES, app.config['ALLOWED_EXTENSIONS'])
+    except UploadError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), e.status_code
+    
+    if upload is None:
         return jsonify({'status': 'error', 'message': 'No file part'}), 400
     
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({'status': 'error', 'message': 'No selected file'}), 400
+    filename = upload['filename']
+    upload_hash = upload['file_hash']
+    filepath = upload['filepath']
     
     # 检查user_id是否提供
-    user_id = request.form.get('user_id')
+    user_id = form.get('user_id')
     if not user_id:
-        return jsonify({'status': 'error', 'message': 'user_id is required'}), 400
+        return reject_upload(upload, 'user_id is required')
     
-    if file and allowed_file(file.filename):
+    # 解析模式：local / llm / auto
+    parser_mode = request.args.get('parser') or form.get('parser')
+    if parser_mode and parser_mode not in resume_parser.PARSER_MODES:
+        return reject_upload(upload, 'parser must be one of: local, llm, auto')
+    
+    if filename:
+        resume_id = None
         try:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            # 同一用户已经解析过相同文件时，直接复用首次解析的内容和对应的分析结果
+            # 显式指定解析模式时总是重新解析
+            duplicate = None
+            if not parser_mode:
+                duplicate = db.find_parsed_resume_by_hash(upload_hash, user_id, resume_parser.RESUME_PARSER_MODE)
+            if duplicate:
+                parsed_data = copy.deepcopy(duplicate['parsed_content'])
+                resume_id = db.save_resume(filename, filepath, user_id, parsed_data, file_hash=upload_hash,
+                                           parse_mode=duplicate['parse_mode'])
+                db.copy_analysis(duplicate['_id'], resume_id, duplicate['parsed_content_hash'])
+                
+                return jsonify({
+                    'status': 'success',
+                    'data': {
+                        'resume_id': str(resume_id),
+                        'filename': filename,
+                        'user_id': user_id,
+                        'file_type': 'pdf',
+                        'parsed_data': parsed_data,
+                        'dedup_hit': True
+                    },
+                    'meta': {'source_resume_id': str(duplicate['_id'])}
+                }), 201
             
-            # 立即使用OpenAI解析简历内容
-            parsed_data = resume_parser.parse_resume(filepath)
+            # 异步模式：先以queued状态保存，立即返回202，由后台任务解析
+            async_mode = request.args.get('async') or form.get('async') or ''
+            if async_mode.lower() in ('1', 'true', 'yes'):
+                resume_id = db.save_resume(filename, filepath, user_id, None, status='queued', file_hash=upload_hash)
+                job_id = jobs.enqueue_parse(resume_id, filepath, parser=parser_mode)
+                
+                return jsonify({
+                    'status': 'success',
+                    'data': {
+                        'resume_id': str(resume_id),
+                        'job_id': job_id,
+                        'filename': filename,
+                        'user_id': user_id,
+                        'file_type': 'pdf',
+                        'job_status': 'queued',
+                        'status_url': f'/api/v1/jobs/{job_id}'
+                    }
+                }), 202
+            
+            # 立即解析简历内容（auto 模式下格式规范的简历由本地解析器完成，不调用 LLM）
+            parse_meta = {}
+            parsed_data = resume_parser.parse_resume(filepath, meta=parse_meta, parser=parser_mode, file_hash=upload_hash)
             
-            # 一次性将所有数据存储到数据库
-            resume_id = db.save_resume(filename, filepath, user_id, parsed_data)
+            # 一次性将所有数据存储到数据库；可复用的解析结果同时保存为首次解析结果
+            reusable = resume_parser.is_reusable_parse(parsed_data, parse_meta)
+            resume_id = db.save_resume(filename, filepath, user_id, parsed_data, file_hash=upload_hash,
+                                       parse_mode=(parser_mode or resume_parser.RESUME_PARSER_MODE) if reusable else None)
             
             return jsonify({
                 'status': 'success',
@@ -130,16 +247,52 @@ def upload_file():
                     'filename': filename,
                     'user_id': user_id,
                     'file_type': 'pdf',
-                    'parsed_data': parsed_data  # 返回解析数据
-                }
+                    'parsed_data': parsed_data,  # 返回解析数据
+                    'dedup_hit': False
+                },
+                'meta': parse_meta
             }), 201
         except Exception as e:
+            # 没有简历记录引用这个文件时释放引用
+            if resume_id is None:
+                upload_storage.release(upload_hash, file_extension(filename))
             return jsonify({
                 'status': 'error', 
                 'message': f'Error during resume upload/parsing: {str(e)}'
             }), 500
     
-    return jsonify({'status': 'error', 'message': 'Only PDF files are allowed'}), 400
+    return jsonify({'status': 'error', 'message': 'No selected file'}), 400
+
+# Background job status - poll the result of an asynchronous upload
+@app.route('/api/v1/jobs/<job_id>', methods=['GET'])
+@swag_from(job_status_docs)
+def get_job_status(job_id):
+    """Get the status of a background parsing job"""
+    try:
+        job = db.get_job(job_id)
+        if not job:
+            return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+        
+        # 进程重启后不会再推进的任务在超时后报告为失败
+        job = jobs.expire_stale_job(job)
+        
+        job_data = {
+            'job_id': str(job['_id']),
+            'type': job.get('type'),
+            'resume_id': job.get('resume_id'),
+            'job_status': job.get('status'),
+            'created_at': job['created_at'].isoformat() if job.get('created_at') else None,
+            'updated_at': job['updated_at'].isoformat() if job.get('updated_at') else None
+        }
+        if job.get('error'):
+            job_data['error'] = job['error']
+        
+        return jsonify({
+            'status': 'success',
+            'data': job_data
+        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
 # Step 2: Parse Resume - For cases where content wasn't parsed during upload
 @app.route('/api/v1/resumes/<resume_id>/parse', methods=['POST'])
@@ -167,30 +320,57 @@ def parse_resume_api(resume_id):
                 }
             })
         
+        # Resume is still being parsed by a background job
+        if resume.get('status') in ('queued', 'parsing'):
+            return jsonify({
+                'status': 'success',
+                'data': {
+                    'resume_id': resume_id,
+                    'job_status': resume['status'],
+                    'message': 'Resume is being parsed in the background'
+                }
+            }), 202
+        
+        parser_mode = request.args.get('parser')
+        if parser_mode and parser_mode not in resume_parser.PARSER_MODES:
+            return jsonify({'status': 'error', 'message': 'parser must be one of: local, llm, auto'}), 400
+        
         # Resume needs parsing
         try:
             # Get file path
-            if 'filepath' in resume:
-                filepath = resume['filepath']
-            else:
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], resume['filename'])
+            filepath = upload_storage.resolve(resume, app.config['UPLOAD_FOLDER'])
+            if not filepath:
+                return jsonify({'status': 'error', 'message': 'Resume file not found'}), 404
             
-            # Parse resume content using OpenAI
-            parsed_data = resume_parser.parse_resume(filepath)
+            digest = resume.get('file_hash') or file_hash(filepath)
             
-            # Update the resume with parsed content
-            if mongodb_available:
-                db.update_resume_content(ObjectId(resume_id), parsed_data)
-            else:
-                db.update_resume_content(resume_id, parsed_data)
+            def run_parse():
+                # Parse resume content using OpenAI（提取的文本已保存时直接读取，重试只需要 LLM 调用）
+                parse_meta = {}
+                parsed_data = resume_parser.parse_resume(filepath, meta=parse_meta, parser=parser_mode, file_hash=digest)
+                
+                # Update the resume with parsed content
+                if mongodb_available:
+                    db.update_resume_content(ObjectId(resume_id), parsed_data)
+                else:
+                    db.update_resume_content(resume_id, parsed_data)
+                
+                return parsed_data, parse_meta
+            
+            # 同一文件的并发解析请求只执行一次
+            flight_key = ('parse', resume_id, digest, parser_mode)
+            (parsed_data, parse_meta), shared = singleflight.do(flight_key, run_parse)
+            if shared:
+                parse_meta = dict(parse_meta, coalesced=True)
             
             return jsonify({
                 'status': 'success',
                 'data': {
                     'resume_id': resume_id,
                     'content': parsed_data,
-                    'message': 'Resume parsed successfully using OpenAI'
-                }
+                    'message': 'Resume parsed successfully using OpenAI' if parse_meta.get('parser') == 'llm' else 'Resume parsed successfully'
+                },
+                'meta': parse_meta
             })
         except Exception as parse_error:
             return jsonify({
@@ -220,14 +400,30 @@ def analyze_resume_api(resume_id):
         if 'content' not in resume or not resume['content']:
             return jsonify({'status': 'error', 'message': 'Resume has not been parsed yet'}), 400
         
-        # Analyze resume
-        analysis = resume_analyzer.analyze_resume(resume['content'])
+        def run_analysis():
+            # Analyze resume
+            analysis_meta = {}
+            analysis = resume_analyzer.analyze_resume(resume['content'], meta=analysis_meta)
+            
+            # Save analysis to database - handle ObjectId based on MongoDB availability
+            provider_info = {
+                'provider': analysis_meta.get('provider'),
+                'latency_ms': analysis_meta.get('latency_ms'),
+                'hedged': analysis_meta.get('hedged'),
+                'analyzed_hash': content_hash(resume['content'])
+            }
+            if mongodb_available:
+                analysis_id = db.save_analysis(ObjectId(resume_id), analysis, **provider_info)
+            else:
+                analysis_id = db.save_analysis(resume_id, analysis, **provider_info)
+            
+            return analysis, analysis_id, analysis_meta
         
-        # Save analysis to database - handle ObjectId based on MongoDB availability
-        if mongodb_available:
-            analysis_id = db.save_analysis(ObjectId(resume_id), analysis)
-        else:
-            analysis_id = db.save_analysis(resume_id, analysis)
+        # 相同内容的并发分析请求共享同一次分析结果，只保存一条分析记录
+        flight_key = ('analyze', resume_id, content_hash(resume['content']))
+        (analysis, analysis_id, analysis_meta), shared = singleflight.do(flight_key, run_analysis)
+        if shared:
+            analysis_meta = dict(analysis_meta, coalesced=True)
         
         return jsonify({
             'status': 'success',
@@ -235,8 +431,11 @@ def analyze_resume_api(resume_id):
                 'resume_id': resume_id,
                 'analysis_id': str(analysis_id),
                 'analysis': analysis
-            }
+            },
+            'meta': analysis_meta
         })
+    except resume_analyzer.AnalysisUnavailable as e:
+        return analysis_unavailable(e)
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -286,13 +485,19 @@ def get_resume(resume_id):
             resume = db.get_resume(resume_id)
             
         if resume:
+            # 编辑器轮询时内容没有变化则返回 304
+            etag = resume_etag(resume)
+            cached = not_modified(request, etag, resume_last_modified(resume))
+            if cached:
+                return cached
+            
             # Convert ObjectId to string for JSON serialization if using MongoDB
             if mongodb_available and '_id' in resume:
                 resume['_id'] = str(resume['_id'])
-            return jsonify({
+            return add_validators(jsonify({
                 'status': 'success',
                 'data': resume
-            })
+            }), etag, resume_last_modified(resume))
         else:
             return jsonify({'status': 'error', 'message': 'Resume not found'}), 404
     except Exception as e:
@@ -311,16 +516,21 @@ def get_analysis(resume_id):
             analysis = db.get_analysis(resume_id)
             
         if analysis:
+            etag = make_etag('analysis', analysis.get('_id'), analysis.get('analysis_hash') or content_hash(analysis.get('analysis')))
+            cached = not_modified(request, etag, analysis.get('date'))
+            if cached:
+                return cached
+            
             # Convert ObjectId to string for JSON serialization if using MongoDB
             if mongodb_available:
                 if '_id' in analysis:
                     analysis['_id'] = str(analysis['_id'])
                 if 'resume_id' in analysis:
                     analysis['resume_id'] = str(analysis['resume_id'])
-            return jsonify({
+            return add_validators(jsonify({
                 'status': 'success',
                 'data': analysis
-            })
+            }), etag, analysis.get('date'))
         else:
             return jsonify({'status': 'error', 'message': 'Analysis not found'}), 404
     except Exception as e:
@@ -356,12 +566,13 @@ def get_job_suggestions(resume_id):
         # Check if OpenAI client is available
         if openai_client:
             try:
+                # 紧凑序列化并裁剪到token预算内
+                resume_prompt_str, _ = prompt_budget.build_resume_json(resume_content, 'job_suggestions')
+                
                 # Use OpenAI to generate job suggestions
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are a career advisor specializing in job recommendations."},
-                        {"role": "user", "content": f"""
+                messages = [
+                    {"role": "system", "content": "You are a career advisor specializing in job recommendations."},
+                    {"role": "user", "content": f"""
                         Based on the following parsed resume and its analysis, suggest 5 specific job positions 
                         that would be a good fit for this candidate. For each position, provide:
                         1. Job title
@@ -373,25 +584,38 @@ def get_job_suggestions(resume_id):
                         Format your response as a JSON array with these fields.
                         
                         Parsed Resume:
-                        {resume_content_str}
+                        {resume_prompt_str}
                         
                         Analysis:
                         {analysis_data}
                         """}
-                    ],
-                    temperature=0.2,
-                    response_format={"type": "json_object"}
-                )
+                ]
+                prompt_tokens = prompt_budget.count_message_tokens(messages)
+                
+                def run_suggestions():
+                    suggestions_json = llm_provider.complete(
+                        messages,
+                        model="gpt-4o-mini",
+                        json=True,
+                        temperature=0.2
+                    )
+                    
+                    # Parse the suggestions
+                    return json.loads(suggestions_json)
                 
-                # Parse the suggestions
-                suggestions_json = response.choices[0].message.content
-                suggestions = json.loads(suggestions_json)
+                # 相同内容的并发请求共享同一次LLM调用
+                flight_key = ('job_suggestions', resume_id, content_hash([resume_content, analysis_data]))
+                suggestions, shared = singleflight.do(flight_key, run_suggestions)
                 
                 return jsonify({
                     'status': 'success',
                     'data': {
                         'resume_id': resume_id,
                         'job_suggestions': suggestions
+                    },
+                    'meta': {
+                        'prompt_tokens': prompt_tokens,
+                        'coalesced': shared
                     }
                 })
                 
@@ -438,7 +662,14 @@ def health_check():
         'services': {
             'database': 'ok' if mongodb_available else 'using local storage',
             'openai': 'ok' if openai_client else 'unavailable'
-        }
+        },
+        'llm_cache': llm_cache.stats(),
+        'llm_limiter': llm_limiter.stats(),
+        'singleflight': singleflight.stats(),
+        'pdf_page_cache': pdf_extract.page_cache.stats(),
+        'extractors': extractors.stats(),
+        'pdf_cache': pdf_cache.stats(),
+        'pdf_section_cache': section_cache.stats()
     })
 
 # Compatibility API - Upload and analyze in a single request
@@ -446,41 +677,92 @@ def health_check():
 @swag_from(compatibility_docs)
 def upload_and_analyze_resume():
     """Legacy endpoint to upload and analyze a resume in one step"""
+    # 流式接收上传并按内容哈希保存文件（大小上限、PDF 文件头检查见 upload_stream）
     try:
-        # 检查上传文件
-        if 'file' not in request.files:
-            return jsonify({'status': 'error', 'message': 'No file part'}), 400
-        
-        file = request.files['file']
-        
-        # 检查user_id
-        user_id = request.form.get('user_id')
-        if not user_id:
-            return jsonify({'status': 'error', 'message': 'Missing user_id parameter'}), 400
-        
-        # 检查文件名和类型
-        if file.filename == '':
-            return jsonify({'status': 'error', 'message': 'No file selected'}), 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({'status': 'error', 'message': 'Only PDF files are allowed'}), 415
+        form, upload = receive_upload(request, upload_storage, MAX_UPLOAD_BYTES, app.config['ALLOWED_EXTENSIONS'])
+    except UploadError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), e.status_code
+    
+    if upload is None:
+        return jsonify({'status': 'error', 'message': 'No file part'}), 400
+    
+    filename = upload['filename']
+    upload_hash = upload['file_hash']
+    filepath = upload['filepath']
+    
+    # 检查user_id
+    user_id = form.get('user_id')
+    if not user_id:
+        return reject_upload(upload, 'Missing user_id parameter')
+    
+    explicit_parser = request.args.get('parser')
+    parser_mode = explicit_parser or resume_parser.RESUME_PARSER_MODE
+    if parser_mode not in resume_parser.PARSER_MODES:
+        return reject_upload(upload, 'parser must be one of: local, llm, auto')
+    
+    resume_id = None
+    try:
+        parsed_data = None
+        analysis = None
+        analysis_meta = {'pipeline': 'separate'}
         
-        # 确保上传目录存在
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        # 同一用户已经解析过相同文件时，直接复用首次解析的内容和对应的分析结果
+        # 显式指定解析模式时总是重新解析
+        duplicate = None
+        if not explicit_parser:
+            duplicate = db.find_parsed_resume_by_hash(upload_hash, user_id, parser_mode)
+        if duplicate:
+            parsed_data = copy.deepcopy(duplicate['parsed_content'])
+            source_analysis = db.get_analysis_for_content(duplicate['_id'], duplicate['parsed_content_hash'])
+            if source_analysis:
+                analysis = source_analysis['analysis']
+                analysis_meta = {
+                    'provider': source_analysis.get('provider'),
+                    'latency_ms': source_analysis.get('latency_ms'),
+                    'hedged': source_analysis.get('hedged')
+                }
+            analysis_meta.update({'dedup_hit': True, 'source_resume_id': str(duplicate['_id'])})
         
-        # 安全保存文件
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        # combined 模式：一次调用同时得到解析内容和分析结果，模型返回的 JSON 无法使用时退回两次调用
+        # 限流或提供方不可用（AnalysisUnavailable）不退回，直接返回 503
+        # auto 模式下本地解析足够可信时不再让 LLM 解析，只做分析
+        pipeline = request.args.get('pipeline', ONE_SHOT_PIPELINE)
+        if parsed_data is None and pipeline == 'combined' and parser_mode != 'local' and resume_analyzer.llm_available():
+            try:
+                resume_text = resume_parser.extract_text(filepath, file_hash=upload_hash)
+                local_data, confidence = local_parser.parse_resume_text(resume_text) if parser_mode == 'auto' else (None, 0)
+                if local_data is not None and confidence >= resume_parser.LOCAL_PARSER_MIN_CONFIDENCE:
+                    parsed_data = local_data
+                    analysis_meta.update({'parser': 'local', 'parser_confidence': confidence})
+                else:
+                    combined_meta = {'pipeline': 'combined', 'parser': 'llm'}
+                    parsed_data, analysis = resume_analyzer.parse_and_analyze(resume_text, meta=combined_meta)
+                    analysis_meta = combined_meta
+            except ValueError as e:
+                print(f"Combined parse+analyze failed, falling back to separate calls: {e}")
         
-        # 使用OpenAI解析简历
-        parsed_data = resume_parser.parse_resume(filepath)
+        # 解析简历
+        if parsed_data is None:
+            parse_meta = {}
+            parsed_data = resume_parser.parse_resume(filepath, meta=parse_meta, parser=parser_mode, file_hash=upload_hash)
+            analysis_meta['parser'] = parse_meta.get('parser')
+            if 'parser_confidence' in parse_meta:
+                analysis_meta['parser_confidence'] = parse_meta['parser_confidence']
         
-        # 一次性存储简历和解析内容
-        resume_id = db.save_resume(filename, filepath, user_id, parsed_data)
+        # 一次性存储简历和解析内容；可复用的解析结果同时保存为首次解析结果
+        reusable = duplicate is not None or resume_parser.is_reusable_parse(parsed_data, analysis_meta)
+        resume_id = db.save_resume(filename, filepath, user_id, parsed_data, file_hash=upload_hash,
+                                   parse_mode=parser_mode if reusable else None)
         
         # 分析简历
-        analysis = resume_analyzer.analyze_resume(parsed_data)
+        if analysis is None:
+            analysis = resume_analyzer.analyze_resume(parsed_data, meta=analysis_meta)
+        provider_info = {
+            'provider': analysis_meta.get('provider'),
+            'latency_ms': analysis_meta.get('latency_ms'),
+            'hedged': analysis_meta.get('hedged'),
+            'analyzed_hash': content_hash(parsed_data)
+        }
         
         # 保存分析结果
         if mongodb_available:
@@ -489,9 +771,9 @@ def upload_and_analyze_resume():
                 resume_id_obj = ObjectId(resume_id)
             else:
                 resume_id_obj = resume_id
-            analysis_id = db.save_analysis(resume_id_obj, analysis)
+            analysis_id = db.save_analysis(resume_id_obj, analysis, **provider_info)
         else:
-            analysis_id = db.save_analysis(resume_id, analysis)
+            analysis_id = db.save_analysis(resume_id, analysis, **provider_info)
         
         # 返回结果
         return jsonify({
@@ -499,10 +781,21 @@ def upload_and_analyze_resume():
             'data': {
                 'resume_id': str(resume_id),
                 'parsed_content': parsed_data,
-                'analysis': analysis
-            }
+                'analysis': analysis,
+                'dedup_hit': duplicate is not None
+            },
+            'meta': analysis_meta
         })
+    except resume_analyzer.AnalysisUnavailable as e:
+        # 简历已经保存时，客户端稍后可以通过 /analyze 接口重试分析
+        if resume_id is None:
+            upload_storage.release(upload_hash, file_extension(filename))
+            return analysis_unavailable(e)
+        return analysis_unavailable(e, resume_id=str(resume_id))
     except Exception as e:
+        # 没有简历记录引用这个文件时释放引用
+        if resume_id is None:
+            upload_storage.release(upload_hash, file_extension(filename))
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 def generate_mock_job_suggestions(resume_text):
@@ -674,9 +967,15 @@ def update_resume_content_api(resume_id):
         if not resume:
             return jsonify({'status': 'error', 'message': 'Resume not found'}), 404
             
+        # 旧内容生成的 PDF（包括各个 fit_pages 变体）不会再被请求，更新后从缓存中删除
+        stale_pdf_group = resume_content_hash(resume) if resume.get('content') else None
+        
         # Update the resume content
         result = db.update_resume_content(resume_id, content)
         
+        if result and stale_pdf_group:
+            pdf_cache.invalidate(stale_pdf_group)
+        
         if result:
             return jsonify({
                 'status': 'success',
@@ -718,31 +1017,43 @@ def download_resume_api(resume_id):
             
         print(f"Resume found in database: {resume}")
             
-        # Get the file path
-        if 'filepath' in resume and resume['filepath']:
-            # If filepath is relative, make it absolute
-            if not os.path.isabs(resume['filepath']):
-                filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), resume['filepath'])
-            else:
-                filepath = resume['filepath']
-            print(f"Using filepath from database: {filepath}")
-        else:
-            filepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), app.config['UPLOAD_FOLDER'], resume['filename'])
-            print(f"Using constructed filepath: {filepath}")
+        # 上传文件按内容寻址且不可变，文件哈希就是强 ETag
+        etag = resume.get('file_hash')
+        if etag:
+            cached = not_modified(request, etag, resume.get('upload_date'))
+            if cached:
+                return cached
+        
+        # 对象存储：返回预签名 URL，文件内容不经过 API
+        download_name = f"optimized_{resume['filename']}"
+        download_url = upload_storage.download_url(resume, download_name)
+        if download_url:
+            return redirect(download_url, code=302)
+        
+        # Get the file path (content-addressed storage, then legacy locations)
+        filepath = upload_storage.resolve(resume, app.config['UPLOAD_FOLDER'])
             
-        if not os.path.exists(filepath):
-            print(f"File not found at path: {filepath}")
+        if not filepath:
+            print(f"File not found for resume: {resume_id}")
             return jsonify({'status': 'error', 'message': 'Resume file not found'}), 404
             
         print(f"File exists at path: {filepath}")
         
         try:
-            return send_file(
+            # conditional=True 处理 If-None-Match / If-Modified-Since 和 Range 请求
+            # （按内容寻址的文件对同一份简历不会变化，按日期判断也不会返回过期内容）
+            response = send_file(
                 filepath,
                 as_attachment=True,
-                download_name=f"optimized_{resume['filename']}",
-                mimetype='application/pdf'
+                download_name=download_name,
+                mimetype='application/pdf',
+                conditional=True,
+                etag=etag or True,
+                last_modified=resume.get('upload_date')
             )
+            response.cache_control.no_cache = True
+            response.accept_ranges = 'bytes'
+            return response
         except Exception as e:
             print(f"Error sending file: {e}")
             return jsonify({'status': 'error', 'message': f'Error sending file: {str(e)}'}), 500
@@ -751,10 +1062,105 @@ def download_resume_api(resume_id):
         print(f"Unexpected error in download_resume_api: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def split_content_prefix(current_content):
+    """拆分内容的项目符号前缀（"- " 或 "• "），返回 (prefix, content_for_ai)"""
+    stripped = current_content.lstrip()
+    if stripped.startswith("- "):
+        return "- ", stripped[2:]
+    if stripped.startswith("• "):
+        return "• ", stripped[2:]
+    return "", current_content
+
+def build_optimize_messages(section_key, content_for_ai, job_title='', is_bullet=False):
+    """构建内容优化的提示消息"""
+    prompt_context = f"Job Target: {job_title}\n" if job_title else ""
+    
+    if is_bullet:
+        context = f"This is a bullet point in the {section_key} section of a resume."
+    else:
+        context = f"This is the {section_key} section of a resume."
+    
+    return [
+        {"role": "system", "content": "You are an expert resume writer with years of experience helping job seekers create compelling, ATS-friendly resumes. You excel at turning basic content into powerful, achievement-focused bullets that emphasize results and skills."},
+        {"role": "user", "content": f"""
+                        {prompt_context}
+                        {context}
+                        
+                        Original content:
+                        "{content_for_ai}"
+                        
+                        Please optimize this content to make it more impactful, professional, and ATS-friendly. Focus on:
+                        1. Using strong action verbs
+                        2. Quantifying achievements when possible
+                        3. Highlighting relevant skills
+                        4. Maintaining conciseness and clarity
+                        5. Making it keyword-rich for ATS systems
+                        
+                        DO NOT include any bullet point markers like "- " or "• " at the beginning of your response.
+                        Provide only the optimized content as your response, with no additional explanations.
+                        """}
+    ]
+
+def finalize_optimized_content(optimized_content, prefix):
+    """清理模型输出并还原原始前缀"""
+    optimized_content = optimized_content.strip()
+    
+    # 移除可能的引号
+    if optimized_content.startswith('"') and optimized_content.endswith('"'):
+        optimized_content = optimized_content[1:-1]
+    
+    # 移除AI可能添加的前缀
+    optimized_content = optimized_content.lstrip("- ").lstrip("• ")
+    
+    # 还原原始前缀
+    if prefix:
+        optimized_content = f"{prefix}{optimized_content}"
+    
+    return optimized_content
+
+def sse_event(event, data):
+    """格式化一条 Server-Sent Events 消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def wants_regenerate(data):
+    """请求是否要求重新生成（?regenerate=1 或请求体 "regenerate": true），此时跳过LLM缓存"""
+    if request.args.get('regenerate', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return isinstance(data, dict) and data.get('regenerate') is True
+
+def stream_optimized_content(messages, current_content, prefix, refresh=False):
+    """以SSE流式返回优化内容：逐个token推送，结束时推送清理后的完整文本"""
+    def generate():
+        parts = []
+        try:
+            for delta in llm_provider.stream(messages, model="gpt-4o-mini", temperature=0.3, refresh=refresh):
+                parts.append(delta)
+                yield sse_event('token', {'delta': delta})
+            
+            yield sse_event('done', {
+                'originalContent': current_content,
+                'optimizedContent': finalize_optimized_content(''.join(parts), prefix)
+            })
+        except Exception as openai_error:
+            yield sse_event('error', {'message': f'OpenAI API error: {str(openai_error)}'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'  # 禁止nginx缓冲，保证token及时送达
+        }
+    )
+
 # Add new API endpoint to optimize specific resume content
 @app.route('/api/v1/resumes/<resume_id>/optimize-content', methods=['POST'])
 def optimize_resume_content(resume_id):
-    """Optimize specific resume content (section or bullet point) using AI"""
+    """Optimize specific resume content (section or bullet point) using AI
+    
+    Pass ?stream=1 to receive the optimized text as Server-Sent Events, and
+    ?regenerate=1 (or "regenerate": true) to get a fresh rewrite instead of the cached one.
+    """
     try:
         # 获取请求数据
         data = request.json
@@ -771,77 +1177,35 @@ def optimize_resume_content(resume_id):
         current_content = data['currentContent']
         job_title = data.get('jobTitle', '')
         
-        # 检查原始内容的格式前缀
-        starts_with_dash = current_content.lstrip().startswith("- ")
-        starts_with_bullet = current_content.lstrip().startswith("• ")
-        
         # 保存原始前缀
-        prefix = ""
-        content_for_ai = current_content
-        
-        if starts_with_dash:
-            prefix = "- "
-            content_for_ai = current_content.lstrip()[2:]
-        elif starts_with_bullet:
-            prefix = "• "
-            content_for_ai = current_content.lstrip()[2:]
+        prefix, content_for_ai = split_content_prefix(current_content)
         
         # 构建提示词
-        prompt_context = f"Job Target: {job_title}\n" if job_title else ""
-        
-        if 'itemIndex' in data and data['itemIndex'] is not None:
-            context = f"This is a bullet point in the {section_key} section of a resume."
-        else:
-            context = f"This is the {section_key} section of a resume."
+        is_bullet = 'itemIndex' in data and data['itemIndex'] is not None
+        messages = build_optimize_messages(section_key, content_for_ai, job_title, is_bullet)
+        refresh = wants_regenerate(data)
         
         # 检查OpenAI客户端是否可用
         if openai_client:
+            # 流式模式
+            if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+                return stream_optimized_content(messages, current_content, prefix, refresh)
+            
             try:
                 # 使用OpenAI生成优化内容
-                response = openai_client.chat.completions.create(
+                optimized_content = llm_provider.complete(
+                    messages,
                     model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are an expert resume writer with years of experience helping job seekers create compelling, ATS-friendly resumes. You excel at turning basic content into powerful, achievement-focused bullets that emphasize results and skills."},
-                        {"role": "user", "content": f"""
-                        {prompt_context}
-                        {context}
-                        
-                        Original content:
-                        "{content_for_ai}"
-                        
-                        Please optimize this content to make it more impactful, professional, and ATS-friendly. Focus on:
-                        1. Using strong action verbs
-                        2. Quantifying achievements when possible
-                        3. Highlighting relevant skills
-                        4. Maintaining conciseness and clarity
-                        5. Making it keyword-rich for ATS systems
-                        
-                        DO NOT include any bullet point markers like "- " or "• " at the beginning of your response.
-                        Provide only the optimized content as your response, with no additional explanations.
-                        """}
-                    ],
+                    json=False,
                     temperature=0.3,
+                    refresh=refresh
                 )
                 
-                # 获取优化后的内容
-                optimized_content = response.choices[0].message.content.strip()
-                
-                # 移除可能的引号
-                if optimized_content.startswith('"') and optimized_content.endswith('"'):
-                    optimized_content = optimized_content[1:-1]
-                
-                # 移除AI可能添加的前缀
-                optimized_content = optimized_content.lstrip("- ").lstrip("• ")
-                
-                # 还原原始前缀
-                if prefix:
-                    optimized_content = f"{prefix}{optimized_content}"
-                
                 return jsonify({
                     'status': 'success',
                     'data': {
                         'originalContent': current_content,
-                        'optimizedContent': optimized_content
+                        'optimizedContent': finalize_optimized_content(optimized_content, prefix)
                     }
                 })
                 
@@ -859,17 +1223,180 @@ def optimize_resume_content(resume_id):
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+# 批量优化：每个分块的输入token预算和并发数
+OPTIMIZE_BATCH_TOKEN_BUDGET = int(os.getenv("OPTIMIZE_BATCH_TOKEN_BUDGET", "3000"))
+OPTIMIZE_BATCH_CONCURRENCY = int(os.getenv("OPTIMIZE_BATCH_CONCURRENCY", "4"))
+
+def chunk_batch_items(batch_items, token_budget):
+    """按token预算把待优化条目切分成多个分块"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for item in batch_items:
+        item_tokens = prompt_budget.count_tokens(item['content'])
+        if current and current_tokens + item_tokens > token_budget:
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(item)
+        current_tokens += item_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def optimize_batch_chunk(chunk, job_title='', refresh=False):
+    """在一次LLM调用中优化一个分块内的所有条目，返回 {index: 优化后文本}"""
+    prompt_context = f"Job Target: {job_title}\n" if job_title else ""
+    items_json = json.dumps(
+        [{'index': item['index'], 'section': item['section'], 'content': item['content']} for item in chunk],
+        ensure_ascii=False
+    )
+    
+    response_text = llm_provider.complete(
+        [
+            {"role": "system", "content": "You are an expert resume writer with years of experience helping job seekers create compelling, ATS-friendly resumes. You excel at turning basic content into powerful, achievement-focused bullets that emphasize results and skills."},
+            {"role": "user", "content": f"""
+                        {prompt_context}
+                        Below is a JSON array of resume items. Each item has an "index", the resume "section" it belongs to and its "content".
+                        
+                        Please optimize each item's content to make it more impactful, professional, and ATS-friendly. Focus on:
+                        1. Using strong action verbs
+                        2. Quantifying achievements when possible
+                        3. Highlighting relevant skills
+                        4. Maintaining conciseness and clarity
+                        5. Making it keyword-rich for ATS systems
+                        
+                        DO NOT include any bullet point markers like "- " or "• " at the beginning of the optimized content.
+                        Return ONLY a JSON object of the form {{"items": [{{"index": <index>, "optimizedContent": <string>}}]}} with one entry per input item.
+                        
+                        Items:
+                        {items_json}
+                        """}
+        ],
+        model="gpt-4o-mini",
+        json=True,
+        temperature=0.3,
+        refresh=refresh
+    )
+    
+    # 只接受本分块中存在的序号，模型返回的无效条目跳过（对应条目按遗漏处理）
+    expected = {item['index'] for item in chunk}
+    results = {}
+    entries = json.loads(response_text).get('items', [])
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict) or not isinstance(entry.get('optimizedContent'), str):
+            continue
+        try:
+            index = int(entry.get('index'))
+        except (TypeError, ValueError):
+            continue
+        if index in expected:
+            results[index] = entry['optimizedContent']
+    return results
+
+# Batch variant of optimize-content: rewrite many items in as few LLM round trips as possible
+@app.route('/api/v1/resumes/<resume_id>/optimize-content/batch', methods=['POST'])
+def optimize_resume_content_batch(resume_id):
+    """Optimize multiple resume items (sections or bullet points) in batched LLM calls"""
+    try:
+        data = request.json
+        if not data or not isinstance(data.get('items'), list) or not data['items']:
+            return jsonify({'status': 'error', 'message': 'items must be a non-empty list'}), 400
+        
+        job_title = data.get('jobTitle') or ''
+        if not isinstance(job_title, str):
+            return jsonify({'status': 'error', 'message': 'jobTitle must be a string'}), 400
+        
+        # 校验条目并拆分前缀
+        batch_items = []
+        for index, item in enumerate(data['items']):
+            if not isinstance(item, dict):
+                return jsonify({'status': 'error', 'message': f'Item {index} must be an object'}), 400
+            for field in ['sectionKey', 'currentContent']:
+                if field not in item:
+                    return jsonify({'status': 'error', 'message': f'Item {index} is missing required field: {field}'}), 400
+                if not isinstance(item[field], str):
+                    return jsonify({'status': 'error', 'message': f'Item {index} field {field} must be a string'}), 400
+            
+            prefix, content_for_ai = split_content_prefix(item['currentContent'])
+            batch_items.append({
+                'index': index,
+                'section': item['sectionKey'],
+                'item_index': item.get('itemIndex'),
+                'original': item['currentContent'],
+                'prefix': prefix,
+                'content': content_for_ai
+            })
+        
+        if not openai_client:
+            return jsonify({
+                'status': 'error',
+                'message': 'OpenAI client not available'
+            }), 500
+        
+        # 按token预算分块，并发调用
+        refresh = wants_regenerate(data)
+        chunks = chunk_batch_items(batch_items, OPTIMIZE_BATCH_TOKEN_BUDGET)
+        optimized = {}
+        errors = []
+        with ThreadPoolExecutor(max_workers=min(OPTIMIZE_BATCH_CONCURRENCY, len(chunks))) as executor:
+            futures = [executor.submit(optimize_batch_chunk, chunk, job_title, refresh) for chunk in chunks]
+            for future in futures:
+                try:
+                    optimized.update(future.result())
+                except Exception as openai_error:
+                    errors.append(f'OpenAI API error: {str(openai_error)}')
+        
+        if errors and not optimized:
+            return jsonify({'status': 'error', 'message': errors[0]}), 500
+        
+        # 按请求中的位置返回结果，模型遗漏的条目保留原文
+        results = {}
+        for item in batch_items:
+            result = {
+                'sectionKey': item['section'],
+                'itemIndex': item['item_index'],
+                'originalContent': item['original']
+            }
+            if item['index'] in optimized:
+                result['optimizedContent'] = finalize_optimized_content(optimized[item['index']], item['prefix'])
+            else:
+                result['optimizedContent'] = item['original']
+                result['error'] = 'No optimized content returned for this item'
+            results[str(item['index'])] = result
+        
+        response = {
+            'status': 'success',
+            'data': {
+                'resume_id': resume_id,
+                'items': results
+            },
+            'meta': {
+                'chunks': len(chunks)
+            }
+        }
+        if errors:
+            response['meta']['errors'] = errors
+        return jsonify(response)
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 @app.route('/api/v1/resumes/<resume_id>', methods=['DELETE'])
 def delete_resume(resume_id):
     """Delete a specific resume by ID"""
     try:
         # Handle ObjectId based on MongoDB availability
         if mongodb_available:
-            result = db.delete_resume(ObjectId(resume_id))
-        else:
-            result = db.delete_resume(resume_id)
+            resume_id = ObjectId(resume_id)
+        resume = db.get_resume(resume_id)
+        result = db.delete_resume(resume_id)
             
         if result:
+            # 释放该简历对上传文件的引用，没有其他简历引用时文件被删除
+            if resume and resume.get('file_hash'):
+                upload_storage.release(resume['file_hash'], file_extension(resume.get('filename', '')) or '.pdf')
+
             return jsonify({
                 'status': 'success',
                 'message': 'Resume deleted successfully'
@@ -908,20 +1435,47 @@ def generate_resume_pdf(resume_id):
             print(f"Resume content not parsed: {resume_id}")
             return jsonify({'status': 'error', 'message': 'Resume content not parsed'}), 400
             
-        # 使用PDF生成器生成PDF
+        # 可选：缩小间距和字号，把内容放进指定页数
+        fit_pages = request.args.get('fit_pages')
+        if fit_pages is not None:
+            if not fit_pages.isdigit() or int(fit_pages) < 1:
+                return jsonify({'status': 'error', 'message': 'fit_pages must be a positive integer'}), 400
+            fit_pages = int(fit_pages)
+        
+        # 内容和生成器都没有变化时直接返回 304，不重新生成
+        etag = generated_pdf_key(resume, fit_pages)
+        cached = not_modified(request, etag, resume_last_modified(resume))
+        if cached:
+            return cached
+        
+        # 使用PDF生成器生成PDF（相同内容和配置的 PDF 从缓存返回）
         try:
-            output_filename = f"resume_{str(resume_id)}.pdf"
-            pdf_path = pdf_generator.generate(resume['content'], output_filename)
+            pdf_group = resume_content_hash(resume)
+            cached_pdf = pdf_cache.read(pdf_group, etag)
+            if cached_pdf:
+                pdf_data, pages = cached_pdf
+                print(f"PDF served from cache ({len(pdf_data)} bytes)")
             
-            print(f"PDF generated successfully at: {pdf_path}")
+            def render():
+                # 在内存中生成，不写临时文件；写入缓存（连同页数）供后续请求直接读取
+                render_meta = {}
+                data = pdf_generator.generate_bytes(resume['content'], fit_pages=fit_pages, meta=render_meta)
+                pdf_cache.put_bytes(pdf_group, etag, data, pages=render_meta['pages'])
+                return data, render_meta['pages']
             
-            # 返回生成的PDF
-            return send_file(
-                pdf_path,
-                as_attachment=True,
-                download_name=f"resume_{str(resume_id)}.pdf",
-                mimetype='application/pdf'
-            )
+            if not cached_pdf:
+                # 同一内容的并发请求只生成一次
+                (pdf_data, pages), _ = singleflight.do(('pdf', etag), render)
+                print(f"PDF generated successfully ({len(pdf_data)} bytes)")
+            
+            # 直接返回生成的PDF（带 Content-Length，同样支持 Range 请求）
+            response = Response(pdf_data, mimetype='application/pdf')
+            response.headers['Content-Disposition'] = f'attachment; filename=resume_{str(resume_id)}.pdf'
+            add_validators(response, etag, resume_last_modified(resume))
+            response.accept_ranges = 'bytes'
+            if fit_pages:
+                add_fit_headers(response, fit_pages, pages)
+            return response.make_conditional(request, accept_ranges=True, complete_length=len(pdf_data))
         except Exception as e:
             print(f"Error generating PDF: {e}")
             return jsonify({'status': 'error', 'message': f'Error generating PDF: {str(e)}'}), 500
@@ -930,6 +1484,64 @@ def generate_resume_pdf(resume_id):
         print(f"Unexpected error in generate_resume_pdf: {e}")
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/v1/resumes/export', methods=['POST'])
+def export_resumes():
+    """Export several resumes as generated PDFs in one ZIP archive"""
+    try:
+        data = request.json
+        if not data or not isinstance(data.get('resume_ids'), list) or not data['resume_ids']:
+            return jsonify({'status': 'error', 'message': 'resume_ids must be a non-empty list'}), 400
+        
+        # 去重并保持请求中的顺序
+        resume_ids = list(dict.fromkeys(str(resume_id) for resume_id in data['resume_ids']))
+        if len(resume_ids) > pdf_export.PDF_EXPORT_MAX_RESUMES:
+            return jsonify({'status': 'error', 'message': f'At most {pdf_export.PDF_EXPORT_MAX_RESUMES} resumes can be exported at once'}), 400
+        
+        parallelism = data.get('parallelism')
+        if parallelism is not None and (not isinstance(parallelism, int) or parallelism < 1):
+            return jsonify({'status': 'error', 'message': 'parallelism must be a positive integer'}), 400
+        
+        # 先查出所有简历，缺失或未解析的简历直接报错，不生成不完整的 ZIP
+        items = []
+        missing = []
+        for resume_id in resume_ids:
+            lookup_id = resume_id
+            if mongodb_available:
+                try:
+                    lookup_id = ObjectId(resume_id)
+                except Exception:
+                    pass
+            resume = db.get_resume(lookup_id)
+            if not resume or not resume.get('content'):
+                missing.append(resume_id)
+                continue
+            items.append({
+                'resume_id': resume_id,
+                'filename': f"resume_{resume_id}.pdf",
+                'content': resume['content'],
+                'cache_group': resume_content_hash(resume),
+                'cache_key': generated_pdf_key(resume)
+            })
+        
+        if missing:
+            return jsonify({
+                'status': 'error',
+                'message': 'Some resumes were not found or not parsed',
+                'data': {'resume_ids': missing}
+            }), 404
+        
+        print(f"Exporting {len(items)} resumes as ZIP")
+        response = Response(
+            stream_with_context(pdf_export.export_zip(items, parallelism)),
+            mimetype='application/zip'
+        )
+        response.headers['Content-Disposition'] = 'attachment; filename=resumes.zip'
+        return response
+        
+    except Exception as e:
+        print(f"Unexpected error in export_resumes: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
 # Add a new endpoint to extract keywords from a resume for job matching
 @app.route('/api/v1/resumes/<resume_id>/extract-keywords', methods=['GET'])
 def extract_resume_keywords(resume_id):
@@ -956,12 +1568,13 @@ def extract_resume_keywords(resume_id):
         # Check if OpenAI client is available
         if openai_client:
             try:
+                # 紧凑序列化并裁剪到token预算内
+                resume_prompt_str, _ = prompt_budget.build_resume_json(resume_content, 'keywords')
+                
                 # Use OpenAI to extract keywords
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "You are an AI assistant that extracts relevant keywords from resumes for job matching."},
-                        {"role": "user", "content": f"""
+                messages = [
+                    {"role": "system", "content": "You are an AI assistant that extracts relevant keywords from resumes for job matching."},
+                    {"role": "user", "content": f"""
                         Extract relevant keywords from the following resume content that would be useful for job matching.
                         Focus on:
                         1. Technical skills (programming languages, tools, frameworks)
@@ -976,22 +1589,35 @@ def extract_resume_keywords(resume_id):
                         Do not include explanations or descriptions.
                         
                         Resume Content:
-                        {resume_content_str}
+                        {resume_prompt_str}
                         """}
-                    ],
-                    temperature=0.1,
-                    response_format={"type": "json_object"}
-                )
+                ]
+                prompt_tokens = prompt_budget.count_message_tokens(messages)
+                
+                def run_keywords():
+                    keywords_json = llm_provider.complete(
+                        messages,
+                        model="gpt-4o-mini",
+                        json=True,
+                        temperature=0.1
+                    )
+                    
+                    # Parse the keywords
+                    return json.loads(keywords_json)
                 
-                # Parse the keywords
-                keywords_json = response.choices[0].message.content
-                keywords_data = json.loads(keywords_json)
+                # 相同内容的并发请求共享同一次LLM调用
+                flight_key = ('keywords', resume_id, content_hash(resume_content))
+                keywords_data, shared = singleflight.do(flight_key, run_keywords)
                 
                 return jsonify({
                     'status': 'success',
                     'data': {
                         'resume_id': resume_id,
                         'keywords': keywords_data.get('keywords', [])
+                    },
+                    'meta': {
+                        'prompt_tokens': prompt_tokens,
+                        'coalesced': shared
                     }
                 })
                 
@@ -1083,18 +1709,13 @@ def get_resume_content_string(resume_id):
         # 如果OpenAI客户端可用，使用它来生成更好的内容字符串
         if openai_client:
             try:
-                # 将结构化JSON转换为字符串
-                if isinstance(resume_content, dict):
-                    resume_content_str = json.dumps(resume_content, indent=2)
-                else:
-                    resume_content_str = str(resume_content)
+                # 将结构化JSON紧凑序列化，并裁剪到token预算内
+                resume_content_str, _ = prompt_budget.build_resume_json(resume_content, 'content_string')
                 
                 # 使用OpenAI生成内容字符串
-                response = openai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": "你是一个简历内容提取器，你的任务是从简历JSON中提取出所有重要信息，形成一个完整的字符串，用于工作匹配。"},
-                        {"role": "user", "content": f"""
+                messages = [
+                    {"role": "system", "content": "你是一个简历内容提取器，你的任务是从简历JSON中提取出所有重要信息，形成一个完整的字符串，用于工作匹配。"},
+                    {"role": "user", "content": f"""
                         从以下简历内容中提取所有重要信息（工作经历、技能、教育背景、项目经验等），
                         将它们整合成一个单一的文本字符串，格式为：
                         
@@ -1105,18 +1726,27 @@ def get_resume_content_string(resume_id):
                         简历内容:
                         {resume_content_str}
                         """}
-                    ],
-                    temperature=0.1,
+                ]
+                prompt_tokens = prompt_budget.count_message_tokens(messages)
+                
+                content_string = llm_provider.complete(
+                    messages,
+                    model="gpt-4o-mini",
+                    json=False,
+                    temperature=0.1
                 )
                 
                 # 获取生成的内容字符串
-                content_string = response.choices[0].message.content.strip()
+                content_string = content_string.strip()
                 
                 return jsonify({
                     'status': 'success',
                     'data': {
                         'resume_id': resume_id,
                         'content_string': content_string
+                    },
+                    'meta': {
+                        'prompt_tokens': prompt_tokens
                     }
                 })
                 
@@ -1159,9 +1789,9 @@ def extract_basic_resume_string(resume_content):
     
     # 如果resume_content是字典类型
     if isinstance(resume_content, dict):
-        # 提取个人信息
-        if 'personal_info' in resume_content:
-            personal = resume_content.get('personal_info', {})
+        # 提取个人信息（LLM 解析结果为 personal_info，本地解析器为 personal_information）
+        personal = resume_content.get('personal_info') or resume_content.get('personal_information')
+        if personal:
             if isinstance(personal, dict):
                 name = personal.get('name', '')
                 title = personal.get('title', '')
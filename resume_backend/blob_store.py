@@ -0,0 +1,243 @@
+"""文件存储后端（blob store）
+
+上传文件和附属数据通过统一接口读写，存储位置由 STORAGE_BACKEND 决定：
+
+- local：保存在本机目录（默认，单实例部署）
+- s3：保存在 S3 兼容的对象存储（AWS S3、MinIO 等），多个后端实例共享同一份文件，
+  下载接口返回预签名 URL，文件内容不再经过 API。解析等需要本地文件的操作使用本机缓存目录，
+  缓存总大小超过 S3_CACHE_MAX_BYTES 时按最近最少使用淘汰（见 disk_lru）。
+
+s3 模式需要安装 boto3；访问密钥按 boto3 的常规方式读取（AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY 等）。
+"""
+import os
+import shutil
+import tempfile
+from dotenv import load_dotenv
+
+import disk_lru
+
+# 加载环境变量
+load_dotenv()
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO 等 S3 兼容服务的地址
+S3_REGION = os.getenv("S3_REGION")
+# s3 模式本机缓存目录的总大小上限，<=0 表示不限制
+S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# 预签名下载链接的有效期（秒）
+PRESIGNED_URL_EXPIRES = int(os.getenv("PRESIGNED_URL_EXPIRES", "300"))
+
+# 流式读写的块大小
+CHUNK_SIZE = 1024 * 1024
+
+
+class BlobStore:
+    """存储后端接口，key 为 / 分隔的相对路径（如 ab/cd/<sha256>.pdf）"""
+
+    def put_file(self, key, path):
+        """把本地文件保存到 key（本地文件被移走或删除）"""
+        raise NotImplementedError
+
+    def put_stream(self, key, stream):
+        """从流中分块读取并保存到 key"""
+        raise NotImplementedError
+
+    def open(self, key):
+        """以二进制流方式读取 key，不存在时抛出 FileNotFoundError"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        """删除 key，不存在时忽略"""
+        raise NotImplementedError
+
+    def list(self, prefix):
+        """返回以 prefix 开头的所有 key"""
+        raise NotImplementedError
+
+    def local_path(self, key):
+        """返回 key 在本机上的文件路径（远程存储会先下载到缓存目录），不存在时返回None"""
+        raise NotImplementedError
+
+    def presigned_url(self, key, expires_in=PRESIGNED_URL_EXPIRES, filename=None, content_type=None):
+        """返回可直接下载的预签名 URL，后端不支持时返回None（由 API 直接发送文件）"""
+        return None
+
+
+class LocalBlobStore(BlobStore):
+    """本机目录存储"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._tmp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def put_file(self, key, path):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(path, target)
+
+    def put_stream(self, key, stream):
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+            self.put_file(key, tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def delete(self, key):
+        path = self._path(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def list(self, prefix):
+        directory, _, name_prefix = prefix.rpartition('/')
+        path = self._path(directory) if directory else self.root
+        if not os.path.isdir(path):
+            return []
+        return [f"{directory}/{entry}" if directory else entry
+                for entry in sorted(os.listdir(path)) if entry.startswith(name_prefix)]
+
+    def local_path(self, key):
+        path = self._path(key)
+        return path if os.path.exists(path) else None
+
+
+class S3BlobStore(BlobStore):
+    """S3 兼容对象存储，本机缓存目录保存解析时用到的文件副本"""
+
+    def __init__(self, bucket, cache_dir, prefix="", endpoint_url=None, region=None, client=None,
+                 cache_max_bytes=S3_CACHE_MAX_BYTES):
+        """初始化
+
+        Args:
+            bucket: 存储桶名称
+            cache_dir: 本机缓存目录
+            cache_max_bytes: 本机缓存的总大小上限，<=0 表示不限制
+            prefix: 对象 key 的前缀
+            endpoint_url: S3 兼容服务的地址（如 http://minio:9000），为None时使用 AWS S3
+            region: 区域
+            client: 已创建的 S3 客户端（测试时可传入替身），为None时用 boto3 创建
+        """
+        if not bucket:
+            raise ValueError("S3_BUCKET is required when STORAGE_BACKEND=s3")
+        if client is None:
+            try:
+                import boto3
+                from botocore.config import Config
+            except ImportError:
+                raise RuntimeError("STORAGE_BACKEND=s3 requires boto3 (pip install boto3)")
+            # 自建的 S3 兼容服务通常不支持虚拟主机风格的地址
+            config = Config(signature_version='s3v4', s3={'addressing_style': 'path' if endpoint_url else 'auto'})
+            client = boto3.client('s3', endpoint_url=endpoint_url, region_name=region, config=config)
+
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.cache = LocalBlobStore(cache_dir)
+        self.cache_max_bytes = cache_max_bytes
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _evict_cache(self, keep):
+        """本机缓存超出上限时淘汰最久未使用的文件，刚写入的文件保留"""
+        if self.cache_max_bytes <= 0:
+            return
+        # 缓存目录同时是上传存储的根目录，引用计数文件（.refs）不属于缓存
+        disk_lru.evict(self.cache.root, self.cache_max_bytes, keep={self.cache._path(keep)},
+                       include=lambda path: not path.endswith('.refs'))
+
+    def put_file(self, key, path):
+        # upload_file 对大文件自动分片上传；上传后文件留在本机缓存中，马上解析时不用再下载
+        self.client.upload_file(path, self.bucket, self._key(key))
+        self.cache.put_file(key, path)
+        self._evict_cache(keep=key)
+
+    def put_stream(self, key, stream):
+        self.client.upload_fileobj(stream, self.bucket, self._key(key))
+
+    def open(self, key):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))['Body']
+        except Exception as e:
+            if _is_not_found(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+        self.cache.delete(key)
+
+    def list(self, prefix):
+        keys = []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            keys.extend(item['Key'][len(self.prefix):] for item in page.get('Contents', []))
+        return keys
+
+    def local_path(self, key):
+        path = self.cache.local_path(key)
+        if path and disk_lru.touch(path):
+            return path
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache._tmp_dir)
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self._key(key), tmp_path)
+        except Exception as e:
+            os.remove(tmp_path)
+            if _is_not_found(e):
+                return None
+            raise
+        self.cache.put_file(key, tmp_path)
+        self._evict_cache(keep=key)
+        return self.cache.local_path(key)
+
+    def presigned_url(self, key, expires_in=PRESIGNED_URL_EXPIRES, filename=None, content_type=None):
+        params = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if filename:
+            params['ResponseContentDisposition'] = f'attachment; filename="{filename}"'
+        if content_type:
+            params['ResponseContentType'] = content_type
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires_in)
+
+
+def _is_not_found(error):
+    """botocore 的 404 / NoSuchKey 错误"""
+    response = getattr(error, 'response', None) or {}
+    return str(response.get('Error', {}).get('Code')) in ('404', 'NoSuchKey', 'NotFound')
+
+
+def create_blob_store(backend, root):
+    """按 STORAGE_BACKEND 创建存储后端，root 为本地存储目录（s3 模式下为本机缓存目录）"""
+    if backend == 'local':
+        return LocalBlobStore(root)
+    if backend == 's3':
+        return S3BlobStore(S3_BUCKET, root, prefix=S3_PREFIX, endpoint_url=S3_ENDPOINT_URL, region=S3_REGION)
+    raise ValueError(f"Unsupported STORAGE_BACKEND: {backend} (expected local or s3)")
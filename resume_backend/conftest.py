@@ -0,0 +1,13 @@
+"""测试环境：不调用真实的 LLM，上传文件和 PDF 缓存写到临时目录
+
+必须在导入 app 等模块之前设置环境变量（load_dotenv 不会覆盖已设置的变量）。
+"""
+import os
+import tempfile
+
+_TEST_ROOT = tempfile.mkdtemp(prefix="resume-backend-tests-")
+
+os.environ["OPENAI_API_KEY"] = ""
+os.environ["GOOGLE_API_KEY"] = ""
+os.environ.setdefault("UPLOAD_ROOT", os.path.join(_TEST_ROOT, "uploads"))
+os.environ.setdefault("PDF_CACHE_DIR", os.path.join(_TEST_ROOT, "pdf_cache"))
@@ -2,7 +2,9 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 from bson.objectid import ObjectId
+import copy
 import datetime
+from hashing import content_hash
 
 # 加载 .env 配置
 load_dotenv()
@@ -92,6 +94,19 @@ try:
     db = client.resume_db
     resumes = db.resumes
     analyses = db.analyses
+    jobs = db.jobs
+    
+    # 按用户、文件哈希和解析模式查找最近一次已解析的相同上传（find_parsed_resume_by_hash 按 upload_date 倒序）
+    try:
+        resumes.create_index([("user_id", 1), ("file_hash", 1), ("parse_mode", 1), ("upload_date", -1)])
+    except Exception as e:
+        print(f"Error creating file_hash index: {e}")
+    # 旧版本创建的 (user_id, file_hash) 索引是上面索引的前缀，已经多余
+    try:
+        if "user_id_1_file_hash_1" in resumes.index_information():
+            resumes.drop_index("user_id_1_file_hash_1")
+    except Exception as e:
+        print(f"Error dropping old file_hash index: {e}")
     
 except Exception as e:
     print(f"❌ MongoDB 连接失败: {e}")
@@ -100,6 +115,7 @@ except Exception as e:
     # 创建内存集合作为备用
     resumes = MemoryCollection("resumes")
     analyses = MemoryCollection("analyses")
+    jobs = MemoryCollection("jobs")
 
 def save_resume_metadata(filename, filepath, user_id=None):
     """Save resume metadata to database (legacy function)"""
@@ -122,8 +138,24 @@ def save_resume_metadata(filename, filepath, user_id=None):
         print(f"Error saving resume metadata: {e}")
         return None
 
-def update_resume_content(resume_id, content):
-    """Update resume with extracted content"""
+def _original_parse_fields(content, parse_mode):
+    """首次解析结果的不可变副本，用于同一用户重复上传同一文件时复用
+
+    之后通过 PUT /content 编辑或重新分析都不会修改这些字段。
+    """
+    return {
+        "parsed_content": copy.deepcopy(content),
+        "parsed_content_hash": content_hash(content),
+        "parse_mode": parse_mode
+    }
+
+def update_resume_content(resume_id, content, parse_mode=None):
+    """Update resume with extracted content
+
+    parse_mode is passed only when content is a fresh, reusable parse result
+    (see resume_parser.is_reusable_parse); it is then also kept as the
+    original parse for deduplicating uploads.
+    """
     try:
         if mongodb_available and isinstance(resume_id, str):
             try:
@@ -131,20 +163,47 @@ def update_resume_content(resume_id, content):
             except:
                 pass
                 
-        resumes.update_one(
-            {"_id": resume_id},
-            {"$set": {
-                "content": content,
-                "status": "parsed"
-            }}
-        )
+        # content_hash 和 updated_at 用作 HTTP 缓存校验（ETag / Last-Modified）
+        fields = {
+            "content": content,
+            "content_hash": content_hash(content),
+            "status": "parsed",
+            "updated_at": datetime.datetime.now()
+        }
+        if parse_mode is not None:
+            fields.update(_original_parse_fields(content, parse_mode))
+        resumes.update_one({"_id": resume_id}, {"$set": fields})
         return True
     except Exception as e:
         print(f"Error updating resume content: {e}")
         return False
 
-def save_resume(filename, filepath, user_id=None, parsed_data=None):
-    """保存简历数据，包括元数据和解析数据"""
+def update_resume_status(resume_id, status, error=None):
+    """Update the processing status of a resume (queued/parsing/parsed/failed)"""
+    try:
+        if mongodb_available and isinstance(resume_id, str):
+            try:
+                resume_id = ObjectId(resume_id)
+            except:
+                pass
+        
+        fields = {"status": status, "updated_at": datetime.datetime.now()}
+        if error is not None:
+            fields["error"] = error
+            
+        resumes.update_one({"_id": resume_id}, {"$set": fields})
+        return True
+    except Exception as e:
+        print(f"Error updating resume status: {e}")
+        return False
+
+def save_resume(filename, filepath, user_id=None, parsed_data=None, status="parsed", file_hash=None, parse_mode=None):
+    """保存简历数据，包括元数据和解析数据
+    
+    status 默认为 "parsed"；异步上传时以 "queued" 保存，由后台任务更新。
+    file_hash 为上传文件的 SHA-256，用于识别重复上传
+    parse_mode 只在 parsed_data 是可复用的解析结果时传入，同时保存为首次解析结果
+    """
     try:
         timestamp = datetime.datetime.now()
         
@@ -152,12 +211,18 @@ def save_resume(filename, filepath, user_id=None, parsed_data=None):
             "filename": filename,
             "filepath": filepath,
             "upload_date": timestamp,
-            "status": "parsed",  # 标记为已解析
-            "content": parsed_data  # 存储解析内容
+            "updated_at": timestamp,
+            "status": status,  # 解析状态
+            "content": parsed_data,  # 存储解析内容
+            "content_hash": content_hash(parsed_data)
         }
         
         if user_id:
             resume_data["user_id"] = user_id
+        if file_hash:
+            resume_data["file_hash"] = file_hash
+        if parse_mode is not None:
+            resume_data.update(_original_parse_fields(parsed_data, parse_mode))
         
         result = resumes.insert_one(resume_data)
         return result.inserted_id
@@ -165,8 +230,43 @@ def save_resume(filename, filepath, user_id=None, parsed_data=None):
         print(f"Error saving resume with parsed data: {e}")
         return None
 
-def save_analysis(resume_id, analysis_data):
-    """Save analysis data for a resume"""
+def find_parsed_resume_by_hash(file_hash, user_id, parse_mode):
+    """Find the user's most recent upload of the same file with a reusable original parse
+
+    Only the immutable original parse (parsed_content) is considered, so later
+    edits of the resume content are never copied into a new upload.
+    """
+    try:
+        query = {"file_hash": file_hash, "user_id": user_id, "parse_mode": parse_mode}
+        if mongodb_available:
+            return resumes.find_one(
+                dict(query, parsed_content={"$ne": None}),
+                sort=[("upload_date", -1)]
+            )
+        for resume in reversed(resumes.find(query)):
+            if resume.get("parsed_content"):
+                return resume
+        return None
+    except Exception as e:
+        print(f"Error finding resume by hash: {e}")
+        return None
+
+def file_hash_referenced(file_hash):
+    """Check whether any resume still references an uploaded file"""
+    try:
+        if mongodb_available:
+            return resumes.find_one({"file_hash": file_hash}, {"_id": 1}) is not None
+        return len(resumes.find({"file_hash": file_hash})) > 0
+    except Exception as e:
+        print(f"Error checking file references: {e}")
+        # 无法确认时按仍被引用处理，避免误删文件
+        return True
+
+def save_analysis(resume_id, analysis_data, provider=None, latency_ms=None, hedged=None, analyzed_hash=None):
+    """Save analysis data for a resume, with the provider that produced it and its latency
+
+    analyzed_hash is the content_hash of the resume content that was analyzed.
+    """
     try:
         if mongodb_available and isinstance(resume_id, str):
             try:
@@ -179,8 +279,17 @@ def save_analysis(resume_id, analysis_data):
         analysis = {
             "resume_id": resume_id,
             "analysis": analysis_data,
+            "analysis_hash": content_hash(analysis_data),
             "date": timestamp
         }
+        if provider is not None:
+            analysis["provider"] = provider
+        if latency_ms is not None:
+            analysis["latency_ms"] = latency_ms
+        if hedged is not None:
+            analysis["hedged"] = hedged
+        if analyzed_hash is not None:
+            analysis["content_hash"] = analyzed_hash
         
         result = analyses.insert_one(analysis)
         return result.inserted_id
@@ -188,6 +297,67 @@ def save_analysis(resume_id, analysis_data):
         print(f"Error saving analysis: {e}")
         return None
 
+def copy_analysis(source_resume_id, resume_id, analyzed_hash):
+    """Copy the analysis of one resume's content to another, return the new analysis id or None
+
+    Only an analysis of the content identified by analyzed_hash is copied.
+    """
+    source = get_analysis_for_content(source_resume_id, analyzed_hash)
+    if not source:
+        return None
+    return save_analysis(
+        resume_id,
+        source["analysis"],
+        provider=source.get("provider"),
+        latency_ms=source.get("latency_ms"),
+        hedged=source.get("hedged"),
+        analyzed_hash=analyzed_hash
+    )
+
+def save_job(job_id, job_type, resume_id, status="queued"):
+    """Create a background job record"""
+    try:
+        timestamp = datetime.datetime.now()
+        
+        job = {
+            "_id": job_id,
+            "type": job_type,
+            "resume_id": str(resume_id),
+            "status": status,
+            "created_at": timestamp,
+            "updated_at": timestamp
+        }
+        
+        result = jobs.insert_one(job)
+        return result.inserted_id
+    except Exception as e:
+        print(f"Error saving job: {e}")
+        return None
+
+def update_job(job_id, status, error=None):
+    """Update the status of a background job"""
+    try:
+        fields = {
+            "status": status,
+            "updated_at": datetime.datetime.now()
+        }
+        if error is not None:
+            fields["error"] = error
+            
+        jobs.update_one({"_id": job_id}, {"$set": fields})
+        return True
+    except Exception as e:
+        print(f"Error updating job: {e}")
+        return False
+
+def get_job(job_id):
+    """Get a background job by ID"""
+    try:
+        return jobs.find_one({"_id": job_id})
+    except Exception as e:
+        print(f"Error getting job: {e}")
+        return None
+
 def get_resume(resume_id):
     """Get a resume by ID"""
     try:
@@ -226,6 +396,22 @@ def get_analysis(resume_id):
         print(f"Error getting analysis: {e}")
         return None
 
+def get_analysis_for_content(resume_id, analyzed_hash):
+    """Get the analysis of a resume that was produced for the content with the given hash"""
+    try:
+        if mongodb_available:
+            if isinstance(resume_id, str):
+                try:
+                    resume_id = ObjectId(resume_id)
+                except:
+                    pass
+        elif isinstance(resume_id, ObjectId):
+            resume_id = str(resume_id)
+        return analyses.find_one({"resume_id": resume_id, "content_hash": analyzed_hash})
+    except Exception as e:
+        print(f"Error getting analysis: {e}")
+        return None
+
 def get_resumes_by_user(user_id):
     """Get all resumes for a specific user"""
     try:
@@ -241,15 +427,13 @@ def get_resumes_by_user(user_id):
 
 def delete_resume(resume_id):
     """Delete a resume by ID and its associated analysis"""
-    global analyses, resumes  # 同时声明两个全局变量
-    
     try:
         # First delete associated analysis
         if mongodb_available:
             analyses.delete_one({"resume_id": resume_id})
         else:
-            # 对于内存存储，更新全局变量analyses
-            analyses = [a for a in analyses if a.get("resume_id") != resume_id]
+            # 对于内存存储，直接过滤集合中的文档
+            analyses.data = [a for a in analyses.data if a.get("resume_id") != resume_id]
         
         # Then delete the resume
         if mongodb_available:
@@ -257,9 +441,9 @@ def delete_resume(resume_id):
             return result.deleted_count > 0
         else:
             # For in-memory storage
-            original_len = len(resumes)
-            resumes = [r for r in resumes if r.get("_id") != resume_id]
-            return len(resumes) < original_len
+            original_len = len(resumes.data)
+            resumes.data = [r for r in resumes.data if r.get("_id") != resume_id]
+            return len(resumes.data) < original_len
     except Exception as e:
         print(f"Error deleting resume: {e}")
         return False 
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""按总大小做 LRU 淘汰的磁盘缓存目录
+
+最近使用时间保存在文件的 mtime 中（命中时 touch），淘汰时扫描目录，按 mtime 从旧到新删除文件，
+直到总大小不超过上限。扫描和删除都在目录的文件锁中进行：共享同一目录的多个进程按同一份磁盘状态
+记账，不会因为每个进程各自统计而让总大小超出上限数倍。
+"""
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # 非 Unix 平台只做进程内加锁
+    fcntl = None
+
+# 目录锁文件名，不计入缓存
+LOCK_NAME = ".lru.lock"
+
+
+def touch(path):
+    """记录文件的最近使用时间，文件已不存在时返回 False"""
+    try:
+        os.utime(path)
+        return True
+    except OSError:
+        return False
+
+
+@contextmanager
+def locked(directory):
+    """持有目录的文件锁（同一进程内的多个线程之间同样互斥）"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_NAME), 'a') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def scan(directory, include=None):
+    """列出缓存文件，返回按 mtime 从旧到新排列的 [(mtime, 大小, 路径)]
+
+    以 . 开头的子目录（如临时文件目录）和锁文件不计入；include(路径) 为 False 的文件也不计入。
+    """
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = [name for name in dirs if not name.startswith('.')]
+        for name in names:
+            path = os.path.join(root, name)
+            if name == LOCK_NAME or (include is not None and not include(path)):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+    return files
+
+
+def evict(directory, max_bytes, keep=(), include=None):
+    """总大小超过 max_bytes 时删除最久未使用的文件（keep 中的路径保留）
+
+    Returns:
+        (被删除的路径列表, 剩余文件数, 剩余总大小)
+    """
+    with locked(directory):
+        files = scan(directory, include)
+        total = sum(size for _, size, _ in files)
+        evicted = []
+        for _, size, path in files:
+            if total <= max_bytes:
+                break
+            if path in keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted.append(path)
+        return evicted, len(files) - len(evicted), total
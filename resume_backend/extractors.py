@@ -0,0 +1,409 @@
+"""文本提取后端注册表
+
+PDF / DOCX / TXT 各自可以注册多个提取后端，统一接口为 fn(file_path, digest=None) -> 文本片段列表
+（PDF 每页一段，其他格式一段；digest 为已知的文件 SHA-256，后端可以用它做缓存键而不必重新计算）。每次提取都会按后端记录调用次数、耗时和提取字符数。
+
+使用哪个后端由 EXTRACT_BACKEND_PDF / EXTRACT_BACKEND_DOCX / EXTRACT_BACKEND_TXT 指定；
+设为 auto 时读取基准测试结果（EXTRACT_BENCHMARK_FILE），选择文本产出不低于
+EXTRACT_MIN_YIELD 的后端中最快的一个。基准测试命令：
+
+    python extractors.py benchmark <样本目录或文件...> [--repeat 3] [--output extract_benchmark.json]
+
+提取出的文本以 gzip 压缩保存在上传文件旁边（<sha256>.text-<后端>-<版本>.txt.gz），
+按文件哈希和提取器版本区分。再次解析同一文件（如 LLM 调用失败后重试）时直接读取，不再打开 PDF。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+import re
+import docx
+import PyPDF2
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+
+import pdf_extract
+import prompt_budget
+from hashing import file_hash
+
+# 加载环境变量
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 各格式使用的后端，auto 表示按基准测试结果选择
+EXTRACT_BACKENDS = {
+    '.pdf': os.getenv("EXTRACT_BACKEND_PDF", "pypdf2"),
+    '.docx': os.getenv("EXTRACT_BACKEND_DOCX", "python-docx"),
+    '.txt': os.getenv("EXTRACT_BACKEND_TXT", "text"),
+}
+# auto 模式的默认后端（没有基准测试结果或结果中没有合格后端时使用）
+DEFAULT_BACKENDS = {'.pdf': 'pypdf2', '.docx': 'python-docx', '.txt': 'text'}
+EXTRACT_BENCHMARK_FILE = os.getenv("EXTRACT_BENCHMARK_FILE", os.path.join(BASE_DIR, "extract_benchmark.json"))
+# 文本产出（提取的非空白字符数 / 同一文件各后端中的最大值）的合格线
+EXTRACT_MIN_YIELD = float(os.getenv("EXTRACT_MIN_YIELD", "0.95"))
+# 是否把提取出的文本保存为压缩的附属文件
+EXTRACT_SIDECAR_ENABLED = os.getenv("EXTRACT_SIDECAR_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# 提取后处理（页眉页脚去除、拼接）的版本，修改后处理逻辑时递增，旧的附属文件随之失效
+TEXT_POSTPROCESS_VERSION = 1
+
+_SIDECAR_NAME_RE = re.compile(r'[^A-Za-z0-9._-]+')
+
+# 格式 -> {后端名: 提取函数}，按注册顺序排列
+BACKENDS = {}
+# (格式, 后端名) -> 版本号（通常是底层库的版本）
+BACKEND_VERSIONS = {}
+
+_stats_lock = threading.Lock()
+_stats = {}
+_selected = {}
+
+
+def register_backend(ext, name, extract_fn, version="1"):
+    """注册提取后端
+
+    Args:
+        ext: 文件扩展名（带点，如 '.pdf'）
+        name: 后端名
+        extract_fn: fn(file_path, digest=None) -> 文本片段列表
+        version: 后端版本，输出可能变化时（如升级底层库）应随之改变，用于区分文本附属文件
+    """
+    BACKENDS.setdefault(ext, OrderedDict())[name] = extract_fn
+    BACKEND_VERSIONS[(ext, name)] = str(version)
+
+
+def sidecar_name(ext, name):
+    """返回某个后端提取文本的附属文件名（包含后端版本和后处理版本）"""
+    version = BACKEND_VERSIONS.get((ext, name), "1")
+    return _SIDECAR_NAME_RE.sub('_', f"text-{name}-{version}-p{TEXT_POSTPROCESS_VERSION}") + ".txt"
+
+
+def available_backends(ext):
+    """返回某个格式已注册的后端名列表"""
+    return list(BACKENDS.get(ext, {}))
+
+
+def select_backend(ext):
+    """返回某个格式当前使用的后端名"""
+    if ext not in BACKENDS:
+        raise ValueError(f"Unsupported file format: {ext}")
+
+    name = EXTRACT_BACKENDS.get(ext) or DEFAULT_BACKENDS[ext]
+    if name == 'auto':
+        if ext not in _selected:
+            _selected[ext] = _recommended_backend(ext) or DEFAULT_BACKENDS[ext]
+        name = _selected[ext]
+    if name not in BACKENDS[ext]:
+        raise ValueError(f"Extraction backend '{name}' is not available for {ext} files")
+    return name
+
+
+def _recommended_backend(ext):
+    """从基准测试结果中读取推荐的后端"""
+    try:
+        with open(EXTRACT_BENCHMARK_FILE, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+    except (OSError, ValueError):
+        return None
+    name = results.get(ext, {}).get('recommended')
+    return name if name in BACKENDS.get(ext, {}) else None
+
+
+def extract_segments(file_path, backend=None, digest=None):
+    """用指定（或当前选择的）后端提取文本片段
+
+    Args:
+        digest: 文件内容的 SHA-256（已知时传入，后端不必重新计算）
+
+    Returns:
+        (文本片段列表, 后端名)
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    name = backend or select_backend(ext)
+    extract_fn = BACKENDS.get(ext, {}).get(name)
+    if extract_fn is None:
+        raise ValueError(f"Extraction backend '{name}' is not available for {ext} files")
+
+    start = time.perf_counter()
+    try:
+        segments = extract_fn(file_path, digest=digest)
+    except Exception:
+        _record(ext, name, time.perf_counter() - start, 0, error=True)
+        raise
+    _record(ext, name, time.perf_counter() - start, sum(len(s) for s in segments))
+    return segments, name
+
+
+def extract_text(file_path, backend=None, meta=None, digest=None):
+    """提取文件的纯文本，多页文件去掉每页重复的页眉页脚
+
+    存在相同文件哈希和提取器版本的文本附属文件时直接读取；提取出的文本只为
+    上传存储中持有的文件保存为附属文件（随文件一起删除）。
+
+    Args:
+        file_path: 文件路径
+        backend: 后端名，为None时使用当前选择的后端
+        meta: 如果传入字典，会写入使用的后端（extractor）、提取耗时（extract_ms）
+            以及是否读取了附属文件（extract_cached）
+        digest: 文件内容的 SHA-256，为None时现场计算
+    """
+    start = time.perf_counter()
+    ext = os.path.splitext(file_path)[1].lower()
+    name = backend or select_backend(ext)
+
+    text = None
+    if EXTRACT_SIDECAR_ENABLED:
+        # 延迟导入：基准测试命令行不需要上传存储，也不应创建存储目录
+        from storage import upload_storage
+        digest = digest or file_hash(file_path)
+        text = upload_storage.read_sidecar(digest, sidecar_name(ext, name))
+    cached = text is not None
+
+    if not cached:
+        segments, name = extract_segments(file_path, name, digest)
+        if len(segments) > 1:
+            segments = prompt_budget.strip_repeated_headers(segments)
+        text = "".join(segment + "\n" for segment in segments if segment)
+        if EXTRACT_SIDECAR_ENABLED:
+            try:
+                upload_storage.write_sidecar(digest, sidecar_name(ext, name), text)
+            except OSError as e:
+                print(f"Failed to save extracted text for {digest}: {e}")
+
+    if meta is not None:
+        meta['extractor'] = name
+        meta['extract_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        meta['extract_cached'] = cached
+    return text
+
+
+def _record(ext, name, seconds, chars, error=False):
+    with _stats_lock:
+        entry = _stats.setdefault(f"{ext[1:]}:{name}", {'calls': 0, 'errors': 0, 'total_ms': 0.0, 'chars': 0})
+        entry['calls'] += 1
+        entry['errors'] += int(error)
+        entry['total_ms'] += seconds * 1000
+        entry['chars'] += chars
+
+
+def stats():
+    """返回各后端的调用次数、错误数、平均耗时和提取字符数"""
+    with _stats_lock:
+        result = {}
+        for key, entry in _stats.items():
+            result[key] = dict(entry)
+            result[key]['total_ms'] = round(entry['total_ms'], 2)
+            result[key]['avg_ms'] = round(entry['total_ms'] / entry['calls'], 2) if entry['calls'] else 0
+        return result
+
+
+# ---------- 内置后端 ----------
+
+def _pdf_pypdf2(file_path, digest=None):
+    """PyPDF2：每页提取一次，多页文件并行，按页缓存（见 pdf_extract）"""
+    return pdf_extract.extract_pages(file_path, digest)
+
+
+def _docx_paragraphs(file_path, digest=None):
+    """python-docx：只读取正文段落"""
+    document = docx.Document(file_path)
+    return ["\n".join(para.text for para in document.paragraphs)]
+
+
+def _docx_with_tables(file_path, digest=None):
+    """python-docx：按文档顺序读取段落和表格（简历模板常用表格排版）"""
+    document = docx.Document(file_path)
+    lines = []
+    for child in document.element.body.iterchildren():
+        tag = child.tag.rsplit('}', 1)[-1]
+        if tag == 'p':
+            lines.append(Paragraph(child, document).text)
+        elif tag == 'tbl':
+            for row in Table(child, document).rows:
+                cells = []
+                for cell in row.cells:
+                    # 合并单元格会在每一列重复出现
+                    text = cell.text.strip()
+                    if text and (not cells or cells[-1] != text):
+                        cells.append(text)
+                if cells:
+                    lines.append(" | ".join(cells))
+    return ["\n".join(lines)]
+
+
+def _txt_read(file_path, digest=None):
+    """按 UTF-8 读取，无法解码的字节直接忽略"""
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+        return [f.read()]
+
+
+def _txt_detect(file_path, digest=None):
+    """依次尝试 UTF-8（含 BOM）、GB18030，都失败时按 Latin-1 读取"""
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    for encoding in ('utf-8-sig', 'gb18030'):
+        try:
+            return [data.decode(encoding)]
+        except UnicodeDecodeError:
+            continue
+    return [data.decode('latin-1')]
+
+
+register_backend('.pdf', 'pypdf2', _pdf_pypdf2, PyPDF2.__version__)
+register_backend('.docx', 'python-docx', _docx_paragraphs, getattr(docx, '__version__', '1'))
+register_backend('.docx', 'python-docx-tables', _docx_with_tables, getattr(docx, '__version__', '1'))
+register_backend('.txt', 'text', _txt_read)
+register_backend('.txt', 'text-detect', _txt_detect)
+
+# 可选后端：安装了对应的库时才注册
+try:
+    import pdfminer
+    from pdfminer.high_level import extract_text as _pdfminer_extract_text
+
+    def _pdf_pdfminer(file_path, digest=None):
+        """pdfminer.six：布局分析更准确，速度较慢"""
+        return _pdfminer_extract_text(file_path).split('\f')
+
+    register_backend('.pdf', 'pdfminer', _pdf_pdfminer, pdfminer.__version__)
+except ImportError:
+    pass
+
+try:
+    import fitz
+
+    def _pdf_pymupdf(file_path, digest=None):
+        """PyMuPDF：基于 MuPDF 的 C 实现，通常最快"""
+        with fitz.open(file_path) as document:
+            return [page.get_text() for page in document]
+
+    register_backend('.pdf', 'pymupdf', _pdf_pymupdf, fitz.VersionBind)
+except ImportError:
+    pass
+
+
+# ---------- 基准测试 ----------
+
+def _yield_chars(segments):
+    """提取出的非空白字符数"""
+    return sum(len(''.join(segment.split())) for segment in segments)
+
+
+def benchmark(paths, repeat=3, min_yield=EXTRACT_MIN_YIELD):
+    """在样本文件上运行所有后端，统计吞吐量和文本产出
+
+    每个文件的文本产出按各后端中提取字符最多的一个归一化（1.0 为最好）。
+    计时不包括进程池启动和文件哈希（正常解析时两者都已就绪）。
+    每个格式推荐平均产出不低于 min_yield 且没有出错的后端中最快的一个。
+
+    Args:
+        paths: 样本文件路径列表
+        repeat: 每个后端对每个文件重复提取的次数（取最快一次）
+        min_yield: 推荐后端的最低平均产出
+
+    Returns:
+        {格式: {'files': 文件数, 'backends': {后端名: 统计}, 'recommended': 后端名}}
+    """
+    by_ext = OrderedDict()
+    for path in paths:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in BACKENDS:
+            by_ext.setdefault(ext, []).append(path)
+
+    # 进程池的启动时间不计入 PyPDF2 后端的提取耗时
+    if '.pdf' in by_ext:
+        pdf_extract.warm_up()
+
+    results = OrderedDict()
+    for ext, files in by_ext.items():
+        timings = {name: {'seconds': 0.0, 'bytes': 0, 'pages': 0, 'errors': 0, 'yields': []} for name in BACKENDS[ext]}
+        for path in files:
+            size = os.path.getsize(path)
+            # 文件哈希在计时前算好，与正常解析一样传给后端
+            digest = file_hash(path)
+            chars = {}
+            for name, extract_fn in BACKENDS[ext].items():
+                best = None
+                try:
+                    for _ in range(max(1, repeat)):
+                        # PyPDF2 后端带页面缓存，每次计时前清空，测的是冷提取
+                        pdf_extract.page_cache.clear()
+                        start = time.perf_counter()
+                        segments = extract_fn(path, digest=digest)
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+                except Exception as e:
+                    print(f"{name} failed on {path}: {e}", file=sys.stderr)
+                    timings[name]['errors'] += 1
+                    chars[name] = 0
+                    continue
+                timings[name]['seconds'] += best
+                timings[name]['bytes'] += size
+                timings[name]['pages'] += len(segments)
+                chars[name] = _yield_chars(segments)
+
+            most = max(chars.values()) if chars else 0
+            for name, count in chars.items():
+                timings[name]['yields'].append(count / most if most else 1.0)
+
+        backends = OrderedDict()
+        for name, t in timings.items():
+            mean_yield = sum(t['yields']) / len(t['yields']) if t['yields'] else 0.0
+            backends[name] = {
+                'seconds': round(t['seconds'], 4),
+                'files_per_second': round(len(files) / t['seconds'], 2) if t['seconds'] else None,
+                'mb_per_second': round(t['bytes'] / t['seconds'] / 1e6, 2) if t['seconds'] else None,
+                'mean_yield': round(mean_yield, 4),
+                'min_yield': round(min(t['yields']), 4) if t['yields'] else 0.0,
+                'errors': t['errors']
+            }
+
+        eligible = [name for name, b in backends.items()
+                    if not b['errors'] and b['mean_yield'] >= min_yield and b['seconds']]
+        results[ext] = {
+            'files': len(files),
+            'backends': backends,
+            'recommended': min(eligible, key=lambda name: backends[name]['seconds']) if eligible else None
+        }
+    return results
+
+
+def _collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        else:
+            files.append(path)
+    return files
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Text extraction backends")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('benchmark', help='Benchmark every backend over a sample corpus')
+    bench.add_argument('paths', nargs='+', help='Sample files or directories')
+    bench.add_argument('--repeat', type=int, default=3, help='Runs per backend and file (fastest is kept)')
+    bench.add_argument('--min-yield', type=float, default=EXTRACT_MIN_YIELD, help='Minimum mean text yield for the recommendation')
+    bench.add_argument('--output', default=EXTRACT_BENCHMARK_FILE, help='Where to write the results (read by EXTRACT_BACKEND_*=auto)')
+    args = parser.parse_args(argv)
+
+    results = benchmark(_collect_files(args.paths), repeat=args.repeat, min_yield=args.min_yield)
+    for ext, result in results.items():
+        print(f"{ext} ({result['files']} files), recommended: {result['recommended']}")
+        for name, b in result['backends'].items():
+            print(f"  {name:20} {b['seconds']:>8.3f}s  {b['files_per_second'] or 0:>8} files/s  "
+                  f"{b['mb_per_second'] or 0:>6} MB/s  yield {b['mean_yield']:.3f} (min {b['min_yield']:.3f})  errors {b['errors']}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
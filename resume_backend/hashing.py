@@ -0,0 +1,24 @@
+"""内容与文件的 SHA-256 哈希
+
+用于识别重复上传、合并相同请求以及缓存键，被 db、存储、提取和 app 共用。
+"""
+import json
+import hashlib
+
+
+def content_hash(content):
+    """计算内容（字典、列表或字符串）的稳定哈希"""
+    if isinstance(content, (bytes, bytearray)):
+        data = bytes(content)
+    else:
+        data = json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(file_path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,46 @@
+"""HTTP 条件请求（ETag / Last-Modified）
+
+资源的 ETag 由文档上保存的内容哈希计算（强校验），Last-Modified 取文档的更新时间。
+请求带有匹配的 If-None-Match 时直接返回 304，不再查询其他数据、序列化或生成 PDF。
+If-Modified-Since 不作为判断依据：ETag 还包含更新时间反映不出的信息（生成器版本和配置、
+页数参数，以及同一秒内的多次修改），只按日期判断会返回过期的内容。响应带 Cache-Control: no-cache，客户端每次都会带上校验头重新验证。
+"""
+import hashlib
+from datetime import timezone
+from flask import Response
+
+
+def make_etag(*parts):
+    """由若干版本信息（内容哈希、状态等）计算 ETag 值（不含引号）"""
+    data = "\x1f".join(str(part) for part in parts).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _utc(value):
+    """数据库中的本地时间（naive datetime）转换为去掉微秒的 UTC 时间"""
+    if value is None:
+        return None
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified(request, etag, last_modified=None):
+    """客户端缓存仍然有效时返回 304 响应，否则返回None
+
+    只按 If-None-Match 判断。资源都有 ETag，If-None-Match 优先于 If-Modified-Since（RFC 7232），
+    只带 If-Modified-Since 的请求也不返回 304。last_modified 只用于 304 响应的 Last-Modified 头。
+    """
+    if not request.if_none_match:
+        return None
+    if not (request.if_none_match.contains(etag) or request.if_none_match.star_tag):
+        return None
+    response = Response(status=304)
+    return add_validators(response, etag, last_modified)
+
+
+def add_validators(response, etag, last_modified=None):
+    """给响应加上 ETag、Last-Modified 和 Cache-Control: no-cache"""
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _utc(last_modified)
+    response.cache_control.no_cache = True
+    return response
@@ -0,0 +1,74 @@
+"""后台任务：异步解析上传的简历
+
+上传接口保存文件并以 queued 状态写入简历后立即返回，
+由工作线程池完成文本提取和解析，状态依次为 queued -> parsing -> parsed/failed。
+任务只在当前进程的线程池中执行，进程重启后未完成的任务不会继续，
+查询状态时超过 JOB_TIMEOUT 仍未结束的任务会被标记为 failed。
+"""
+import os
+import uuid
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+import db
+import resume_parser
+
+# 加载环境变量
+load_dotenv()
+
+# 工作线程数量
+UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS", "4"))
+# 任务在同一状态停留超过该秒数视为已中断（例如进程重启），<=0 表示不检查
+JOB_TIMEOUT = int(os.getenv("JOB_TIMEOUT", "900"))
+
+TERMINAL_STATUSES = ("parsed", "failed")
+
+executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload-worker")
+
+
+def enqueue_parse(resume_id, filepath, parser=None):
+    """为已保存的简历创建解析任务，返回任务ID
+
+    Args:
+        parser: 解析模式 local / llm / auto，为None时使用默认模式
+    """
+    job_id = uuid.uuid4().hex
+    db.save_job(job_id, "parse", resume_id)
+    executor.submit(_run_parse_job, job_id, resume_id, filepath, parser)
+    return job_id
+
+
+def expire_stale_job(job):
+    """超时未结束的任务标记为 failed（同时更新简历状态），返回最新的任务记录"""
+    if JOB_TIMEOUT <= 0 or job.get("status") in TERMINAL_STATUSES:
+        return job
+
+    updated_at = job.get("updated_at") or job.get("created_at")
+    if updated_at is None or datetime.datetime.now() - updated_at <= datetime.timedelta(seconds=JOB_TIMEOUT):
+        return job
+
+    error = f"Job did not finish within {JOB_TIMEOUT}s (interrupted by a restart?)"
+    db.update_job(job["_id"], "failed", error=error)
+    if job.get("resume_id"):
+        db.update_resume_status(job["resume_id"], "failed", error=error)
+    return db.get_job(job["_id"]) or dict(job, status="failed", error=error)
+
+
+def _run_parse_job(job_id, resume_id, filepath, parser=None):
+    """在工作线程中提取并解析简历"""
+    try:
+        db.update_job(job_id, "parsing")
+        db.update_resume_status(resume_id, "parsing")
+
+        parse_meta = {}
+        parsed_data = resume_parser.parse_resume(filepath, meta=parse_meta, parser=parser)
+
+        # update_resume_content 同时把状态置为 parsed；可复用的结果同时保存为首次解析结果
+        parse_mode = parser or resume_parser.RESUME_PARSER_MODE
+        db.update_resume_content(resume_id, parsed_data, parse_mode=parse_mode if resume_parser.is_reusable_parse(parsed_data, parse_meta) else None)
+        db.update_job(job_id, "parsed")
+    except Exception as e:
+        print(f"Error in parse job {job_id}: {e}")
+        db.update_resume_status(resume_id, "failed", error=str(e))
+        db.update_job(job_id, "failed", error=str(e))
@@ -0,0 +1,176 @@
+"""LLM 响应缓存
+
+按 (provider, model, messages, temperature, response_format) 的哈希缓存聊天补全结果，
+内存中为有界 LRU，可选磁盘二级缓存，均支持 TTL，并统计命中/未命中次数。
+由 llm_provider 在发出请求前查询。
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "86400"))  # 秒，<=0 表示永不过期
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR")  # 设置后启用磁盘缓存
+
+
+class LLMCache:
+    """内存 LRU + 可选磁盘缓存"""
+
+    def __init__(self, max_entries=512, ttl=86400, cache_dir=None):
+        """初始化缓存
+
+        Args:
+            max_entries: 内存中最多保留的条目数
+            ttl: 条目有效期（秒），<=0 表示永不过期
+            cache_dir: 磁盘缓存目录，为None时只使用内存缓存
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0
+        }
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model, messages, temperature=None, response_format=None, provider="openai"):
+        """根据请求参数计算缓存键（规范化 JSON 的 SHA-256）"""
+        payload = json.dumps({
+            'provider': provider,
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'response_format': response_format
+        }, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _expired(self, created_at):
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """读取缓存，未命中或已过期时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    self._stats['memory_hits'] += 1
+                    return value
+                del self._entries[key]
+
+        if self.cache_dir:
+            entry = self._read_disk(key)
+            if entry is not None:
+                created_at, value = entry
+                with self._lock:
+                    self._put_memory(key, created_at, value)
+                    self._stats['hits'] += 1
+                    self._stats['disk_hits'] += 1
+                return value
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        """写入缓存"""
+        created_at = time.time()
+        with self._lock:
+            self._put_memory(key, created_at, value)
+            self._stats['stores'] += 1
+        if self.cache_dir:
+            self._write_disk(key, created_at, value)
+
+    def _put_memory(self, key, created_at, value):
+        # 调用方需持有锁
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry.get('created_at', 0)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry['created_at'], entry['value']
+
+    def _write_disk(self, key, created_at, value):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，避免并发读到半截内容
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'created_at': created_at, 'value': value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing LLM cache entry to disk: {e}")
+
+    def clear(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """返回命中/未命中等统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        stats['enabled'] = LLM_CACHE_ENABLED
+        stats['disk_enabled'] = bool(self.cache_dir)
+        return stats
+
+
+# 全局缓存实例
+llm_cache = LLMCache(
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl=LLM_CACHE_TTL,
+    cache_dir=LLM_CACHE_DIR
+)
+
+
+def is_cacheable(content, response_format):
+    """只缓存有效结果：非空，且要求 JSON 时必须能解析"""
+    if not content:
+        return False
+    if response_format and response_format.get('type') == 'json_object':
+        try:
+            json.loads(content)
+        except ValueError:
+            return False
+    return True
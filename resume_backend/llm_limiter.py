@@ -0,0 +1,256 @@
+"""LLM 出站请求的并发与速率控制
+
+进程内限制同时进行的 LLM 请求数和每分钟 token 数，超出时调用方排队等待，超过截止时间则放弃。
+根据 Retry-After 和 x-ratelimit-* 响应头自适应调整：收到 429 时并发上限减半并暂停发送，
+之后随成功请求逐步恢复。设置 LLM_LIMITER_LOCK_DIR 后，并发上限还会通过文件锁在同一台机器的
+多个进程间共享。
+"""
+import os
+import re
+import time
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # 非 Unix 平台不支持跨进程文件锁
+    fcntl = None
+
+# 加载环境变量
+load_dotenv()
+
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "8"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))  # 0 表示不限制，直到从响应头学习到上限
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_LIMITER_LOCK_DIR = os.getenv("LLM_LIMITER_LOCK_DIR")  # 设置后启用跨进程并发限制
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class LLMQueueTimeout(Exception):
+    """排队等待超过截止时间"""
+    pass
+
+
+def parse_duration(value):
+    """解析 "1m30s"、"20ms"、"6s" 或纯数字（秒）形式的时长，无法解析时返回None"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    matches = _DURATION_RE.findall(value)
+    if not matches:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in matches)
+
+
+class LLMLimiter:
+    """并发上限 + token 桶 + 基于响应头的自适应调整"""
+
+    def __init__(self, max_in_flight=8, tokens_per_minute=0, queue_timeout=30, lock_dir=None):
+        """初始化限流器
+
+        Args:
+            max_in_flight: 最多同时进行的请求数
+            tokens_per_minute: 每分钟 token 上限，0 表示不限制
+            queue_timeout: 默认排队截止时间（秒）
+            lock_dir: 跨进程文件锁目录，为None时只在进程内限制
+        """
+        self.max_in_flight = max_in_flight
+        self.limit = max_in_flight  # 当前自适应并发上限
+        self.tokens_per_minute = tokens_per_minute
+        self.queue_timeout = queue_timeout
+        self.lock_dir = lock_dir if fcntl else None
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._success_streak = 0
+
+        self._stats = {
+            'requests': 0,
+            'waits': 0,
+            'total_wait_seconds': 0.0,
+            'max_wait_seconds': 0.0,
+            'timeouts': 0,
+            'rate_limited': 0
+        }
+
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _refill(self, now):
+        # 调用方需持有锁
+        if self.tokens_per_minute > 0:
+            elapsed = now - self._last_refill
+            self._tokens = min(
+                float(self.tokens_per_minute),
+                self._tokens + elapsed * self.tokens_per_minute / 60.0
+            )
+        self._last_refill = now
+
+    def _wait_time(self, tokens, now):
+        """返回还需要等待的秒数，0 表示可以立即发送（调用方需持有锁）"""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._in_flight >= self.limit:
+            return None  # 等待其他请求释放
+        if self.tokens_per_minute > 0:
+            # 单次请求超过桶容量时，等桶满即可发送
+            needed = min(tokens, self.tokens_per_minute)
+            if self._tokens < needed:
+                return (needed - self._tokens) * 60.0 / self.tokens_per_minute
+        return 0
+
+    @contextmanager
+    def slot(self, tokens=0, timeout=None):
+        """占用一个请求名额，排队超过 timeout 秒时抛出 LLMQueueTimeout
+
+        Args:
+            tokens: 本次请求预计消耗的 token 数
+            timeout: 排队截止时间（秒），为None时使用默认值
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._wait_time(tokens, now)
+                    if wait == 0:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise LLMQueueTimeout(f"LLM request queue wait exceeded {timeout:.1f}s")
+                    self._cond.wait(remaining if wait is None else min(wait, remaining))
+            finally:
+                self._waiting -= 1
+
+            self._in_flight += 1
+            if self.tokens_per_minute > 0:
+                self._tokens -= min(tokens, self.tokens_per_minute)
+            self._record_wait(time.monotonic() - start)
+
+        lock_file = None
+        try:
+            if self.lock_dir:
+                lock_file = self._acquire_process_slot(deadline, timeout)
+            yield
+        finally:
+            if lock_file is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _acquire_process_slot(self, deadline, timeout):
+        """通过文件锁占用跨进程共享的并发名额"""
+        while True:
+            for i in range(self.max_in_flight):
+                lock_file = open(os.path.join(self.lock_dir, f"slot-{i}.lock"), 'a')
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    return lock_file
+                except OSError:
+                    lock_file.close()
+            if time.monotonic() >= deadline:
+                with self._cond:
+                    self._stats['timeouts'] += 1
+                raise LLMQueueTimeout(f"LLM request queue wait exceeded {timeout:.1f}s")
+            time.sleep(0.05)
+
+    def _record_wait(self, waited):
+        # 调用方需持有锁
+        self._stats['requests'] += 1
+        if waited > 0.001:
+            self._stats['waits'] += 1
+        self._stats['total_wait_seconds'] += waited
+        self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+
+    def observe(self, headers, status_code=200):
+        """根据响应状态码和限流响应头调整限制"""
+        headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+        now = time.monotonic()
+
+        with self._cond:
+            if status_code == 429:
+                self._stats['rate_limited'] += 1
+                self._success_streak = 0
+                self.limit = max(1, self.limit // 2)
+                retry_after = parse_duration(headers.get('retry-after-ms'))
+                retry_after = retry_after / 1000.0 if retry_after is not None else parse_duration(headers.get('retry-after'))
+                self._paused_until = max(self._paused_until, now + (retry_after if retry_after is not None else 1.0))
+            else:
+                # 加性恢复：连续成功 limit 次后并发上限加一
+                self._success_streak += 1
+                if self.limit < self.max_in_flight and self._success_streak >= self.limit:
+                    self.limit += 1
+                    self._success_streak = 0
+
+            # 从响应头学习 token 上限与剩余额度
+            limit_tokens = headers.get('x-ratelimit-limit-tokens')
+            if limit_tokens and str(limit_tokens).isdigit():
+                learned = int(limit_tokens)
+                if self.tokens_per_minute == 0:
+                    self.tokens_per_minute = learned
+                    self._tokens = float(learned)
+                elif learned < self.tokens_per_minute:
+                    self.tokens_per_minute = learned
+                    self._tokens = min(self._tokens, float(learned))
+
+            remaining_tokens = headers.get('x-ratelimit-remaining-tokens')
+            if remaining_tokens and str(remaining_tokens).isdigit() and self.tokens_per_minute > 0:
+                self._tokens = min(self._tokens, float(remaining_tokens))
+
+            remaining_requests = headers.get('x-ratelimit-remaining-requests')
+            if remaining_requests is not None and str(remaining_requests).strip() == '0':
+                reset = parse_duration(headers.get('x-ratelimit-reset-requests'))
+                if reset:
+                    self._paused_until = max(self._paused_until, now + reset)
+
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """距离限流暂停结束还有多少秒（没有暂停时为 0），用于给客户端的 Retry-After"""
+        with self._cond:
+            return max(0.0, self._paused_until - time.monotonic())
+
+    def stats(self):
+        """返回排队深度、等待时间等指标"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queue_depth'] = self._waiting
+            stats['in_flight'] = self._in_flight
+            stats['concurrency_limit'] = self.limit
+            stats['max_in_flight'] = self.max_in_flight
+            stats['tokens_per_minute'] = self.tokens_per_minute
+            stats['tokens_available'] = int(self._tokens) if self.tokens_per_minute > 0 else None
+            stats['paused_for_seconds'] = round(max(0.0, self._paused_until - time.monotonic()), 3)
+            stats['cross_process'] = bool(self.lock_dir)
+        stats['avg_wait_seconds'] = round(stats['total_wait_seconds'] / stats['requests'], 4) if stats['requests'] else 0.0
+        stats['total_wait_seconds'] = round(stats['total_wait_seconds'], 4)
+        stats['max_wait_seconds'] = round(stats['max_wait_seconds'], 4)
+        return stats
+
+
+# 全局限流器实例
+llm_limiter = LLMLimiter(
+    max_in_flight=LLM_MAX_IN_FLIGHT,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    queue_timeout=LLM_QUEUE_TIMEOUT,
+    lock_dir=LLM_LIMITER_LOCK_DIR
+)
@@ -0,0 +1,286 @@
+"""统一的 LLM 调用层
+
+每个提供方（OpenAI / Gemini）只持有一个共享客户端：OpenAI 使用带连接池和 keep-alive 的
+HTTP 客户端，Gemini 按模型名复用 GenerativeModel。连接数、超时和重试次数统一在这里配置，
+解析器、分析器和 app 中的所有调用都通过 complete()/stream() 发出，经过响应缓存和全局限流器。
+SDK 自身不做重试：每次尝试都单独占用限流器名额，429 等响应都反馈给限流器，由这里统一退避重试。
+"""
+import os
+import time
+import threading
+import httpx
+from openai import OpenAI, DefaultHttpxClient, APIStatusError, APIConnectionError
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import configure, GenerativeModel
+from dotenv import load_dotenv
+
+import prompt_budget
+from llm_cache import llm_cache, LLMCache, LLM_CACHE_ENABLED, is_cacheable
+from llm_limiter import llm_limiter, LLMQueueTimeout
+
+# 加载环境变量
+load_dotenv()
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
+
+# 连接池与超时/重试配置
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+
+# 限流时为每个请求预留的输出 token 数
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "500"))
+
+# 初始化 OpenAI 客户端（进程内共享一个连接池）
+openai_client = None
+try:
+    if OPENAI_API_KEY:
+        openai_client = OpenAI(
+            api_key=OPENAI_API_KEY,
+            # 重试由 _with_retries 负责，每次尝试都经过限流器
+            max_retries=0,
+            http_client=DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+            )
+        )
+        print("LLM provider: OpenAI client initialized successfully")
+    else:
+        print("Warning: OPENAI_API_KEY not found in environment variables")
+except Exception as e:
+    print(f"Error initializing OpenAI client in llm_provider: {e}")
+
+# 配置 Gemini
+gemini_available = False
+try:
+    if GOOGLE_API_KEY:
+        configure(api_key=GOOGLE_API_KEY)
+        gemini_available = True
+except Exception as e:
+    print(f"Error configuring Gemini in llm_provider: {e}")
+
+_gemini_models = {}
+_gemini_lock = threading.Lock()
+
+
+def get_gemini_model(model):
+    """按模型名复用 GenerativeModel 实例"""
+    with _gemini_lock:
+        if model not in _gemini_models:
+            _gemini_models[model] = GenerativeModel(model)
+        return _gemini_models[model]
+
+
+def is_available(provider="openai"):
+    """检查提供方是否已配置"""
+    if provider == "openai":
+        return openai_client is not None
+    if provider == "gemini":
+        return gemini_available
+    return False
+
+
+def complete(messages, model, json=True, temperature=None, provider="openai", timeout=None, refresh=False):
+    """发送一次补全请求并返回文本内容
+
+    Args:
+        messages: OpenAI 格式的消息列表
+        model: 模型名称
+        json: 是否要求模型返回 JSON 对象
+        temperature: 采样温度，为None时使用提供方默认值
+        provider: "openai" 或 "gemini"
+        timeout: 整个调用（排队、请求和重试）的截止时间（秒），为None时不限制
+        refresh: 为True时跳过缓存读取、重新请求模型（结果仍写回缓存）
+
+    Returns:
+        模型返回的文本
+    """
+    response_format = {"type": "json_object"} if json else None
+    key = LLMCache.make_key(model, messages, temperature, response_format, provider)
+
+    if LLM_CACHE_ENABLED and not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if provider == "openai":
+        complete_fn = _complete_openai
+    elif provider == "gemini":
+        complete_fn = _complete_gemini
+    else:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    tokens = _expected_tokens(messages)
+    deadline = time.monotonic() + timeout if timeout is not None else None
+
+    def attempt():
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMQueueTimeout(f"LLM call deadline of {timeout:.1f}s exceeded")
+        with llm_limiter.slot(tokens, timeout=_queue_timeout(remaining)):
+            return complete_fn(messages, model, response_format, temperature, remaining)
+
+    content = _with_retries(attempt)
+
+    if LLM_CACHE_ENABLED and is_cacheable(content, response_format):
+        llm_cache.set(key, content)
+
+    return content
+
+
+def stream(messages, model, temperature=None, refresh=False):
+    """流式补全（仅 OpenAI），逐段产出文本增量
+
+    缓存命中时一次性产出完整文本；流正常结束后把拼接好的完整文本写入缓存。
+    refresh 为True时跳过缓存读取。
+    只在还没有产出任何文本时重试，已经开始输出后出错直接抛出。
+    """
+    key = LLMCache.make_key(model, messages, temperature, None, "openai")
+
+    if LLM_CACHE_ENABLED and not refresh:
+        cached = llm_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    if openai_client is None:
+        raise RuntimeError("OpenAI client not available")
+
+    kwargs = {'model': model, 'messages': messages, 'stream': True}
+    if temperature is not None:
+        kwargs['temperature'] = temperature
+
+    tokens = _expected_tokens(messages)
+    parts = []
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            with llm_limiter.slot(tokens):
+                for chunk in _create_openai(kwargs):
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            break
+        except Exception as e:
+            if parts or attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            _backoff(e, attempt)
+
+    content = ''.join(parts)
+    if LLM_CACHE_ENABLED and is_cacheable(content, None):
+        llm_cache.set(key, content)
+
+
+def _queue_timeout(remaining):
+    """排队时间不超过默认排队上限，也不超过调用剩余的时间"""
+    if remaining is None:
+        return None
+    return min(remaining, llm_limiter.queue_timeout)
+
+
+def _complete_openai(messages, model, response_format, temperature, timeout=None):
+    if openai_client is None:
+        raise RuntimeError("OpenAI client not available")
+
+    kwargs = {'model': model, 'messages': messages}
+    if temperature is not None:
+        kwargs['temperature'] = temperature
+    if response_format is not None:
+        kwargs['response_format'] = response_format
+    if timeout is not None:
+        kwargs['timeout'] = min(timeout, LLM_TIMEOUT)
+
+    response = _create_openai(kwargs)
+    return response.choices[0].message.content
+
+
+def is_retryable(error):
+    """判断一次失败的调用是否值得重试（限流、服务端错误和网络错误）"""
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    if isinstance(error, APIConnectionError):
+        return True
+    return isinstance(error, (
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.InternalServerError,
+        google_exceptions.DeadlineExceeded,
+    ))
+
+
+def is_rate_limited(error):
+    """判断失败是否由提供方限流（429）引起"""
+    if isinstance(error, APIStatusError):
+        return error.status_code == 429
+    return isinstance(error, google_exceptions.ResourceExhausted)
+
+
+def _backoff(error, attempt):
+    # 429 后限流器已经按 Retry-After 暂停发送，下一次 slot() 会等到暂停结束
+    if not is_rate_limited(error):
+        time.sleep(0.5 * (2 ** attempt))
+
+
+def _with_retries(attempt_fn):
+    """执行 attempt_fn，可重试的错误按指数退避最多重试 LLM_MAX_RETRIES 次"""
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            return attempt_fn()
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            print(f"LLM call failed ({e.__class__.__name__}), retrying (attempt {attempt + 1}/{LLM_MAX_RETRIES})")
+            _backoff(e, attempt)
+
+
+def _expected_tokens(messages):
+    """估算一次请求消耗的 token 数（提示词 + 预留输出）"""
+    return prompt_budget.count_message_tokens(messages) + LLM_EXPECTED_OUTPUT_TOKENS
+
+
+def _create_openai(kwargs):
+    """调用 OpenAI 并把限流响应头反馈给限流器"""
+    try:
+        raw_response = openai_client.chat.completions.with_raw_response.create(**kwargs)
+    except APIStatusError as e:
+        llm_limiter.observe(e.response.headers, e.status_code)
+        raise
+    llm_limiter.observe(raw_response.headers, raw_response.status_code)
+    return raw_response.parse()
+
+
+def _complete_gemini(messages, model, response_format, temperature, timeout=None):
+    # 当前 SDK 版本不支持单次请求超时，timeout 只限制排队和重试
+    if not gemini_available:
+        raise RuntimeError("Gemini not configured")
+
+    # Gemini 使用单段文本提示，把消息按顺序拼接
+    if len(messages) == 1:
+        prompt = messages[0]['content']
+    else:
+        prompt = "\n\n".join(message['content'] for message in messages)
+
+    generation_config = {'temperature': temperature} if temperature is not None else None
+
+    try:
+        response = get_gemini_model(model).generate_content(
+            prompt,
+            generation_config=generation_config
+        )
+    except google_exceptions.ResourceExhausted:
+        llm_limiter.observe({}, 429)
+        raise
+    llm_limiter.observe({}, 200)
+    return response.text
@@ -0,0 +1,333 @@
+"""本地确定性简历解析器
+
+不调用 LLM，用预编译的正则识别章节标题、日期、邮箱、电话，输出与 PDF 生成器和
+extract_basic_resume_string 一致的结构（personal_information / experience[] / education[] / skills），
+并给出置信度分数。格式规范的简历可以在毫秒级完成解析，置信度低时再交给 LLM。
+"""
+import re
+
+# 章节标题别名 -> 输出字段
+SECTION_HEADINGS = {
+    'summary': ['summary', 'professional summary', 'profile', 'professional profile', 'about me',
+                'career summary', '个人简介', '自我评价', '个人总结'],
+    'objective': ['objective', 'career objective', '求职意向'],
+    'experience': ['experience', 'work experience', 'professional experience', 'employment',
+                   'employment history', 'work history', 'relevant experience', '工作经历', '工作经验', '实习经历'],
+    'education': ['education', 'academic background', 'education background', 'academics', '教育背景', '教育经历'],
+    'skills': ['skills', 'technical skills', 'core competencies', 'competencies', 'technologies',
+               'skills & tools', 'skills and tools', '技能', '专业技能', '技能特长'],
+    'projects': ['projects', 'personal projects', 'selected projects', 'project experience', '项目经验', '项目经历'],
+    'certifications': ['certifications', 'certificates', 'licenses', 'licenses & certifications',
+                       'licenses and certifications', '证书', '资格证书'],
+    'languages': ['languages', '语言能力'],
+    'awards': ['awards', 'honors', 'honors & awards', 'honors and awards', 'achievements', '获奖情况', '荣誉奖项'],
+    'interests': ['interests', 'hobbies', 'interests & hobbies', '兴趣爱好'],
+    'publications': ['publications', '发表论文'],
+}
+_HEADING_LOOKUP = {alias: key for key, aliases in SECTION_HEADINGS.items() for alias in aliases}
+
+HEADING_RE = re.compile(
+    r"^\s*(?:#+\s*)?(" + "|".join(
+        re.escape(alias).replace(r"\ ", r"\s+")
+        for alias in sorted(_HEADING_LOOKUP, key=len, reverse=True)
+    ) + r")\s*[:：]?\s*$",
+    re.IGNORECASE
+)
+
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+_DATE = rf"(?:{_MONTH}\s*\d{{4}}|\d{{1,2}}[/.]\d{{4}}|\d{{4}}\s*[/.\-年]\s*\d{{1,2}}(?:\s*月)?|\d{{4}})"
+_END_DATE = rf"(?:{_DATE}|present|current|now|today|至今|现在)"
+
+DATE_RANGE_RE = re.compile(rf"({_DATE})\s*(?:-|–|—|~|to|至)\s*({_END_DATE})", re.IGNORECASE)
+DATE_RE = re.compile(rf"(?<![\d\w]){_DATE}(?![\d])", re.IGNORECASE)
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+PHONE_RE = re.compile(r"(?<![\w\d])(?:\+?\d{1,3}[\s.-]?)?(?:\(\d{2,4}\)|\d{2,4})[\s.-]?\d{3,4}[\s.-]?\d{3,4}(?![\d])")
+LINKEDIN_RE = re.compile(r"(?:https?://)?(?:[\w-]+\.)?linkedin\.com/[^\s|,]+", re.IGNORECASE)
+URL_RE = re.compile(r"(?:https?://|www\.)[^\s|,]+|(?:github|gitlab)\.com/[^\s|,]+", re.IGNORECASE)
+BULLET_RE = re.compile(r"^\s*[•●▪■◦\-*–·>]\s*")
+GPA_RE = re.compile(r"GPA\s*[:：]?\s*([0-9]\.[0-9]{1,2}(?:\s*/\s*[0-9.]+)?)", re.IGNORECASE)
+DEGREE_RE = re.compile(
+    r"(?<![A-Za-z])(?:Bachelor(?:'s)?|Master(?:'s)?|Ph\.?\s?D\.?|Doctor(?:ate)?|MBA|B\.?\s?S\.?c?|M\.?\s?S\.?c?|"
+    r"B\.?\s?A\.?|M\.?\s?A\.?|B\.?\s?Eng\.?|M\.?\s?Eng\.?|Associate|Diploma)(?![A-Za-z])|学士|硕士|博士|本科|研究生"
+)
+INSTITUTION_RE = re.compile(r"University|College|Institute|School|Academy|大学|学院", re.IGNORECASE)
+COMPANY_RE = re.compile(
+    r"(?<![A-Za-z])(?:Inc|LLC|Ltd|Corp|Corporation|Company|Co\.|Group|Technologies|Technology|Labs?|GmbH|Limited)(?![A-Za-z])|公司|集团"
+)
+LOCATION_RE = re.compile(r"^[A-Z][A-Za-z.]+(?:\s[A-Z][A-Za-z.]+)*,\s?(?:[A-Z]{2}|[A-Z][a-z]+)$")
+NAME_RE = re.compile(r"^(?:[A-Z][A-Za-z.'-]*(?:\s+[A-Z][A-Za-z.'-]*){1,3}|[\u4e00-\u9fff]{2,4})$")
+SKILL_CATEGORY_RE = re.compile(r"^([^:：]{2,40})[:：]\s*(.+)$")
+FIELD_SPLIT_RE = re.compile(
+    r"\s*\|\s*|\s+[–—-]\s+|\s+at\s+|\s*@\s*|\t|\s{2,}|(?<=[\u4e00-\u9fff])\s+(?=[\u4e00-\u9fff])"
+)
+ITEM_SPLIT_RE = re.compile(r"\s*[,;|、，；•●]\s*")
+
+# 不带项目符号、但这么长的行视为描述而不是条目标题
+DESCRIPTION_MIN_LENGTH = 60
+
+
+def parse_resume_text(text):
+    """把简历原始文本解析成结构化字典
+
+    Returns:
+        (结构化简历, 置信度)，置信度在 0~1 之间
+    """
+    preamble, sections = split_sections(text)
+
+    data = {'personal_information': _parse_personal_information(preamble, text)}
+    for key, lines in sections.items():
+        if not lines:
+            continue
+        if key in ('summary', 'objective'):
+            data[key] = ' '.join(_strip_bullet(line) for line in lines)
+        elif key == 'experience':
+            data[key] = [_parse_experience(entry) for entry in _group_entries(lines)]
+        elif key == 'education':
+            data[key] = [_parse_education(entry) for entry in _group_entries(lines)]
+        elif key == 'skills':
+            data[key] = _parse_skills(lines)
+        elif key == 'projects':
+            data[key] = [_parse_project(entry) for entry in _group_entries(lines)]
+        elif key == 'certifications':
+            data[key] = [_parse_certification(line) for line in lines]
+        else:
+            data[key] = [_strip_bullet(line) for line in lines]
+
+    return data, _confidence(data, sections)
+
+
+def split_sections(text):
+    """按章节标题切分文本
+
+    Returns:
+        (第一个标题之前的行, {章节字段: 行列表})
+    """
+    preamble = []
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        match = HEADING_RE.match(line)
+        if match:
+            current = _HEADING_LOOKUP[re.sub(r"\s+", " ", match.group(1).lower())]
+            sections.setdefault(current, [])
+        elif current is None:
+            preamble.append(line)
+        else:
+            sections[current].append(line)
+    return preamble, sections
+
+
+def _strip_bullet(line):
+    return BULLET_RE.sub('', line, count=1).strip()
+
+
+def _parse_personal_information(preamble, text):
+    info = {}
+    header = '\n'.join(preamble) or text
+
+    for line in preamble[:5]:
+        candidate = line.strip()
+        if NAME_RE.match(candidate) and not EMAIL_RE.search(candidate):
+            info['name'] = candidate
+            break
+
+    for field, pattern in (('email', EMAIL_RE), ('phone', PHONE_RE), ('linkedin', LINKEDIN_RE)):
+        match = pattern.search(header) or pattern.search(text)
+        if match and (field != 'phone' or len(re.sub(r"\D", "", match.group(0))) >= 7):
+            info[field] = match.group(0).strip()
+
+    for match in URL_RE.finditer(header):
+        if 'linkedin' not in match.group(0).lower():
+            info['website'] = match.group(0)
+            break
+
+    for line in preamble:
+        for part in FIELD_SPLIT_RE.split(line):
+            if LOCATION_RE.match(part.strip()):
+                info['address'] = part.strip()
+                break
+        if 'address' in info:
+            break
+
+    return info
+
+
+def _group_entries(lines):
+    """把章节内的行分组成条目：每个条目是若干标题行加若干描述行"""
+    entries = []
+    current = None
+    for line in lines:
+        if BULLET_RE.match(line):
+            if current is None:
+                current = {'headers': [], 'bullets': []}
+                entries.append(current)
+            current['bullets'].append(_strip_bullet(line))
+            continue
+
+        has_dates = DATE_RANGE_RE.search(line) is not None
+        is_description = len(line) > DESCRIPTION_MIN_LENGTH or line[0].islower()
+        is_continuation = is_description or not line[0].isalpha()
+        if current is not None and current['bullets'] and not has_dates and is_continuation:
+            # PDF 换行产生的续行，接到上一条描述后面
+            current['bullets'][-1] += ' ' + line
+        elif current is not None and not current['bullets'] and current['headers'] and is_description and not has_dates:
+            current['bullets'].append(line)
+        elif current is None or current['bullets'] or (has_dates and current.get('dates')):
+            current = {'headers': [line], 'bullets': []}
+            if has_dates:
+                current['dates'] = True
+            entries.append(current)
+        else:
+            current['headers'].append(line)
+            if has_dates:
+                current['dates'] = True
+    return entries
+
+
+def _split_header(headers):
+    """从标题行中取出日期，并把剩余内容拆分成字段"""
+    dates = ''
+    parts = []
+    for line in headers:
+        match = DATE_RANGE_RE.search(line)
+        if match and not dates:
+            dates = f"{match.group(1)} - {match.group(2)}"
+            line = line[:match.start()] + ' ' + line[match.end():]
+        elif not dates:
+            single = DATE_RE.search(line)
+            if single:
+                dates = single.group(0)
+                line = line[:single.start()] + ' ' + line[single.end():]
+        for part in FIELD_SPLIT_RE.split(line):
+            part = part.strip(' ,|()–—-')
+            if part:
+                parts.append(part)
+    return dates, parts
+
+
+def _parse_experience(entry):
+    dates, parts = _split_header(entry['headers'])
+    job = {}
+
+    location = next((part for part in parts if LOCATION_RE.match(part)), None)
+    parts = [part for part in parts if part != location]
+    company = next((part for part in parts if COMPANY_RE.search(part)), None)
+    others = [part for part in parts if part != company]
+
+    if others:
+        job['position'] = others[0]
+        if company is None and len(others) > 1:
+            company = others[1]
+    if company:
+        job['company'] = company
+    if location:
+        job['location'] = location
+    if dates:
+        job['dates'] = dates
+    job['responsibilities'] = entry['bullets']
+    return job
+
+
+def _parse_education(entry):
+    dates, parts = _split_header(entry['headers'])
+    edu = {}
+
+    for part in parts:
+        if 'institution' not in edu and INSTITUTION_RE.search(part):
+            edu['institution'] = part
+        elif 'degree' not in edu and DEGREE_RE.search(part):
+            degree, _, field = part.partition(' in ')
+            edu['degree'] = degree.strip(' ,')
+            if field:
+                edu['field_of_study'] = field.strip(' ,')
+        elif LOCATION_RE.match(part):
+            edu['location'] = part
+        elif 'field_of_study' not in edu and 'institution' in edu:
+            edu['field_of_study'] = part
+    if 'institution' not in edu and parts:
+        edu['institution'] = parts[0]
+    if dates:
+        edu['dates'] = dates
+
+    details = []
+    for line in entry['headers'] + entry['bullets']:
+        gpa = GPA_RE.search(line)
+        if gpa and 'gpa' not in edu:
+            edu['gpa'] = gpa.group(1)
+    for line in entry['bullets']:
+        if not GPA_RE.fullmatch(line.strip()):
+            details.append(line)
+    if details:
+        edu['details'] = details
+    return edu
+
+
+def _parse_skills(lines):
+    skills = {}
+    for line in lines:
+        line = _strip_bullet(line)
+        match = SKILL_CATEGORY_RE.match(line)
+        if match:
+            category = re.sub(r"\W+", "_", match.group(1).strip().lower()).strip('_') or 'general'
+            items = match.group(2)
+        else:
+            category = 'general'
+            items = line
+        values = [item for item in ITEM_SPLIT_RE.split(items) if item]
+        skills.setdefault(category, []).extend(values)
+    return skills
+
+
+def _parse_project(entry):
+    dates, parts = _split_header(entry['headers'])
+    project = {}
+    if parts:
+        project['name'] = parts[0]
+    if len(parts) > 1:
+        project['technologies'] = parts[1]
+    if dates:
+        project['dates'] = dates
+    project['description'] = entry['bullets']
+    return project
+
+
+def _parse_certification(line):
+    line = _strip_bullet(line)
+    cert = {}
+    date = DATE_RE.search(line)
+    if date:
+        cert['date'] = date.group(0)
+        line = line[:date.start()] + line[date.end():]
+    cert['name'] = line.strip(' ,|()–—-')
+    return cert
+
+
+def _confidence(data, sections):
+    """根据识别出的关键字段估算解析质量"""
+    if not sections:
+        return 0.0
+
+    info = data['personal_information']
+    score = 0.0
+    if info.get('name'):
+        score += 0.15
+    if info.get('email') or info.get('phone'):
+        score += 0.15
+
+    experience = data.get('experience') or []
+    if experience:
+        complete = sum(1 for job in experience if job.get('position') and (job.get('company') or job.get('dates')))
+        score += 0.3 * complete / len(experience)
+
+    education = data.get('education') or []
+    if education:
+        complete = sum(1 for edu in education if edu.get('degree') or edu.get('dates'))
+        score += 0.2 * complete / len(education)
+
+    if data.get('skills'):
+        score += 0.2
+
+    return round(score, 2)
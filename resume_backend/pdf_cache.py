@@ -0,0 +1,177 @@
+"""生成的简历 PDF 缓存
+
+按 (简历内容哈希, 生成器配置, 生成器版本) 计算的键把生成好的 PDF 保存在磁盘上，相同内容再次下载时
+直接返回缓存的文件，不再重新排版。同一份内容的各个变体（不同 fit_pages）放在以内容哈希命名的子目录中，
+内容被修改后可以一起删除。页数记录在文件名中（{key}.p{页数}.pdf），命中时不必重新解析 PDF。
+
+总大小超过 PDF_CACHE_MAX_BYTES 时按最近最少使用淘汰（见 disk_lru）。不在进程内维护索引：
+多个 worker 共享同一目录时，每次写入后在目录锁中按磁盘上的实际文件计算总大小并淘汰。
+命中/未命中等计数为本进程的统计。
+"""
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dotenv import load_dotenv
+
+import disk_lru
+
+# 加载环境变量
+load_dotenv()
+
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "resume_pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+
+# 超过这个时间的临时文件视为上次未完成的写入（其他 worker 可能正在写入较新的临时文件）
+_STALE_TMP_SECONDS = 3600
+
+
+def _is_pdf(path):
+    return path.endswith('.pdf')
+
+
+class PDFArtifactCache:
+    """磁盘上的 PDF 缓存，按总大小做 LRU 淘汰"""
+
+    def __init__(self, cache_dir, max_bytes=200 * 1024 * 1024, enabled=True):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存文件总大小上限
+            enabled: 为 False 时 read 总是未命中，put_bytes 不保存
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.tmp_dir = os.path.join(self.cache_dir, ".tmp")
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+
+        if self.enabled:
+            os.makedirs(self.tmp_dir, exist_ok=True)
+            self._clean_tmp()
+            disk_lru.evict(self.cache_dir, self.max_bytes, include=_is_pdf)
+
+    def _clean_tmp(self):
+        """清理上次未完成的临时文件"""
+        cutoff = time.time() - _STALE_TMP_SECONDS
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _group_dir(self, group):
+        return os.path.join(self.cache_dir, group)
+
+    def _find(self, group, key):
+        """查找键对应的文件，返回 (路径, 页数)；页数未记录时为None"""
+        try:
+            names = os.listdir(self._group_dir(group))
+        except FileNotFoundError:
+            return None, None
+        for name in names:
+            stem, _, pages = name[:-len('.pdf')].partition('.p')
+            if name.endswith('.pdf') and stem == key:
+                return os.path.join(self._group_dir(group), name), int(pages) if pages else None
+        return None, None
+
+    def read(self, group, key):
+        """读取缓存的 PDF
+
+        Args:
+            group: 内容哈希，同一内容的各个变体在同一组
+            key: 缓存键
+
+        Returns:
+            (PDF 数据, 页数)，页数未记录时为None；未命中（包括查到后文件已被其他进程淘汰）时返回None
+        """
+        if not self.enabled:
+            return None
+        path, pages = self._find(group, key)
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                disk_lru.touch(path)  # 记录最近使用时间
+                self._count('hits')
+                return data, pages
+        self._count('misses')
+        return None
+
+    def put_bytes(self, group, key, data, pages=None):
+        """把内存中生成的 PDF 写入缓存并按需淘汰；缓存关闭时不保存
+
+        Args:
+            group: 内容哈希
+            key: 缓存键
+            data: PDF 数据
+            pages: 页数，记录后命中时可直接使用
+        """
+        if not self.enabled:
+            return
+        name = f"{key}.pdf" if pages is None else f"{key}.p{pages}.pdf"
+        path = os.path.join(self._group_dir(group), name)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # 在目录锁中移入，避免与删除整组的 invalidate 交错
+            with disk_lru.locked(self.cache_dir):
+                os.makedirs(self._group_dir(group), exist_ok=True)
+                os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._count('stores')
+
+        evicted, _, _ = disk_lru.evict(self.cache_dir, self.max_bytes, keep={path}, include=_is_pdf)
+        if evicted:
+            with self._lock:
+                self._stats['evictions'] += len(evicted)
+            with disk_lru.locked(self.cache_dir):
+                for directory in {os.path.dirname(p) for p in evicted}:
+                    try:
+                        os.rmdir(directory)  # 组内文件都已淘汰时删除空目录
+                    except OSError:
+                        pass
+
+    def invalidate(self, group):
+        """删除某份内容的所有缓存变体（如简历内容被修改后旧内容的 PDF）"""
+        if not self.enabled or not group:
+            return
+        with disk_lru.locked(self.cache_dir):
+            if not os.path.isdir(self._group_dir(group)):
+                return
+            shutil.rmtree(self._group_dir(group), ignore_errors=True)
+        self._count('invalidations')
+
+    def stats(self):
+        """返回本进程的命中/未命中次数和目录的当前占用"""
+        with self._lock:
+            stats = dict(self._stats)
+        files = disk_lru.scan(self.cache_dir, include=_is_pdf) if self.enabled else []
+        stats['entries'] = len(files)
+        stats['bytes'] = sum(size for _, size, _ in files)
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+
+# 全局缓存实例
+pdf_cache = PDFArtifactCache(PDF_CACHE_DIR, PDF_CACHE_MAX_BYTES, PDF_CACHE_ENABLED)
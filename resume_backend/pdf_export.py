@@ -0,0 +1,172 @@
+"""批量导出简历 PDF
+
+ReportLab 排版是 CPU 密集型的纯 Python 代码（受 GIL 限制），批量导出时在进程池中并行生成，
+生成完一份就写入 ZIP 并发送给客户端，不等全部完成，也不在磁盘上保存 ZIP。
+每个请求同时占用的进程数不超过 parallelism，多个导出请求共享同一个进程池。
+已经缓存的 PDF 直接从缓存读取，新生成的 PDF 写入缓存。
+"""
+import os
+import json
+import multiprocessing
+import zipfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+
+from pdf_cache import pdf_cache
+from resume_pdf_generator import pdf_generator
+
+# 加载环境变量
+load_dotenv()
+
+# 进程池大小，<=1 表示在当前进程中逐个生成
+PDF_EXPORT_WORKERS = int(os.getenv("PDF_EXPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 单个导出请求同时生成的 PDF 数上限（请求可以指定更小的值）
+PDF_EXPORT_MAX_PARALLEL = int(os.getenv("PDF_EXPORT_MAX_PARALLEL", "2"))
+# 单个导出请求最多包含的简历数
+PDF_EXPORT_MAX_RESUMES = int(os.getenv("PDF_EXPORT_MAX_RESUMES", "100"))
+
+# 子进程不从多线程的服务进程 fork（fork 会复制其他线程持有的锁），与 pdf_extract 相同
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """延迟创建进程池（没有导出请求时不启动子进程）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PDF_EXPORT_WORKERS, mp_context=_MP_CONTEXT)
+        return _executor
+
+
+def _reset_executor():
+    """子进程异常退出后丢弃进程池，下次使用时重建"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _render(content):
+    """在子进程中生成 PDF"""
+    return pdf_generator.generate_bytes(content)
+
+
+class _ZipBuffer:
+    """ZipFile 写入的只追加缓冲区，每写完一个条目取出已写入的数据发送"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _clamp_parallelism(parallelism):
+    if not parallelism or parallelism < 1:
+        return PDF_EXPORT_MAX_PARALLEL
+    return min(parallelism, PDF_EXPORT_MAX_PARALLEL)
+
+
+def export_zip(items, parallelism=None):
+    """生成包含多份简历 PDF 的 ZIP，按生成完成的顺序逐个输出
+
+    Args:
+        items: [{'resume_id', 'filename', 'content', 'cache_group', 'cache_key'}, ...]，content 为简历内容，
+            cache_group 为内容哈希
+        parallelism: 同时生成的 PDF 数，不超过 PDF_EXPORT_MAX_PARALLEL
+
+    Yields:
+        ZIP 文件的数据块；最后一个条目是 manifest.json，记录每份简历的文件名或错误信息
+    """
+    parallelism = _clamp_parallelism(parallelism)
+    buffer = _ZipBuffer()
+    manifest = []
+
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for item, data, error in _render_all(items, parallelism):
+            if error is None:
+                archive.writestr(item['filename'], data)
+                manifest.append({'resume_id': item['resume_id'], 'filename': item['filename']})
+            else:
+                print(f"Error exporting resume {item['resume_id']}: {error}")
+                manifest.append({'resume_id': item['resume_id'], 'error': str(error)})
+            yield buffer.drain()
+
+        archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+    yield buffer.drain()
+
+
+def _render_all(items, parallelism):
+    """依次返回 (item, PDF 数据, 错误)，顺序为完成的先后"""
+    pending = []
+    for item in items:
+        cached = pdf_cache.read(item['cache_group'], item['cache_key'])
+        if cached:
+            yield item, cached[0], None
+        else:
+            pending.append(item)
+
+    if not pending:
+        return
+    if PDF_EXPORT_WORKERS <= 1 or parallelism <= 1:
+        yield from _render_serial(pending)
+        return
+
+    running = {}
+    queue = list(reversed(pending))
+    try:
+        executor = _get_executor()
+        while queue or running:
+            # 同时提交的任务不超过 parallelism，其余请求仍可使用进程池
+            while queue and len(running) < parallelism:
+                future = executor.submit(_render, queue[-1]['content'])
+                running[future] = queue.pop()
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = running.pop(future)
+                try:
+                    data = future.result()
+                except BrokenProcessPool:
+                    queue.append(item)
+                    raise
+                except Exception as e:
+                    yield item, None, e
+                    continue
+                pdf_cache.put_bytes(item['cache_group'], item['cache_key'], data)
+                yield item, data, None
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Parallel PDF export failed, falling back to serial: {e}")
+        _reset_executor()
+        yield from _render_serial(list(running.values()) + list(reversed(queue)))
+    finally:
+        # 客户端断开时不再生成剩余的 PDF
+        for future in running:
+            future.cancel()
+
+
+def _render_serial(items):
+    for item in items:
+        try:
+            data = pdf_generator.generate_bytes(item['content'])
+        except Exception as e:
+            yield item, None, e
+            continue
+        pdf_cache.put_bytes(item['cache_group'], item['cache_key'], data)
+        yield item, data, None
@@ -0,0 +1,176 @@
+"""PDF 文本提取引擎
+
+每页只提取一次文本；页数达到 PDF_PARALLEL_MIN_PAGES 时把页面按连续区间分给进程池并行提取
+（PyPDF2 是纯 Python 实现，受 GIL 限制，线程池没有加速效果）。
+每页的文本按 (文件 SHA-256, 页码) 缓存在内存 LRU 中，同一文件再次解析时直接命中。
+"""
+import os
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dotenv import load_dotenv
+import PyPDF2
+
+from hashing import file_hash
+
+# 加载环境变量
+load_dotenv()
+
+# 页数达到该值时使用进程池并行提取
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "8"))
+# 进程池大小，<=1 表示始终在当前进程中逐页提取
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 页面文本缓存的最大条目数（页数），<=0 表示不缓存
+PDF_PAGE_CACHE_MAX_ENTRIES = int(os.getenv("PDF_PAGE_CACHE_MAX_ENTRIES", "2048"))
+
+# 子进程不从多线程的服务进程 fork（fork 会复制其他线程持有的锁），优先用 forkserver，不支持时用 spawn
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+class PageCache:
+    """按 (文件哈希, 页码) 缓存页面文本的 LRU"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_many(self, digest, page_count):
+        """返回 {页码: 文本}，只包含命中的页面"""
+        found = {}
+        with self._lock:
+            for index in range(page_count):
+                key = (digest, index)
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[index] = self._entries[key]
+            self._stats['hits'] += len(found)
+            self._stats['misses'] += page_count - len(found)
+        return found
+
+    def put_many(self, digest, pages):
+        """写入 {页码: 文本}"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            for index, text in pages.items():
+                self._entries[(digest, index)] = text
+                self._entries.move_to_end((digest, index))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+page_cache = PageCache(PDF_PAGE_CACHE_MAX_ENTRIES)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """延迟创建进程池（大多数简历只有一两页，用不到）"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS, mp_context=_MP_CONTEXT)
+        return _executor
+
+
+def _warm_up_worker():
+    return os.getpid()
+
+
+def warm_up():
+    """提前启动进程池的全部子进程（用于基准测试，避免把进程启动时间算进提取耗时）"""
+    if PDF_EXTRACT_WORKERS <= 1:
+        return
+    try:
+        executor = _get_executor()
+        futures = [executor.submit(_warm_up_worker) for _ in range(PDF_EXTRACT_WORKERS)]
+        for future in futures:
+            future.result()
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Failed to start the PDF extraction pool: {e}")
+        _reset_executor()
+
+
+def _reset_executor():
+    """子进程异常退出后丢弃进程池，下次使用时重建"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = None
+
+
+def _extract_page_range(file_path, indices):
+    """在子进程中打开 PDF 并提取指定页面的文本"""
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        return [reader.pages[index].extract_text() or "" for index in indices]
+
+
+def _chunk(indices, parts):
+    """把页码列表切成至多 parts 个连续区间，每个子进程只打开一次文件"""
+    size = -(-len(indices) // parts)
+    return [indices[i:i + size] for i in range(0, len(indices), size)]
+
+
+def extract_pages(file_path, digest=None):
+    """提取 PDF 每一页的文本
+
+    Args:
+        file_path: PDF 文件路径
+        digest: 文件内容的 SHA-256，为None时现场计算
+
+    Returns:
+        每页文本组成的列表（无法提取文本的页面为空字符串）
+    """
+    digest = digest or file_hash(file_path)
+
+    with open(file_path, 'rb') as f:
+        reader = PyPDF2.PdfReader(f)
+        page_count = len(reader.pages)
+        pages = page_cache.get_many(digest, page_count)
+        missing = [index for index in range(page_count) if index not in pages]
+
+        extracted = None
+        if len(missing) >= PDF_PARALLEL_MIN_PAGES and PDF_EXTRACT_WORKERS > 1:
+            extracted = _extract_parallel(file_path, missing)
+        if extracted is None:
+            extracted = {index: reader.pages[index].extract_text() or "" for index in missing}
+
+    page_cache.put_many(digest, extracted)
+    pages.update(extracted)
+    return [pages[index] for index in range(page_count)]
+
+
+def _extract_parallel(file_path, indices):
+    """用进程池提取页面，进程池不可用时返回None由调用方逐页提取"""
+    chunks = _chunk(indices, PDF_EXTRACT_WORKERS)
+    try:
+        executor = _get_executor()
+        futures = [executor.submit(_extract_page_range, file_path, chunk) for chunk in chunks]
+        extracted = {}
+        for chunk, future in zip(chunks, futures):
+            extracted.update(zip(chunk, future.result()))
+        return extracted
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Parallel PDF extraction failed, falling back to serial: {e}")
+        _reset_executor()
+        return None
@@ -0,0 +1,267 @@
+"""提示词 token 预算
+
+在本地统计 token 数，并在发送给 LLM 之前压缩简历内容：合并空白、去掉 PDF 每页重复的页眉页脚、
+紧凑序列化 JSON，超出各接口的 token 预算时优先裁掉低优先级的章节。
+"""
+import os
+import re
+import json
+from collections import Counter
+from dotenv import load_dotenv
+
+# 加载环境变量
+load_dotenv()
+
+# tiktoken 为可选依赖，未安装时使用本地估算
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# 各接口简历内容的 token 预算
+PROMPT_BUDGETS = {
+    'parse': int(os.getenv("PROMPT_BUDGET_PARSE", "6000")),
+    'analyze': int(os.getenv("PROMPT_BUDGET_ANALYZE", "6000")),
+    'job_suggestions': int(os.getenv("PROMPT_BUDGET_JOB_SUGGESTIONS", "4000")),
+    'keywords': int(os.getenv("PROMPT_BUDGET_KEYWORDS", "4000")),
+    'content_string': int(os.getenv("PROMPT_BUDGET_CONTENT_STRING", "4000")),
+}
+
+# 章节优先级：数值越大越先被裁掉，按规范化后的键名精确匹配（见 normalize_section_key）
+SECTION_PRIORITIES = [
+    (('personal_info', 'personal_information', 'personal_details', 'contact', 'contact_info',
+      'contact_information', 'name', 'email', 'phone', '个人信息', '联系方式'), 0),
+    (('summary', 'professional_summary', 'objective', 'career_objective', 'profile',
+      'professional_profile', 'about', 'about_me', '概述', '简介', '个人简介', '求职意向'), 1),
+    (('experience', 'experiences', 'work_experience', 'professional_experience', 'employment',
+      'employment_history', 'work_history', '工作经历', '工作经验'), 1),
+    (('skills', 'skill', 'technical_skills', 'technologies', 'competencies', 'core_competencies',
+      '技能', '专业技能'), 1),
+    (('education', 'education_background', '教育', '教育背景', '教育经历'), 2),
+    (('projects', 'project', 'project_experience', 'personal_projects', '项目', '项目经历', '项目经验'), 2),
+    (('certifications', 'certification', 'certificates', 'licenses', 'awards', 'honors', 'achievements',
+      'publications', '证书', '获奖情况', '荣誉奖项', '发表论文'), 3),
+    (('languages', 'language', '语言', '语言能力'), 3),
+    (('interests', 'hobbies', 'references', 'volunteer', 'volunteering', 'volunteer_experience',
+      'other', 'others', 'additional_information', '兴趣', '爱好', '兴趣爱好', '其他'), 5),
+]
+_SECTION_PRIORITY_LOOKUP = {key: priority for keys, priority in SECTION_PRIORITIES for key in keys}
+DEFAULT_SECTION_PRIORITY = 4
+
+_WORD_RE = re.compile(r"[A-Za-z]+|\d+|[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af]|[^\sA-Za-z\d]")
+_INLINE_SPACE_RE = re.compile(r"[ \t\u00a0\u3000]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+_DIGITS_RE = re.compile(r"\d+")
+_KEY_SEPARATOR_RE = re.compile(r"[^\w]+|_+")
+
+# 页眉页脚只在每页首尾这几行中查找
+HEADER_FOOTER_LINES = 3
+
+
+def count_tokens(text):
+    """统计文本的 token 数（安装了 tiktoken 时精确计算，否则按词估算）"""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+
+    tokens = 0
+    for match in _WORD_RE.finditer(text):
+        piece = match.group(0)
+        if piece.isascii() and piece.isalnum():
+            # 英文单词/数字大约每4~5个字符一个token
+            tokens += max(1, round(len(piece) / 4.5))
+        else:
+            tokens += 1
+    return tokens
+
+
+def count_message_tokens(messages):
+    """统计一组聊天消息的 token 数（每条消息约有4个token的格式开销）"""
+    return sum(count_tokens(message['content']) + 4 for message in messages)
+
+
+def collapse_whitespace(text):
+    """合并行内连续空白和多余空行"""
+    lines = [_INLINE_SPACE_RE.sub(' ', line).strip() for line in text.splitlines()]
+    return _BLANK_LINES_RE.sub('\n\n', '\n'.join(lines)).strip()
+
+
+def strip_repeated_headers(pages):
+    """去掉在多数页面首尾重复出现的页眉页脚行
+
+    行内数字会被归一化，所以 "Page 1 of 3" 这类页码也会被识别。
+
+    Args:
+        pages: 每页提取出的文本列表
+
+    Returns:
+        去掉页眉页脚后的每页文本列表
+    """
+    if len(pages) < 2:
+        return pages
+
+    def edge_indexes(lines):
+        # 短页面只看首尾各一行，避免把正文当成页眉页脚
+        depth = HEADER_FOOTER_LINES if len(lines) > 2 * HEADER_FOOTER_LINES else 1
+        indexes = set(range(min(depth, len(lines))))
+        indexes.update(range(max(0, len(lines) - depth), len(lines)))
+        return indexes
+
+    def normalize(line):
+        return _DIGITS_RE.sub('#', line.strip().lower())
+
+    page_lines = [[line for line in page.splitlines() if line.strip()] for page in pages]
+
+    counts = Counter()
+    for lines in page_lines:
+        counts.update({normalize(lines[i]) for i in edge_indexes(lines)})
+
+    threshold = max(2, (len(pages) + 1) // 2)
+    repeated = {line for line, count in counts.items() if count >= threshold}
+    if not repeated:
+        return pages
+
+    cleaned = []
+    for lines in page_lines:
+        edges = edge_indexes(lines)
+        cleaned.append('\n'.join(
+            line for i, line in enumerate(lines)
+            if not (i in edges and normalize(line) in repeated)
+        ))
+    return cleaned
+
+
+def compact_json(data):
+    """紧凑序列化 JSON（无缩进、无多余空格）"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def normalize_section_key(key):
+    """规范化章节键名：小写，空格、连字符等分隔符统一为单个下划线（"Work Experience" -> "work_experience"）"""
+    return _KEY_SEPARATOR_RE.sub('_', str(key).lower()).strip('_')
+
+
+def section_priority(key):
+    """返回章节的裁剪优先级，数值越大越先被裁掉；未知的键名使用默认优先级"""
+    return _SECTION_PRIORITY_LOOKUP.get(normalize_section_key(key), DEFAULT_SECTION_PRIORITY)
+
+
+def truncate_to_tokens(text, budget):
+    """按行截断文本，使其不超过 token 预算"""
+    if count_tokens(text) <= budget:
+        return text
+
+    kept = []
+    used = 0
+    for line in text.splitlines():
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > budget:
+            break
+        kept.append(line)
+        used += line_tokens
+
+    if not kept:
+        # 单行就超出预算，按字符比例截断
+        ratio = budget / max(count_tokens(text), 1)
+        return text[:int(len(text) * ratio)]
+    return '\n'.join(kept)
+
+
+def trim_value(value, budget):
+    """按结构裁剪 JSON 值，使其序列化后大约不超过 token 预算
+
+    列表和字典从末尾开始丢弃元素，放不下的最后一个元素递归裁剪，字符串按行截断。
+    裁剪的是数据本身而不是序列化后的字符串，所以结果始终是合法的 JSON。
+    """
+    if budget <= 0:
+        return None
+    if isinstance(value, str):
+        return truncate_to_tokens(value, budget)
+    if isinstance(value, (list, tuple)):
+        kept = []
+        used = 2
+        for item in value:
+            item_tokens = count_tokens(compact_json(item)) + 1
+            if used + item_tokens > budget:
+                rest = trim_value(item, budget - used - 1)
+                if rest not in (None, '', [], {}):
+                    kept.append(rest)
+                break
+            kept.append(item)
+            used += item_tokens
+        return kept
+    if isinstance(value, dict):
+        kept = {}
+        used = 2
+        for key, item in value.items():
+            key_tokens = count_tokens(compact_json(key)) + 1
+            item_tokens = count_tokens(compact_json(item)) + 1
+            if used + key_tokens + item_tokens > budget:
+                rest = trim_value(item, budget - used - key_tokens - 1)
+                if rest not in (None, '', [], {}):
+                    kept[key] = rest
+                break
+            kept[key] = item
+            used += key_tokens + item_tokens
+        return kept
+    return value
+
+
+def build_resume_text(text, endpoint):
+    """把原始简历文本压缩到指定接口的 token 预算内
+
+    Returns:
+        (文本, 信息字典)，信息字典包含 tokens / budget / truncated
+    """
+    budget = PROMPT_BUDGETS[endpoint]
+    text = collapse_whitespace(text)
+    truncated = count_tokens(text) > budget
+    if truncated:
+        text = truncate_to_tokens(text, budget)
+    return text, {'tokens': count_tokens(text), 'budget': budget, 'truncated': truncated}
+
+
+def build_resume_json(content, endpoint):
+    """把结构化简历内容紧凑序列化，并按优先级裁剪到指定接口的 token 预算内
+
+    Returns:
+        (文本, 信息字典)，信息字典包含 tokens / budget / truncated / trimmed_sections
+    """
+    budget = PROMPT_BUDGETS[endpoint]
+
+    if not isinstance(content, dict):
+        return build_resume_text(str(content), endpoint)
+
+    content = dict(content)
+    trimmed = []
+    text = compact_json(content)
+
+    # 从最低优先级开始逐个删除章节，最高优先级的章节保留
+    candidates = sorted(
+        (key for key in content if section_priority(key) > 0),
+        key=lambda key: (section_priority(key), count_tokens(compact_json(content[key]))),
+        reverse=True
+    )
+    for key in candidates:
+        if count_tokens(text) <= budget or len(content) == 1:
+            break
+        del content[key]
+        trimmed.append(key)
+        text = compact_json(content)
+
+    truncated = count_tokens(text) > budget
+    if truncated:
+        # 剩下的高优先级章节仍然超出预算时在章节内部按结构裁剪（不截断 JSON 字符串）
+        target = budget
+        while count_tokens(text) > budget and target > 0:
+            text = compact_json(trim_value(content, target))
+            target = int(target * 0.9)
+
+    return text, {
+        'tokens': count_tokens(text),
+        'budget': budget,
+        'truncated': truncated,
+        'trimmed_sections': trimmed
+    }
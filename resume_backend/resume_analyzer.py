@@ -1,46 +1,41 @@
 import os
 import json
-from google.generativeai import configure, GenerativeModel
-from openai import OpenAI
+import math
+import time
+import textwrap
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dotenv import load_dotenv
+import llm_provider
+import prompt_budget
+from llm_limiter import llm_limiter, LLMQueueTimeout
 
 # Load environment variables
 load_dotenv()
 
 # Configure API keys
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 
 # Default to use OpenAI since we have a valid key
-USE_OPENAI = OPENAI_API_KEY is not None and OPENAI_API_KEY.startswith('sk-')
-USE_GEMINI = not USE_OPENAI and GOOGLE_API_KEY is not None
+USE_OPENAI = OPENAI_API_KEY is not None and OPENAI_API_KEY.startswith('sk-') and llm_provider.is_available("openai")
+USE_GEMINI = not USE_OPENAI and llm_provider.is_available("gemini")
 
-if USE_GEMINI:
-    configure(api_key=GOOGLE_API_KEY)
+# 对冲模式：主提供方在 ANALYZER_HEDGE_AFTER 秒（约为其 p95 延迟）内没有返回时，
+# 把同一提示词再发给备用提供方，先返回有效 JSON 的一方胜出
+ANALYZER_HEDGING = os.getenv("ANALYZER_HEDGING", "0").lower() in ("1", "true", "yes")
+ANALYZER_PRIMARY = os.getenv("ANALYZER_PRIMARY", "openai")
+ANALYZER_SECONDARY = os.getenv("ANALYZER_SECONDARY", "gemini")
+ANALYZER_HEDGE_AFTER = float(os.getenv("ANALYZER_HEDGE_AFTER", "8"))
+ANALYZER_DEADLINE = float(os.getenv("ANALYZER_DEADLINE", "90"))
 
-# Initialize the OpenAI client if needed
-openai_client = None
-if USE_OPENAI:
-    try:
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
-        print("Resume analyzer: OpenAI client initialized successfully") 
-    except Exception as e:
-        print(f"Error initializing OpenAI client in resume_analyzer: {e}")
-        USE_OPENAI = False
-
-def analyze_resume(resume_text):
-    """
-    Analyze resume content using LLM (either Google Gemini or OpenAI GPT)
-    and return analysis and scores
-    """
-    prompt = f"""
-You are a senior hiring manager and resume evaluation expert specializing in software engineering and machine learning engineering roles.
+ANALYSIS_SYSTEM_PROMPT = "You are a professional resume analysis assistant. Return only JSON. No explanations or markdown."
 
-Please analyze the following resume and evaluate it as if it were submitted for a position in software development or machine learning engineering (MLE). Provide an expert-level review focusing on both technical and structural aspects.
+# 评分提示词的各部分，单独分析和 combined 模式共用同一套评分标准
+ANALYSIS_ROLE = "You are a senior hiring manager and resume evaluation expert specializing in software engineering and machine learning engineering roles."
 
-Your response must be a **strictly valid JSON object** with the following structure:
+ANALYSIS_TASK = "Please analyze the following resume and evaluate it as if it were submitted for a position in software development or machine learning engineering (MLE). Provide an expert-level review focusing on both technical and structural aspects."
 
-{{
+ANALYSIS_SCHEMA = """{
   "overall_score": <integer 0-100>,
   "technical_score": <integer 0-100>,
   "communication_score": <integer 0-100>,
@@ -48,89 +43,371 @@ Your response must be a **strictly valid JSON object** with the following struct
   "strengths": [<list of strengths>],
   "areas_for_improvement": [<list of areas for improvement>],
   "suggestions": [<list of practical suggestions>],
-  "ats_compatibility": {{
+  "ats_compatibility": {
     "score": <integer>,
     "comments": <string>
-  }}
-}}
+  }
+}"""
 
-Evaluation Criteria:
+ANALYSIS_CRITERIA = """Evaluation Criteria:
 - Relevance of technical skills (languages, frameworks, ML tools, cloud, etc.)
 - Clarity and structure of work experience (roles, achievements, measurable impact)
 - Use of metrics to quantify results
 - Presence of strong project experience (open-source, production-level, or research)
 - Communication quality and readability
 - ATS-friendly formatting and relevant keywords
-- Relevance of education, certifications, and training
+- Relevance of education, certifications, and training"""
+
+ANALYSIS_JSON_ONLY = "Please **only return JSON**. Do NOT use code blocks (like ```json), markdown, or explanation."
+
+class AnalysisUnavailable(Exception):
+    """The LLM provider is rate limited or unreachable; the client should retry later"""
 
-Please **only return JSON**. Do NOT use code blocks (like ```json), markdown, or explanation.
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+def unavailable_error(provider, error):
+    """Wrap a rate-limit, queue-timeout or transient provider error as AnalysisUnavailable
+
+    Other errors are returned unchanged so they surface as server errors.
+    """
+    if not isinstance(error, LLMQueueTimeout) and not llm_provider.is_retryable(error):
+        return error
+    retry_after = llm_limiter.retry_after()
+    response = getattr(error, 'response', None)
+    if response is not None:
+        header = response.headers.get('retry-after')
+        if header and header.strip().isdigit():
+            retry_after = max(retry_after, float(header))
+    return AnalysisUnavailable(f"{provider} is unavailable: {error}", max(1, math.ceil(retry_after)))
+
+ANALYZER_HEDGE_WORKERS = int(os.getenv("ANALYZER_HEDGE_WORKERS", "8"))
+_hedge_executor = ThreadPoolExecutor(max_workers=ANALYZER_HEDGE_WORKERS)
+
+def build_analysis_prompt(resume_prompt_text):
+    """Build the scoring prompt for resume text that already fits the analyze budget"""
+    return f"""
+{ANALYSIS_ROLE}
+
+{ANALYSIS_TASK}
+
+Your response must be a **strictly valid JSON object** with the following structure:
+
+{ANALYSIS_SCHEMA}
+
+{ANALYSIS_CRITERIA}
+
+{ANALYSIS_JSON_ONLY}
 
 Resume:
-{resume_text}
+{resume_prompt_text}
     """
 
-    if USE_OPENAI and openai_client:
-        return analyze_with_openai(prompt)
-    elif USE_GEMINI:
-        return analyze_with_gemini(prompt)
+def analyze_resume(resume_text, meta=None):
+    """
+    Analyze resume content using LLM (either Google Gemini or OpenAI GPT)
+    and return analysis and scores
+    
+    If a meta dict is passed, the prompt token count, the provider that
+    answered and its latency are written into it.
+    """
+    # Serialize compactly and trim low-priority sections to the analyze token budget
+    if isinstance(resume_text, dict):
+        resume_prompt_text, budget_info = prompt_budget.build_resume_json(resume_text, 'analyze')
     else:
-        return generate_mock_analysis(resume_text)
+        resume_prompt_text, budget_info = prompt_budget.build_resume_text(str(resume_text), 'analyze')
+    
+    prompt = build_analysis_prompt(resume_prompt_text)
+    
+    if meta is not None:
+        meta['prompt_tokens'] = prompt_budget.count_tokens(prompt)
+        meta['prompt_truncated'] = budget_info['truncated']
+        if budget_info.get('trimmed_sections'):
+            meta['trimmed_sections'] = budget_info['trimmed_sections']
 
-def analyze_with_openai(prompt):
-    """Use OpenAI's GPT model for analysis"""
-    try:
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": "You are a professional resume analysis assistant. Return only JSON. No explanations or markdown."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.2,
-        )
+    # 模拟评分基于完整内容，不受提示词预算裁剪影响
+    full_text = resume_text if isinstance(resume_text, str) else json.dumps(resume_text, ensure_ascii=False)
+    return run_analysis_prompt(prompt, meta, mock=lambda: generate_mock_analysis(full_text))
+
+def llm_available():
+    """Check whether analysis prompts can be sent to a real model"""
+    hedging = ANALYZER_HEDGING and provider_available(ANALYZER_PRIMARY) and provider_available(ANALYZER_SECONDARY)
+    return hedging or USE_OPENAI or USE_GEMINI
+
+def run_analysis_prompt(prompt, meta=None, mock=None):
+    """Send an analysis prompt through hedging or the configured provider
+
+    Args:
+        prompt: complete prompt text
+        meta: optional dict that receives provider, latency_ms and hedged
+        mock: called to produce the result when no provider is configured;
+            without it a RuntimeError is raised instead
+
+    Returns:
+        the JSON object returned by the model
+    """
+    if ANALYZER_HEDGING and provider_available(ANALYZER_PRIMARY) and provider_available(ANALYZER_SECONDARY):
+        return analyze_with_hedging(prompt, meta)
+
+    start = time.monotonic()
+    if USE_OPENAI:
+        provider, analysis = "openai", analyze_with_openai(prompt)
+    elif USE_GEMINI:
+        provider, analysis = "gemini", analyze_with_gemini(prompt)
+    elif mock is not None:
+        provider, analysis = "mock", mock()
+    else:
+        raise RuntimeError("No LLM provider is configured")
 
-        result_text = response.choices[0].message.content.strip()
+    if meta is not None:
+        meta['provider'] = provider
+        meta['latency_ms'] = int((time.monotonic() - start) * 1000)
+        meta['hedged'] = False
+    return analysis
 
-        # Clean up markdown code block if present
-        if result_text.startswith("```json"):
-            result_text = result_text[len("```json"):].strip()
-        if result_text.endswith("```"):
-            result_text = result_text[:-3].strip()
+def analyze_with_openai(prompt):
+    """Use OpenAI's GPT model for analysis
 
-        return json.loads(result_text)
+    Raises:
+        AnalysisUnavailable: rate limited, queue timeout or transient API error
+    """
+    try:
+        result_text = _openai_provider(prompt).strip()
+    except Exception as e:
+        raise unavailable_error("OpenAI", e) from e
 
+    try:
+        return parse_analysis_json(result_text)
     except json.JSONDecodeError:
         return {
             "error": "Failed to parse model response",
             "raw_response": result_text
         }
-    except Exception as e:
-        return {
-            "error": f"OpenAI API error: {str(e)}",
-            "overall_score": 50,
-            "technical_score": 50,
-            "communication_score": 50,
-            "ats_compatibility_score": 50,
-            "strengths": ["Unable to analyze due to API error"],
-            "areas_for_improvement": ["Try again later"],
-            "suggestions": ["Check API key configuration"],
-            "ats_compatibility": {
-                "score": 50,
-                "comments": "Unable to analyze due to API error"
-            }
-        }
+
+def parse_analysis_json(result_text):
+    """Strip an optional markdown code fence and parse the model's JSON"""
+    result_text = result_text.strip()
+    if result_text.startswith("```json"):
+        result_text = result_text[len("```json"):].strip()
+    if result_text.endswith("```"):
+        result_text = result_text[:-3].strip()
+    return json.loads(result_text)
 
 def analyze_with_gemini(prompt):
     """Use Google's Gemini model for analysis"""
-    model = GenerativeModel('gemini-pro')
-    response = model.generate_content(prompt)
     try:
-        return json.loads(response.text)
+        response_text = _gemini_provider(prompt)
+    except Exception as e:
+        raise unavailable_error("Gemini", e) from e
+    try:
+        return json.loads(response_text)
     except json.JSONDecodeError:
         return {
             "error": "Failed to parse model response",
-            "raw_response": response.text
+            "raw_response": response_text
         }
 
+# combined 模式中 "resume" 部分的解析说明（与 resume_parser 的解析提示词一致）
+COMBINED_PARSE_INSTRUCTIONS = """"resume": 根据简历中实际出现的内容自动分类（如个人信息、教育背景、工作经历、技能、项目经验、证书、语言能力等），
+字段名可以根据实际内容自定义，只需确保结构清晰合理，便于数据库存储。"""
+
+def build_combined_prompt(resume_prompt_text):
+    """Build the single-call prompt that parses raw resume text and scores it
+
+    The "analysis" part uses the same role, schema and criteria as
+    build_analysis_prompt, so both pipelines score resumes the same way.
+    """
+    analysis_schema = textwrap.indent(ANALYSIS_SCHEMA, "  ").lstrip()
+    return f"""
+{ANALYSIS_ROLE}
+
+Parse the following raw resume text into structured data, then evaluate it as if it were submitted for a position in software development or machine learning engineering (MLE). Provide an expert-level review focusing on both technical and structural aspects.
+
+Your response must be a **strictly valid JSON object** with the following structure:
+
+{{
+  "resume": {{ <structured resume content> }},
+  "analysis": {analysis_schema}
+}}
+
+{COMBINED_PARSE_INSTRUCTIONS}
+
+"analysis": {ANALYSIS_CRITERIA}
+
+{ANALYSIS_JSON_ONLY}
+
+Resume:
+{resume_prompt_text}
+    """
+
+def parse_and_analyze(resume_text, meta=None):
+    """Parse raw resume text and analyze it with a single LLM call
+
+    The model returns one JSON object with a "resume" part (the structured
+    resume) and an "analysis" part (the scores), which are split here. The
+    call goes through the same provider selection and hedging as
+    analyze_resume.
+
+    Returns:
+        (parsed_data, analysis)
+
+    Raises:
+        ValueError: the response is not JSON or lacks either part
+        AnalysisUnavailable: the provider is rate limited or unreachable
+    """
+    prompt_text, budget_info = prompt_budget.build_resume_text(resume_text, 'parse')
+    prompt = build_combined_prompt(prompt_text)
+    if meta is not None:
+        meta['prompt_tokens'] = prompt_budget.count_tokens(prompt)
+        meta['prompt_truncated'] = budget_info['truncated']
+
+    result = run_analysis_prompt(prompt, meta)
+    if not isinstance(result, dict) or not isinstance(result.get("resume"), dict) or not isinstance(result.get("analysis"), dict):
+        raise ValueError("Combined response is missing the resume or analysis object")
+    return result["resume"], result["analysis"]
+
+def _openai_provider(prompt, timeout=None):
+    return llm_provider.complete(
+        [
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        model="gpt-4o",
+        json=False,
+        temperature=0.2,
+        timeout=timeout
+    )
+
+def _gemini_provider(prompt, timeout=None):
+    return llm_provider.complete(
+        [{"role": "user", "content": prompt}],
+        model="gemini-pro",
+        json=False,
+        provider="gemini",
+        timeout=timeout
+    )
+
+# 对冲模式可用的提供方：名称 -> 接收提示词和剩余时间（秒）、返回模型文本的函数
+ANALYZER_PROVIDERS = {
+    "openai": _openai_provider,
+    "gemini": _gemini_provider,
+}
+
+def register_provider(name, complete_fn):
+    """Register an analysis provider for hedging (e.g. a local stand-in model)
+
+    complete_fn(prompt, timeout) returns the model text; timeout is the number
+    of seconds left before the hedging deadline and should bound the call.
+    """
+    ANALYZER_PROVIDERS[name] = complete_fn
+
+def provider_available(name):
+    """Check whether a hedging provider is registered and configured"""
+    if name not in ANALYZER_PROVIDERS:
+        return False
+    if name in ("openai", "gemini"):
+        return llm_provider.is_available(name)
+    return True
+
+_hedge_lock = threading.Lock()
+_hedge_in_flight = 0
+
+def _call_provider(name, prompt, deadline):
+    """Call one provider and return its analysis; invalid JSON raises
+
+    Runs on _hedge_executor. The call is bounded by the deadline, so a request
+    that lost the race gives its thread and limiter slot back by then at the latest.
+    """
+    global _hedge_in_flight
+    with _hedge_lock:
+        _hedge_in_flight += 1
+    try:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMQueueTimeout("hedging deadline passed before the call started")
+        analysis = parse_analysis_json(ANALYZER_PROVIDERS[name](prompt, remaining))
+        if not isinstance(analysis, dict):
+            raise ValueError(f"{name} returned JSON that is not an object")
+        return analysis
+    finally:
+        with _hedge_lock:
+            _hedge_in_flight -= 1
+
+def _hedge_capacity_available():
+    # 线程池已满（例如还有输掉的请求在运行）时不再发出对冲请求，避免在过载时加倍负载
+    with _hedge_lock:
+        return _hedge_in_flight < ANALYZER_HEDGE_WORKERS
+
+def analyze_with_hedging(prompt, meta=None):
+    """Send the prompt to the primary provider and hedge to the secondary one
+
+    The secondary request is sent once the primary has not answered within
+    ANALYZER_HEDGE_AFTER seconds, or as soon as the primary fails. The first
+    valid JSON wins; the other request is cancelled if it has not started
+    yet, otherwise its result is discarded. A slow primary is not hedged
+    while the executor has no idle thread.
+
+    Raises:
+        AnalysisUnavailable: every provider failed or the deadline passed
+    """
+    start = time.monotonic()
+    deadline = start + ANALYZER_DEADLINE
+    futures = {_hedge_executor.submit(_call_provider, ANALYZER_PRIMARY, prompt, deadline): ANALYZER_PRIMARY}
+    pending = set(futures)
+    hedged = False
+    errors = {}
+
+    while True:
+        now = time.monotonic()
+        if not hedged and (not pending or (now - start >= ANALYZER_HEDGE_AFTER and _hedge_capacity_available())):
+            print(f"Hedging analysis request to {ANALYZER_SECONDARY} after {now - start:.2f}s")
+            future = _hedge_executor.submit(_call_provider, ANALYZER_SECONDARY, prompt, deadline)
+            futures[future] = ANALYZER_SECONDARY
+            pending.add(future)
+            hedged = True
+
+        if not pending:
+            break
+        if now >= deadline:
+            errors['deadline'] = f"no valid response within {ANALYZER_DEADLINE:.0f}s"
+            break
+
+        timeout = deadline - now
+        if not hedged:
+            # 到了对冲时间但线程池没有空闲时，稍后再检查
+            timeout = min(timeout, max(start + ANALYZER_HEDGE_AFTER - now, 0.1))
+        done, pending = wait(pending, timeout=max(timeout, 0), return_when=FIRST_COMPLETED)
+
+        for future in done:
+            name = futures[future]
+            try:
+                analysis = future.result()
+            except Exception as e:
+                errors[name] = e
+                continue
+
+            for loser in pending:
+                loser.cancel()
+            if meta is not None:
+                meta['provider'] = name
+                meta['latency_ms'] = int((time.monotonic() - start) * 1000)
+                meta['hedged'] = hedged
+            return analysis
+
+    for future in pending:
+        future.cancel()
+    if meta is not None:
+        meta['latency_ms'] = int((time.monotonic() - start) * 1000)
+        meta['hedged'] = hedged
+    details = "; ".join(f"{name}: {error}" for name, error in errors.items())
+    retry_after = 1
+    for name, error in errors.items():
+        wrapped = unavailable_error(name, error) if isinstance(error, Exception) else None
+        if isinstance(wrapped, AnalysisUnavailable):
+            retry_after = max(retry_after, wrapped.retry_after)
+    raise AnalysisUnavailable(f"All analysis providers failed ({details})", retry_after)
+
 def generate_mock_analysis(resume_text):
     """Generate a mock analysis when no AI service is available"""
     quality_keywords = ["python", "tensorflow", "ml", "project", "api", "deployment"]
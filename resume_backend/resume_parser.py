@@ -1,52 +1,88 @@
-import PyPDF2
-import docx
 import os
-from openai import OpenAI
+import time
 from dotenv import load_dotenv
 import json
+import llm_provider
+import local_parser
+import extractors
+import prompt_budget
 
 # 加载环境变量
 load_dotenv()
 
-# 初始化 OpenAI 客户端
-openai_client = None
-try:
-    api_key = os.getenv("OPENAI_API_KEY")
-    if api_key:
-        openai_client = OpenAI(api_key=api_key)
-        print("Resume parser: OpenAI client initialized successfully")
-    else:
-        print("Warning: OPENAI_API_KEY not found - fallback to local parsing")
-except Exception as e:
-    print(f"Error initializing OpenAI client in resume_parser: {e}")
-
-def parse_resume(file_path):
+# 解析模式：local 只用本地解析器，llm 只用 OpenAI，auto 先本地解析、置信度不够时再调用 LLM
+PARSER_MODES = ('local', 'llm', 'auto')
+RESUME_PARSER_MODE = os.getenv("RESUME_PARSER_MODE", "llm")
+LOCAL_PARSER_MIN_CONFIDENCE = float(os.getenv("LOCAL_PARSER_MIN_CONFIDENCE", "0.6"))
+
+if not llm_provider.is_available("openai"):
+    print("Warning: OPENAI_API_KEY not found - fallback to local parsing")
+
+def parse_resume(file_path, meta=None, parser=None, file_hash=None):
     """
-    解析简历文件，优先使用 OpenAI，如果失败则返回纯文本
+    解析简历文件
+    
+    parser 为 local / llm / auto（默认取 RESUME_PARSER_MODE）。auto 先用本地解析器，
+    置信度低于 LOCAL_PARSER_MIN_CONFIDENCE 时再调用 OpenAI；OpenAI 不可用或失败时
+    返回本地解析结果，本地也没有识别出任何章节时返回纯文本。
+    
+    file_hash 为文件内容的 SHA-256（已知时传入，避免重复计算），用于查找已提取的文本。
+    
+    如果传入 meta 字典，会写入文本提取后端（extractor）、使用的解析器（parser）、本地解析置信度和提示词的 token 统计（prompt_tokens 等）
     """
-    file_ext = os.path.splitext(file_path)[1].lower()
+    parser = parser or RESUME_PARSER_MODE
+    if parser not in PARSER_MODES:
+        raise ValueError(f"Unsupported parser mode: {parser}")
+    if meta is None:
+        meta = {}
+    
+    text = extract_text(file_path, meta, file_hash)
     
-    if file_ext == '.pdf':
-        text = parse_pdf(file_path)
-    elif file_ext == '.docx':
-        text = parse_docx(file_path)
-    elif file_ext == '.txt':
-        text = parse_txt(file_path)
-    else:
-        raise ValueError(f"Unsupported file format: {file_ext}")
+    local_data = None
+    if parser in ('local', 'auto'):
+        start = time.perf_counter()
+        local_data, confidence = local_parser.parse_resume_text(text)
+        meta['parser_confidence'] = confidence
+        meta['local_parse_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        if parser == 'local' or confidence >= LOCAL_PARSER_MIN_CONFIDENCE:
+            meta['parser'] = 'local'
+            return local_data
     
     # 使用 OpenAI 分析简历
-    if openai_client:
+    if llm_provider.is_available("openai"):
         try:
-            return parse_with_openai(text)
+            result = parse_with_openai(text, meta)
+            meta['parser'] = 'llm'
+            return result
         except Exception as e:
             print(f"Error using OpenAI for parsing: {e}")
             print("Falling back to basic text extraction")
-            return {"raw_text": text}
-    else:
-        return {"raw_text": text}
+    
+    if local_data is not None and meta['parser_confidence'] > 0:
+        meta['parser'] = 'local'
+        return local_data
+    meta['parser'] = 'text'
+    return {"raw_text": text}
+
+def is_reusable_parse(parsed_data, meta):
+    """解析结果能否在同一用户重复上传同一文件时复用
 
-def parse_with_openai(resume_text):
+    纯文本回退、出错的结果和置信度不足的本地解析结果不复用，下次上传时重新解析。
+    meta 为 parse_resume 写入的 parser / parser_confidence。
+    """
+    if not isinstance(parsed_data, dict) or not parsed_data:
+        return False
+    if 'raw_text' in parsed_data or 'error' in parsed_data:
+        return False
+    if meta.get('parser') == 'llm':
+        return True
+    return meta.get('parser') == 'local' and meta.get('parser_confidence', 0) >= LOCAL_PARSER_MIN_CONFIDENCE
+
+def extract_text(file_path, meta=None, file_hash=None):
+    """按文件类型提取简历原始文本（提取后端和文本附属文件见 extractors）"""
+    return extractors.extract_text(file_path, meta=meta, digest=file_hash)
+
+def parse_with_openai(resume_text, meta=None):
     """
     使用 OpenAI 将简历文本转换为结构化 JSON 格式（动态结构）
     """
@@ -66,23 +102,29 @@ def parse_with_openai(resume_text):
 字段名可以根据实际内容自定义，只需确保结构清晰合理，便于数据库存储。请直接输出 JSON 对象，不要添加任何说明文字。
 """
 
+    # 压缩空白并裁剪到解析接口的 token 预算内
+    prompt_text, budget_info = prompt_budget.build_resume_text(resume_text, 'parse')
+
     user_prompt = f"""以下是简历原始文本内容，请进行解析并转换为结构化 JSON：
 
-{resume_text}
+{prompt_text}
 """
 
-    response = openai_client.chat.completions.create(
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+    if meta is not None:
+        meta['prompt_tokens'] = prompt_budget.count_message_tokens(messages)
+        meta['prompt_truncated'] = budget_info['truncated']
+
+    result_json = llm_provider.complete(
+        messages,
         model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        temperature=0.2,
-        response_format={"type": "json_object"}  # 保证输出为 JSON 对象
+        json=True,  # 保证输出为 JSON 对象
+        temperature=0.2
     )
 
-    result_json = response.choices[0].message.content
-
     try:
         parsed_data = json.loads(result_json)
         return parsed_data
@@ -90,26 +132,6 @@ def parse_with_openai(resume_text):
         print("Error decoding JSON from OpenAI response")
         return {"raw_text": resume_text, "error": "Failed to parse as JSON"}
 
-def parse_pdf(file_path):
-    """提取 PDF 文本"""
-    text = ""
-    with open(file_path, 'rb') as file:
-        reader = PyPDF2.PdfReader(file)
-        for page in reader.pages:
-            if page.extract_text():
-                text += page.extract_text() + "\n"
-    return text
-
-def parse_docx(file_path):
-    """提取 DOCX 文本"""
-    doc = docx.Document(file_path)
-    return "\n".join(para.text for para in doc.paragraphs)
-
-def parse_txt(file_path):
-    """提取 TXT 文本"""
-    with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-        return file.read()
-
 # 可选：如果你仍需要对本地 resume text 粗略分段
 def extract_resume_sections(text):
     sections = {
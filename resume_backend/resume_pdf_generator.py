@@ -1,10 +1,372 @@
 import os
+import copy
+import json
+import hashlib
 import tempfile
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from types import MappingProxyType
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListFlowable, ListItem
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, ListFlowable, ListItem, Flowable, Frame
+
+# 生成器版本：修改排版逻辑时递增，已缓存的 PDF（浏览器 ETag 等）随之失效
+GENERATOR_VERSION = "1"
+
+# 默认配置，可以自定义边距、字体、颜色等
+DEFAULT_CONFIG = {
+    'page': {
+        'size': letter,
+        'margins': {
+            'top': 0.2,
+            'bottom': 0.3,
+            'left': 0.3,
+            'right': 0.3
+        }
+    },
+    'fonts': {
+        'name': 'Times-Bold',
+        'normal': 'Times-Roman',
+        'italic': 'Times-Italic',
+        'bold': 'Times-Bold'
+    },
+    'font_sizes': {
+        'name': 24,
+        'section_title': 12,
+        'job_title': 11,
+        'normal': 10,
+        'small': 9,
+        'leading': 12  # 行高
+    },
+    'spacings': {
+        'after_name': 12,
+        'after_section_title': 6,
+        'after_paragraph': 3,
+        'between_items': 12,
+        'between_sections': 6
+    },
+    'dividers': {
+        'use_dividers': True,
+        'color': colors.black,
+        'thickness': 0.5
+    },
+    'layout': {
+        'company_date_same_line': False,  # 是否将公司和日期在同一行
+        'bullet_char': '•'  # 项目符号字符
+    }
+}
+
+# 样式表缓存最多保存的配置数
+STYLESHEET_CACHE_MAX_ENTRIES = 64
+# 章节排版元素缓存最多保存的章节数
+SECTION_CACHE_MAX_ENTRIES = 512
+# 自动适应页数（fit_pages）时间距和字号最多缩小到的比例：先压缩间距，仍然放不下时再缩小字号
+FIT_MIN_SPACING_SCALE = 0.3
+FIT_MIN_FONT_SCALE = 0.7
+
+
+def _readonly(value):
+    """递归转换为只读结构：dict -> 只读映射，list -> tuple"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: _readonly(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_readonly(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """把只读结构转换回普通的 dict"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+def _freeze(value):
+    """转换为可哈希、可比较的值，用于配置的哈希和相等判断"""
+    if isinstance(value, Mapping):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, colors.Color):
+        return ('color',) + tuple(value.rgba())
+    return value
+
+
+def _deep_merge(base, overrides):
+    """返回 base 与 overrides 递归合并后的新 dict，不修改任何一方"""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(merged.get(key), dict) and isinstance(value, Mapping):
+            merged[key] = _deep_merge(merged[key], value)
+        else:
+            merged[key] = _thaw(value)
+    return merged
+
+
+class RenderConfig:
+    """不可变、可哈希的排版配置
+
+    按类别读取（config['fonts']['normal']），每一层都是只读的；
+    merged() 返回合并了自定义项的新配置，不修改原配置，可以安全地在线程间共享。
+    """
+    __slots__ = ('_data', '_key', '_hash')
+
+    def __init__(self, data):
+        self._data = _readonly(data)
+        self._key = _freeze(self._data)
+        self._hash = hash(self._key)
+
+    def __getitem__(self, category):
+        return self._data[category]
+
+    def __contains__(self, category):
+        return category in self._data
+
+    def get(self, category, default=None):
+        return self._data.get(category, default)
+
+    def __eq__(self, other):
+        return isinstance(other, RenderConfig) and self._key == other._key
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"RenderConfig({self.to_dict()!r})"
+
+    @property
+    def digest(self):
+        """配置内容的短哈希（跨进程稳定，用于缓存键）"""
+        return hashlib.sha256(repr(self._key).encode('utf-8')).hexdigest()[:16]
+
+    def merged(self, overrides):
+        """返回合并了 overrides 的新配置（嵌套的 dict 逐层合并）"""
+        if not overrides:
+            return self
+        return RenderConfig(_deep_merge(self.to_dict(), overrides))
+
+    def to_dict(self):
+        """返回可修改的普通 dict 副本"""
+        return _thaw(self._data)
+
+
+_stylesheets = {}
+
+
+def get_stylesheet(config):
+    """返回配置对应的样式表，相同配置复用已编译的 ParagraphStyle
+
+    只用 dict 的原子操作读写缓存，不加锁：并发时同一配置最多被重复构建一次，结果相同。
+    样式表构建完成后不再修改，多个线程可以同时读取。
+    """
+    styles = _stylesheets.get(config)
+    if styles is None:
+        if len(_stylesheets) >= STYLESHEET_CACHE_MAX_ENTRIES:
+            _stylesheets.clear()
+        styles = _stylesheets.setdefault(config, build_stylesheet(config))
+    return styles
+
+
+def build_stylesheet(config):
+    """按配置创建样式表，以匹配截图中的简历格式"""
+    styles = getSampleStyleSheet()
+    
+    # 标题样式
+    styles.add(ParagraphStyle(
+        name='Name',
+        fontName=config['fonts']['name'],
+        fontSize=config['font_sizes']['name'],
+        leading=config['font_sizes']['leading'],
+        alignment=0,  # 左对齐
+        spaceAfter=config['spacings']['after_name'],
+        spaceBefore=0
+    ))
+    
+    # 联系信息样式
+    styles.add(ParagraphStyle(
+        name='Contact',
+        fontName=config['fonts']['normal'],
+        fontSize=config['font_sizes']['normal'],
+        leading=config['font_sizes']['leading'],
+        alignment=0,  # 左对齐
+        spaceAfter=config['spacings']['after_paragraph']
+    ))
+    
+    # 章节标题样式
+    styles.add(ParagraphStyle(
+        name='SectionTitle',
+        fontName=config['fonts']['bold'],
+        fontSize=config['font_sizes']['section_title'],
+        leading=config['font_sizes']['leading'],
+        spaceAfter=config['spacings']['after_section_title']
+    ))
+    
+    # 职位样式
+    styles.add(ParagraphStyle(
+        name='JobTitle',
+        fontName=config['fonts']['bold'],
+        fontSize=config['font_sizes']['job_title'],
+        leading=config['font_sizes']['leading'],
+        spaceAfter=1
+    ))
+    
+    # 公司样式
+    styles.add(ParagraphStyle(
+        name='Company',
+        fontName=config['fonts']['italic'],
+        fontSize=config['font_sizes']['job_title'],
+        leading=config['font_sizes']['leading'],
+        spaceAfter=1
+    ))
+    
+    # 日期样式
+    styles.add(ParagraphStyle(
+        name='Date',
+        fontName=config['fonts']['normal'],
+        fontSize=config['font_sizes']['normal'],
+        leading=config['font_sizes']['leading'],
+        alignment=2,  # 右对齐
+    ))
+    
+    # 普通文本样式
+    styles.add(ParagraphStyle(
+        name='NormalText',
+        fontName=config['fonts']['normal'],
+        fontSize=config['font_sizes']['normal'],
+        leading=config['font_sizes']['leading'],
+        spaceAfter=config['spacings']['after_paragraph']
+    ))
+    
+    # 项目符号样式
+    styles.add(ParagraphStyle(
+        name='BulletItem',
+        fontName=config['fonts']['normal'],
+        fontSize=config['font_sizes']['normal'],
+        leading=config['font_sizes']['leading'],
+        leftIndent=10,
+        firstLineIndent=-10,
+        spaceBefore=0,
+        spaceAfter=config['spacings']['after_paragraph']
+    ))
+
+    # 右对齐的日期（经历、教育、项目中使用）
+    styles.add(ParagraphStyle(
+        name='DateRight',
+        parent=styles['Date'],
+        alignment=2
+    ))
+    return styles
+
+
+class SectionCache:
+    """按 (配置, 章节, 章节内容哈希) 缓存章节的排版元素（Paragraph 等）的 LRU
+
+    缓存的元素从不直接交给 doc.build（排版时会在元素上记录宽高、分页结果），
+    每次使用时取浅拷贝：拷贝共享已经解析好的标记文本（Paragraph 构造时最耗时的部分）。
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+        return [_clone(flowable) for flowable in entry[0]]
+
+    def put(self, key, flowables):
+        """保存新生成的元素，返回可以交给 doc.build 的拷贝"""
+        if self.max_entries <= 0:
+            return flowables
+        with self._lock:
+            self._entries[key] = (tuple(flowables), {})
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return [_clone(flowable) for flowable in flowables]
+
+    def height(self, key, width):
+        """返回章节在给定宽度下测量过的高度，没有测量过时返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1].get(width) if entry else None
+
+    def set_height(self, key, width, height):
+        """记录章节的测量高度（与章节的元素一起淘汰）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                entry[1][width] = height
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+def _clone(flowable):
+    """复制排版元素，表格中的单元格也一并复制"""
+    clone = copy.copy(flowable)
+    if isinstance(flowable, Table):
+        clone._cellvalues = [[_clone(cell) if isinstance(cell, Flowable) else cell for cell in row]
+                             for row in flowable._cellvalues]
+    return clone
+
+
+def _flowable_height(flowable, width):
+    """元素在给定宽度下占用的高度（含段前段后间距）"""
+    _, height = flowable.wrap(width, 1e9)
+    return height + flowable.getSpaceBefore() + flowable.getSpaceAfter()
+
+
+def _scaled(config, font_scale, spacing_scale):
+    """按比例缩小字号（含行高）和间距后的配置"""
+    return config.merged({
+        'font_sizes': {name: size * font_scale for name, size in config['font_sizes'].items()},
+        'spacings': {name: size * spacing_scale for name, size in config['spacings'].items()}
+    })
+
+
+def _search_scale(fits, lowest):
+    """二分查找 [lowest, 1) 之间能放下的最大比例（按 1% 取整），lowest 也放不下时返回None"""
+    low, high = round(lowest * 100), 100
+    if not fits(low / 100):
+        return None
+    while high - low > 1:
+        middle = (low + high) // 2
+        if fits(middle / 100):
+            low = middle
+        else:
+            high = middle
+    return low / 100
+
+
+def _section_digest(section_data):
+    """章节内容的哈希（保留字典顺序，顺序不同时排版结果也不同）"""
+    data = json.dumps(section_data, ensure_ascii=False, default=str).encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+section_cache = SectionCache(SECTION_CACHE_MAX_ENTRIES)
+
 
 class ResumePDFGenerator:
     """生成自定义简历PDF的类"""
@@ -14,173 +376,167 @@ class ResumePDFGenerator:
         
         Args:
             output_dir: PDF输出目录，如果为None则使用临时目录
-            config: PDF生成配置，可以自定义边距、字体、颜色等
+            config: PDF生成配置，可以自定义边距、字体、颜色等（与默认配置逐层合并）
         """
         self.output_dir = output_dir or tempfile.gettempdir()
-        
-        # 默认配置
-        self.default_config = {
-            'page': {
-                'size': letter,
-                'margins': {
-                    'top': 0.2,
-                    'bottom': 0.3,
-                    'left': 0.3,
-                    'right': 0.3
-                }
-            },
-            'fonts': {
-                'name': 'Times-Bold',
-                'normal': 'Times-Roman',
-                'italic': 'Times-Italic',
-                'bold': 'Times-Bold'
-            },
-            'font_sizes': {
-                'name': 24,
-                'section_title': 12,
-                'job_title': 11,
-                'normal': 10,
-                'small': 9
-            },
-            'spacings': {
-                'after_name': 12,
-                'after_section_title': 6,
-                'after_paragraph': 3,
-                'between_items': 12,
-                'between_sections': 6
-            },
-            'dividers': {
-                'use_dividers': True,
-                'color': colors.black,
-                'thickness': 0.5
-            },
-            'layout': {
-                'company_date_same_line': False,  # 是否将公司和日期在同一行
-                'bullet_char': '•'  # 项目符号字符
-            }
-        }
-        
-        # 合并自定义配置
-        self.config = self.default_config
-        if config:
-            self._merge_config(config)
-        
-        # 创建样式
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
-    
-    def _merge_config(self, config):
-        """合并自定义配置与默认配置"""
-        for category, values in config.items():
-            if category in self.config:
-                if isinstance(self.config[category], dict) and isinstance(values, dict):
-                    for key, value in values.items():
-                        self.config[category][key] = value
-                else:
-                    self.config[category] = values
-            else:
-                self.config[category] = values
-    
-    def _create_custom_styles(self):
-        """创建自定义样式，以匹配截图中的简历格式"""
-        # 标题样式
-        self.styles.add(ParagraphStyle(
-            name='Name',
-            fontName=self.config['fonts']['name'],
-            fontSize=self.config['font_sizes']['name'],
-            alignment=0,  # 左对齐
-            spaceAfter=self.config['spacings']['after_name'],
-            spaceBefore=0
-        ))
-        
-        # 联系信息样式
-        self.styles.add(ParagraphStyle(
-            name='Contact',
-            fontName=self.config['fonts']['normal'],
-            fontSize=self.config['font_sizes']['normal'],
-            alignment=0,  # 左对齐
-            spaceAfter=self.config['spacings']['after_paragraph']
-        ))
-        
-        # 章节标题样式
-        self.styles.add(ParagraphStyle(
-            name='SectionTitle',
-            fontName=self.config['fonts']['bold'],
-            fontSize=self.config['font_sizes']['section_title'],
-            spaceAfter=self.config['spacings']['after_section_title']
-        ))
-        
-        # 职位样式
-        self.styles.add(ParagraphStyle(
-            name='JobTitle',
-            fontName=self.config['fonts']['bold'],
-            fontSize=self.config['font_sizes']['job_title'],
-            spaceAfter=1
-        ))
-        
-        # 公司样式
-        self.styles.add(ParagraphStyle(
-            name='Company',
-            fontName=self.config['fonts']['italic'],
-            fontSize=self.config['font_sizes']['job_title'],
-            spaceAfter=1
-        ))
-        
-        # 日期样式
-        self.styles.add(ParagraphStyle(
-            name='Date',
-            fontName=self.config['fonts']['normal'],
-            fontSize=self.config['font_sizes']['normal'],
-            alignment=2,  # 右对齐
-        ))
-        
-        # 普通文本样式
-        self.styles.add(ParagraphStyle(
-            name='NormalText',
-            fontName=self.config['fonts']['normal'],
-            fontSize=self.config['font_sizes']['normal'],
-            spaceAfter=self.config['spacings']['after_paragraph']
-        ))
-        
-        # 项目符号样式
-        self.styles.add(ParagraphStyle(
-            name='BulletItem',
-            fontName=self.config['fonts']['normal'],
-            fontSize=self.config['font_sizes']['normal'],
-            leftIndent=10,
-            firstLineIndent=-10,
-            spaceBefore=0,
-            spaceAfter=self.config['spacings']['after_paragraph']
-        ))
-    
-    def generate(self, resume_data, output_filename=None, custom_config=None):
+        self.default_config = RenderConfig(DEFAULT_CONFIG)
+        self._config = self.default_config.merged(config)
+        # 当前线程本次生成使用的配置和样式表（generate 传入 custom_config 时），线程之间互不影响
+        self._active = threading.local()
+    
+    @property
+    def config(self):
+        """当前线程使用的排版配置（RenderConfig）"""
+        config = getattr(self._active, 'config', None)
+        return config if config is not None else self._config
+    
+    @property
+    def styles(self):
+        """当前配置对应的样式表"""
+        styles = getattr(self._active, 'styles', None)
+        return styles if styles is not None else get_stylesheet(self._config)
+    
+    def version_key(self):
+        """生成器版本和当前配置的哈希，配置或版本变化时生成的 PDF 也会变化"""
+        return f"{GENERATOR_VERSION}-{self._config.digest}"
+    
+    @contextmanager
+    def _using(self, config, cache=True):
+        """在当前线程中临时使用另一份配置及其样式表
+
+        cache=False 时（自动排版的试探配置）样式表和章节元素都不写入共享缓存，
+        以免一次性的缩放配置挤掉其他请求缓存的内容。
+        """
+        previous = (getattr(self._active, 'config', None), getattr(self._active, 'styles', None),
+                    getattr(self._active, 'cache', True))
+        self._active.config = config
+        self._active.styles = get_stylesheet(config) if cache else build_stylesheet(config)
+        self._active.cache = cache
+        try:
+            yield
+        finally:
+            self._active.config, self._active.styles, self._active.cache = previous
+    
+    def _frame_width(self):
+        """页面正文区域的宽度"""
+        margins = self.config['page']['margins']
+        return self.config['page']['size'][0] - (margins['left'] + margins['right']) * inch
+    
+    def generate(self, resume_data, output_filename=None, custom_config=None, fit_pages=None):
         """根据简历数据生成PDF
         
         Args:
             resume_data: 简历数据字典
             output_filename: 输出文件名，如果为None则自动生成
             custom_config: 针对此次生成的自定义配置，会覆盖实例配置
+            fit_pages: 目标页数，内容超出时缩小间距和字号以放进这么多页，为None时不调整
             
         Returns:
             生成的PDF文件路径
         """
-        # 应用针对此次生成的自定义配置
-        if custom_config:
-            old_config = dict(self.config)
-            self._merge_config(custom_config)
-            self._create_custom_styles()  # 重新创建样式
-            
         if output_filename is None:
             output_filename = f"resume_{resume_data.get('_id', 'output')}.pdf"
         
         output_path = os.path.join(self.output_dir, output_filename)
         
+        self.generate_to(resume_data, output_path, custom_config, fit_pages)
+        return output_path
+    
+    def generate_to(self, resume_data, stream, custom_config=None, fit_pages=None):
+        """生成PDF并写入可写的二进制流（或文件路径），不经过临时文件
+        
+        Args:
+            resume_data: 简历数据字典
+            stream: 可写的二进制流（如 BytesIO、打开的文件）或文件路径
+            custom_config: 针对此次生成的自定义配置，会覆盖实例配置
+            fit_pages: 目标页数，内容超出时缩小间距和字号以放进这么多页，为None时不调整
+            
+        Returns:
+            生成的页数（缩到最小仍放不下时大于 fit_pages）
+        """
+        # 针对此次生成的自定义配置只在当前线程生效，不修改共享实例
+        render_config = self._config.merged(custom_config) if custom_config else self._config
+        if fit_pages:
+            render_config = self._fit_config(resume_data, render_config, fit_pages)
+        with self._using(render_config):
+            pages = self._build(resume_data, stream)
+        if fit_pages and pages > fit_pages:
+            print(f"PDF does not fit in {fit_pages} page(s) at the minimum scale: {pages} pages")
+        return pages
+    
+    def generate_bytes(self, resume_data, custom_config=None, fit_pages=None, meta=None):
+        """在内存中生成PDF
+        
+        Args:
+            resume_data: 简历数据字典
+            custom_config: 针对此次生成的自定义配置，会覆盖实例配置
+            fit_pages: 目标页数，内容超出时缩小间距和字号以放进这么多页，为None时不调整
+            meta: 如果传入字典，会写入页数（pages）；指定 fit_pages 时还会写入是否放下（fits）
+            
+        Returns:
+            PDF 文件内容（bytes）
+        """
+        buffer = BytesIO()
+        pages = self.generate_to(resume_data, buffer, custom_config, fit_pages)
+        if meta is not None:
+            meta['pages'] = pages
+            if fit_pages:
+                meta['fits'] = pages <= fit_pages
+        return buffer.getvalue()
+    
+    def _fit_config(self, resume_data, config, fit_pages):
+        """找出能把内容放进 fit_pages 页的配置
+        
+        不实际生成 PDF：用 wrap() 测量各章节在正文宽度下的高度，
+        先二分查找间距的缩放比例，仍然放不下时再把间距固定为最小值、二分查找字号的缩放比例。
+        只有原始配置的测量结果写入缓存，试探用的缩放配置不写入（只缓存最终选中的配置，
+        由 _build 生成时写入）。
+        """
+        def fits(font_scale, spacing_scale):
+            unscaled = font_scale == 1.0 and spacing_scale == 1.0
+            probe = config if unscaled else _scaled(config, font_scale, spacing_scale)
+            with self._using(probe, cache=unscaled):
+                # 每个分页处可能浪费一行的高度
+                capacity = fit_pages * self._frame_height() - (fit_pages - 1) * self.config['font_sizes']['leading']
+                return self._measure(resume_data) <= capacity
+        
+        if fits(1.0, 1.0):
+            return config
+        spacing_scale = _search_scale(lambda scale: fits(1.0, scale), FIT_MIN_SPACING_SCALE)
+        if spacing_scale is not None:
+            return _scaled(config, 1.0, spacing_scale)
+        font_scale = _search_scale(lambda scale: fits(scale, FIT_MIN_SPACING_SCALE), FIT_MIN_FONT_SCALE)
+        return _scaled(config, font_scale or FIT_MIN_FONT_SCALE, FIT_MIN_SPACING_SCALE)
+    
+    def _measure(self, resume_data):
+        """按当前配置测量全部内容的总高度"""
+        width = self._frame_width()
+        available_width = Frame(0, 0, width, self._frame_height())._aW
+        total = 0
+        cache = getattr(self._active, 'cache', True)
+        for key, flowables in self._iter_sections(resume_data):
+            height = section_cache.height(key, available_width) if key and cache else None
+            if height is None:
+                height = sum(_flowable_height(flowable, available_width) for flowable in flowables)
+                if key and cache:
+                    section_cache.set_height(key, available_width, height)
+            total += height
+        return total
+    
+    def _frame_height(self):
+        """页面正文区域可用的高度（去掉 Frame 的内边距）"""
+        margins = self.config['page']['margins']
+        height = self.config['page']['size'][1] - (margins['top'] + margins['bottom']) * inch
+        return Frame(0, 0, self._frame_width(), height)._aH
+    
+    def _build(self, resume_data, output):
+        """按当前线程的配置排版并写入 output（文件路径或可写的二进制流），返回页数"""
         # 获取边距配置
         margins = self.config['page']['margins']
         
         # 创建文档
         doc = SimpleDocTemplate(
-            output_path,
+            output,
             pagesize=self.config['page']['size'],
             topMargin=margins['top']*inch,
             bottomMargin=margins['bottom']*inch,
@@ -188,34 +544,15 @@ class ResumePDFGenerator:
             rightMargin=margins['right']*inch
         )
         
-        # 存储要添加到文档的元素
-        elements = []
-        
-        # 添加姓名
-        if 'personal_information' in resume_data and 'name' in resume_data['personal_information']:
-            name = resume_data['personal_information']['name']
-            elements.append(Paragraph(name, self.styles['Name']))
-            elements.append(Spacer(1, 6))  # 在名字和联系信息之间添加额外的空间
-        
-        # 添加联系信息
-        contact_info = []
-        if 'personal_information' in resume_data:
-            pi = resume_data['personal_information']
-            
-            for field in ['phone', 'email', 'linkedin', 'website', 'address']:
-                if field in pi and pi[field]:
-                    contact_info.append(pi[field])
-        
-        if contact_info:
-            contact_text = ' | '.join(contact_info)
-            elements.append(Paragraph(contact_text, self.styles['Contact']))
-        
-        elements.append(Spacer(1, self.config['spacings']['between_items']))
-        
-        # 如果使用分隔线
-        if self.config['dividers']['use_dividers']:
-            elements.append(self._create_divider())
-            elements.append(Spacer(1, self.config['spacings']['between_sections']))
+        # 构建PDF
+        elements = [flowable for _, flowables in self._iter_sections(resume_data) for flowable in flowables]
+        doc.build(elements)
+        return doc.page
+    
+    def _iter_sections(self, resume_data):
+        """按顺序返回每个section的 (缓存键, 排版元素)，section 之间的间距和分隔线的缓存键为None"""
+        # 姓名、联系信息和分隔线
+        yield self._section_flowables('_header', resume_data.get('personal_information') or {}, None)
         
         # 定义section的显示名称映射，可以针对不同语言进行本地化
         section_names = {
@@ -267,31 +604,64 @@ class ResumePDFGenerator:
             if not section_data:
                 continue
                 
-            # 根据section类型处理内容
-            method_name = f"_render_{section}"
-            if hasattr(self, method_name):
-                # 如果有专门的方法处理该section
-                getattr(self, method_name)(elements, section_data, section_names.get(section, section.replace('_', ' ').title()))
-            else:
-                # 默认处理方式
-                self._render_default_section(elements, section, section_data, section_names.get(section, section.replace('_', ' ').title()))
+            # 根据section类型处理内容（内容没有变化的section直接复用上次生成的元素）
+            yield self._section_flowables(section, section_data, section_names.get(section, section.replace('_', ' ').title()))
             
             # 添加分隔线，除非是最后一个section
             if section != sections[-1]:
-                elements.append(Spacer(1, self.config['spacings']['between_sections']))
+                separator = [Spacer(1, self.config['spacings']['between_sections'])]
                 if self.config['dividers']['use_dividers']:
-                    elements.append(self._create_divider())
-                    elements.append(Spacer(1, self.config['spacings']['between_sections']))
+                    separator.append(self._create_divider())
+                    separator.append(Spacer(1, self.config['spacings']['between_sections']))
+                yield None, separator
+    
+    def _section_flowables(self, section, section_data, section_title):
+        """返回一个section的 (缓存键, 排版元素)，相同配置和内容的section从缓存中复制
+
+        当前线程关闭了缓存（自动排版的试探配置）时每次重新生成，也不写入缓存。
+        """
+        key = (self.config, section, section_title, _section_digest(section_data))
+        cache = getattr(self._active, 'cache', True)
+        flowables = section_cache.get(key) if cache else None
+        if flowables is not None:
+            return key, flowables
         
-        # 构建PDF
-        doc.build(elements)
+        flowables = []
+        if section == '_header':
+            self._render_header(flowables, section_data)
+        elif hasattr(self, f"_render_{section}"):
+            # 如果有专门的方法处理该section
+            getattr(self, f"_render_{section}")(flowables, section_data, section_title)
+        else:
+            # 默认处理方式
+            self._render_default_section(flowables, section, section_data, section_title)
+        if not cache:
+            return key, flowables
+        return key, section_cache.put(key, flowables)
+    
+    def _render_header(self, elements, pi):
+        """渲染姓名和联系信息"""
+        # 添加姓名
+        if 'name' in pi:
+            elements.append(Paragraph(pi['name'], self.styles['Name']))
+            elements.append(Spacer(1, 6))  # 在名字和联系信息之间添加额外的空间
         
-        # 如果使用了临时配置，恢复原始配置
-        if custom_config:
-            self.config = old_config
-            self._create_custom_styles()  # 重新创建样式
-            
-        return output_path
+        # 添加联系信息
+        contact_info = []
+        for field in ['phone', 'email', 'linkedin', 'website', 'address']:
+            if field in pi and pi[field]:
+                contact_info.append(pi[field])
+        
+        if contact_info:
+            contact_text = ' | '.join(contact_info)
+            elements.append(Paragraph(contact_text, self.styles['Contact']))
+        
+        elements.append(Spacer(1, self.config['spacings']['between_items']))
+        
+        # 如果使用分隔线
+        if self.config['dividers']['use_dividers']:
+            elements.append(self._create_divider())
+            elements.append(Spacer(1, self.config['spacings']['between_sections']))
     
     def _render_summary(self, elements, summary_data, section_title='Summary'):
         """渲染概述部分"""
@@ -376,7 +746,7 @@ class ResumePDFGenerator:
                 company_date_table = Table([
                     [Paragraph(f"<i>{company}</i>", self.styles['Company']), 
                      Paragraph(dates, self.styles['Date'])]
-                ], colWidths=[(doc.width)*0.7, (doc.width)*0.3])
+                ], colWidths=[self._frame_width()*0.7, self._frame_width()*0.3])
                 
                 company_date_table.setStyle(TableStyle([
                     ('VALIGN', (0, 0), (-1, -1), 'TOP'),
@@ -391,12 +761,7 @@ class ResumePDFGenerator:
                     elements.append(Paragraph(f"<i>{company}</i>", self.styles['Company']))
                 
                 if dates:
-                    date_style = ParagraphStyle(
-                        'DateRight',
-                        parent=self.styles['Date'],
-                        alignment=2  # 右对齐
-                    )
-                    elements.append(Paragraph(dates, date_style))
+                    elements.append(Paragraph(dates, self.styles['DateRight']))
             
             # 添加职责/描述
             responsibilities_key = None
@@ -502,7 +867,7 @@ class ResumePDFGenerator:
                 edu_date_table = Table([
                     [Paragraph(f"<i>{degree_field}</i>", self.styles['Company']), 
                      Paragraph(dates, self.styles['Date'])]
-                ], colWidths=[(doc.width)*0.7, (doc.width)*0.3])
+                ], colWidths=[self._frame_width()*0.7, self._frame_width()*0.3])
                 
                 edu_date_table.setStyle(TableStyle([
                     ('VALIGN', (0, 0), (-1, -1), 'TOP'),
@@ -519,12 +884,7 @@ class ResumePDFGenerator:
                     elements.append(Paragraph(f"<i>{degree_field}</i>", self.styles['Company']))
                 
                 if dates:
-                    date_style = ParagraphStyle(
-                        'DateRight',
-                        parent=self.styles['Date'],
-                        alignment=2  # 右对齐
-                    )
-                    elements.append(Paragraph(dates, date_style))
+                    elements.append(Paragraph(dates, self.styles['DateRight']))
             
             elements.append(Spacer(1, self.config['spacings']['between_items']))
     
@@ -544,12 +904,7 @@ class ResumePDFGenerator:
                 elements.append(Paragraph(name, self.styles['JobTitle']))
             
             if dates:
-                date_style = ParagraphStyle(
-                    'DateRight',
-                    parent=self.styles['Date'],
-                    alignment=2  # 右对齐
-                )
-                elements.append(Paragraph(dates, date_style))
+                elements.append(Paragraph(dates, self.styles['DateRight']))
             
             # 项目描述
             description_key = None
@@ -0,0 +1,84 @@
+"""相同请求的合并执行（single-flight）
+
+同一个键的调用正在进行时，后来的调用方不会重复执行，而是等待并共享第一个调用的结果（或异常）。
+用于合并重复点击或多个标签页同时发起的解析、分析等 LLM 请求。
+"""
+import threading
+
+
+class _Call:
+    """一次进行中的调用"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """按键合并并发调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {'executed': 0, 'coalesced': 0}
+
+    def do(self, key, fn, *args, **kwargs):
+        """执行 fn，同一个键同时只执行一次
+
+        Returns:
+            (结果, shared)，shared 为 True 表示结果来自其他调用方正在进行的调用
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats['coalesced'] += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._stats['executed'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                # 每个等待方抛出自己的副本，避免多个线程同时修改同一个异常的 __traceback__
+                error = _copy_error(call.error)
+                if error is call.error:
+                    raise error
+                raise error from call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def stats(self):
+        """返回执行/合并次数统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._calls)
+        return stats
+
+
+def _copy_error(error):
+    """复制异常（类型、args 和属性），不调用 __init__；无法复制时返回原异常"""
+    try:
+        copied = error.__class__.__new__(error.__class__, *error.args)
+        copied.__dict__.update(getattr(error, '__dict__', {}))
+        return copied
+    except Exception:
+        return error
+
+
+# 全局实例
+singleflight = SingleFlight()
@@ -0,0 +1,363 @@
+"""内容寻址的上传文件存储
+
+上传文件按内容的 SHA-256 存放在 uploads/ab/cd/<sha256>.pdf：不同用户上传同名文件不会互相覆盖，
+相同内容只保存一份，两级分片目录避免单个目录下文件过多。写入时先写临时文件再原子重命名，
+读取方永远不会看到写了一半的文件。每份文件有一个引用计数（<sha256>.refs），
+每条简历记录持有一个引用，计数归零时才删除文件（计数文件也随之删除）。文件旁边可以保存 gzip 压缩的附属数据
+（<sha256>.<名称>.gz，如提取出的文本），随文件一起删除。
+
+文件本身保存在存储后端中（见 blob_store：本机目录或 S3 兼容的对象存储），
+引用计数文件和临时文件始终在本机的 UPLOAD_ROOT 下。
+"""
+import os
+import gzip
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+from blob_store import STORAGE_BACKEND, create_blob_store
+
+try:
+    import fcntl
+except ImportError:  # 非 Unix 平台只做进程内加锁
+    fcntl = None
+
+# 加载环境变量
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_ROOT = os.getenv("UPLOAD_ROOT", os.path.join(BASE_DIR, "uploads"))
+
+# 上传文件分块读取的大小
+CHUNK_SIZE = 1024 * 1024
+
+# 各类型文件的文件头，以及在文件开头多少字节内查找（PDF 规范允许文件头前有少量无关字节）
+FILE_SIGNATURES = {
+    '.pdf': b'%PDF-',
+}
+SIGNATURE_WINDOW = 1024
+
+
+class UploadTooLarge(Exception):
+    """上传文件超过大小上限"""
+    pass
+
+
+class InvalidFileContent(Exception):
+    """文件内容与扩展名不符"""
+    pass
+
+
+class UploadStorage:
+    """按 SHA-256 分片存储文件，带引用计数"""
+
+    def __init__(self, root, blob_store=None):
+        """初始化
+
+        Args:
+            root: 本机目录，保存引用计数和临时文件；local 后端的文件也保存在这里
+            blob_store: 存储后端，为None时使用 root 下的本机目录
+        """
+        self.root = os.path.abspath(root)
+        self.blob_store = blob_store or create_blob_store('local', self.root)
+        self._tmp_dir = os.path.join(self.root, ".tmp")
+        # 每个内容哈希一把锁：不同文件的上传（如上传到 S3）可以并行，只有同一文件的操作互斥
+        self._locks_guard = threading.Lock()
+        self._digest_locks = {}
+        # 可选：fn(digest) -> 是否仍有简历引用该文件。多个实例共享对象存储时，
+        # 各实例的引用计数只统计本机的引用，删除前由数据库做最终确认
+        self.is_referenced = None
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(digest, ext=".pdf"):
+        """返回内容哈希在存储后端中的 key（ab/cd/<sha256><ext>）"""
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{ext}"
+
+    def path_for(self, digest, ext=".pdf"):
+        """返回内容哈希对应的本机路径（引用计数文件；local 后端的文件）"""
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ext)
+
+    def save(self, stream, ext=".pdf", max_bytes=None):
+        """从流中读取文件并保存，写入的同时计算 SHA-256，为新文件增加一个引用
+
+        Returns:
+            (十六进制摘要, 文件路径)
+        """
+        writer = self.open_writer(ext, max_bytes)
+        try:
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                writer.write(chunk)
+        except Exception:
+            writer.abort()
+            raise
+        return writer.commit()
+
+    def open_writer(self, ext=".pdf", max_bytes=None, check_signature=True):
+        """打开一个分块写入的上传文件
+
+        写入的同时计算哈希、检查文件头和大小上限；commit() 后文件才出现在存储中，
+        abort() 丢弃已写入的内容。
+
+        Args:
+            ext: 文件扩展名（带点）
+            max_bytes: 大小上限，超过时 write() 抛出 UploadTooLarge
+            check_signature: 是否按扩展名检查文件头，不符时抛出 InvalidFileContent
+        """
+        signature = FILE_SIGNATURES.get(ext) if check_signature else None
+        return _UploadWriter(self, ext, max_bytes, signature)
+
+    def _commit(self, tmp_path, digest, ext):
+        """把临时文件保存到内容寻址的位置并增加引用，返回本机文件路径
+
+        锁只针对这个内容哈希，上传到存储后端时不会阻塞其他文件的上传和释放。
+        """
+        key = self.key_for(digest, ext)
+
+        with self._refs(digest) as refs:
+            if self.blob_store.exists(key):
+                # 相同内容已经存在，只增加引用
+                os.remove(tmp_path)
+            else:
+                self.blob_store.put_file(key, tmp_path)
+            refs.write(refs.read() + 1)
+        return self.blob_store.local_path(key)
+
+    def acquire(self, digest):
+        """为已存在的文件增加一个引用"""
+        with self._refs(digest) as refs:
+            refs.write(refs.read() + 1)
+
+    def release(self, digest, ext=".pdf"):
+        """释放一个引用，计数归零时删除文件，返回剩余引用数"""
+        with self._refs(digest) as refs:
+            count = max(0, refs.read() - 1)
+            if count == 0 and not (self.is_referenced and self.is_referenced(digest)):
+                self.blob_store.delete(self.key_for(digest, ext))
+                self._remove_sidecars(digest)
+            # 计数为 0 时 _refs() 在解锁前删除计数文件
+            refs.write(count)
+            return count
+
+    def read_sidecar(self, digest, name):
+        """读取文件的附属数据（如提取出的文本），不存在时返回None"""
+        try:
+            raw = self.blob_store.open(self.key_for(digest, f".{name}.gz"))
+        except OSError:
+            return None
+        try:
+            with gzip.GzipFile(fileobj=raw, mode='rb') as f:
+                return f.read().decode('utf-8')
+        except (OSError, EOFError):
+            return None
+        finally:
+            raw.close()
+
+    def write_sidecar(self, digest, name, text):
+        """以 gzip 压缩保存文件的附属数据（先写临时文件再整体保存，读取方不会看到写了一半的内容）
+
+        只为存储中仍有引用的文件保存，这样附属数据总会随文件一起删除；
+        旧的、不按内容存储的上传文件不保存。
+
+        Returns:
+            是否已保存
+        """
+        if not os.path.exists(self.path_for(digest, ".refs")):
+            return False
+        with self._refs(digest) as refs:
+            # 持有引用计数锁，保存期间文件不会被 release() 删除
+            if refs.read() == 0:
+                return False
+            fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+            try:
+                with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                    f.write(text.encode('utf-8'))
+                self.blob_store.put_file(self.key_for(digest, f".{name}.gz"), tmp_path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            return True
+
+    def _remove_sidecars(self, digest):
+        for key in self.blob_store.list(self.key_for(digest, ".")):
+            if key.endswith(".gz"):
+                self.blob_store.delete(key)
+
+    def download_url(self, resume, filename=None):
+        """返回简历文件的预签名下载 URL，存储后端不支持（local）或文件不是按内容存储时返回None"""
+        if not resume.get('file_hash'):
+            return None
+        ext = os.path.splitext(resume.get('filename') or '')[1].lower() or ".pdf"
+        return self.blob_store.presigned_url(
+            self.key_for(resume['file_hash'], ext),
+            filename=filename or resume.get('filename'),
+            content_type='application/pdf' if ext == '.pdf' else None
+        )
+
+    def resolve(self, resume, legacy_folder=None):
+        """返回简历文件在磁盘上的路径，找不到时返回None
+
+        优先按 file_hash 定位内容寻址的文件（远程存储会先下载到本机缓存），
+        其次使用记录中的 filepath，最后在旧的平铺目录中按文件名查找。
+        """
+        filename = resume.get('filename') or ''
+        ext = os.path.splitext(filename)[1].lower() or ".pdf"
+
+        if resume.get('file_hash'):
+            path = self.blob_store.local_path(self.key_for(resume['file_hash'], ext))
+            if path:
+                return path
+
+        candidates = []
+        if resume.get('filepath'):
+            filepath = resume['filepath']
+            if os.path.isabs(filepath):
+                candidates.append(filepath)
+            else:
+                candidates.extend([os.path.join(BASE_DIR, filepath), os.path.abspath(filepath)])
+        if filename and legacy_folder:
+            candidates.extend([os.path.join(BASE_DIR, legacy_folder, filename), os.path.join(legacy_folder, filename)])
+
+        for candidate in candidates:
+            if os.path.exists(candidate):
+                return candidate
+        return None
+
+    @contextmanager
+    def _digest_lock(self, digest):
+        """进程内按内容哈希加锁，没有线程使用的锁随即丢弃"""
+        with self._locks_guard:
+            entry = self._digest_locks.setdefault(digest, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._digest_locks[digest]
+
+    @contextmanager
+    def _refs(self, digest):
+        """加锁读写引用计数文件（按内容哈希的线程锁 + 跨进程文件锁）
+
+        退出时计数为 0 的计数文件在持有文件锁时删除，所以计数文件只在有引用时存在。
+        """
+        refs_path = self.path_for(digest, ".refs")
+        with self._digest_lock(digest):
+            f = self._open_refs(refs_path)
+            remove = False
+            try:
+                refs = _RefCount(f)
+                yield refs
+                remove = refs.read() == 0
+            finally:
+                if remove and fcntl:
+                    os.remove(refs_path)
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+                if remove and not fcntl:
+                    os.remove(refs_path)
+
+    @staticmethod
+    def _open_refs(refs_path):
+        """打开并锁住引用计数文件
+
+        等锁期间文件可能被其他进程删除（计数归零），锁住的已是失效的 inode，
+        这时重新打开路径上的文件再加锁。
+        """
+        while True:
+            os.makedirs(os.path.dirname(refs_path), exist_ok=True)
+            f = open(refs_path, 'a+')
+            if not fcntl:
+                return f
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(refs_path).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            fcntl.flock(f, fcntl.LOCK_UN)
+            f.close()
+
+
+class _UploadWriter:
+    """单次遍历完成写盘、哈希、文件头检查和大小限制"""
+
+    def __init__(self, storage, ext, max_bytes, signature):
+        self.storage = storage
+        self.ext = ext
+        self.max_bytes = max_bytes
+        self.signature = signature
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._head = b''
+        self._signature_ok = signature is None
+        fd, self._tmp_path = tempfile.mkstemp(dir=storage._tmp_dir)
+        self._out = os.fdopen(fd, 'wb')
+
+    def write(self, data):
+        if not data:
+            return
+        self.size += len(data)
+        if self.max_bytes is not None and self.size > self.max_bytes:
+            raise UploadTooLarge(f"File exceeds the maximum upload size of {self.max_bytes} bytes")
+
+        if not self._signature_ok:
+            # 只收集文件开头连续的字节，直到窗口填满
+            window = SIGNATURE_WINDOW + len(self.signature)
+            self._head += data[:window - len(self._head)]
+            if self.signature in self._head:
+                self._signature_ok = True
+                self._head = b''
+            elif len(self._head) >= window:
+                raise InvalidFileContent(f"File content does not match the {self.ext} file type")
+
+        self._digest.update(data)
+        self._out.write(data)
+
+    def commit(self):
+        """完成写入，返回 (十六进制摘要, 文件路径)"""
+        try:
+            if not self._signature_ok:
+                raise InvalidFileContent(f"File content does not match the {self.ext} file type")
+            self._out.close()
+            digest = self._digest.hexdigest()
+            return digest, self.storage._commit(self._tmp_path, digest, self.ext)
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        """丢弃已写入的内容"""
+        if not self._out.closed:
+            self._out.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class _RefCount:
+    """已加锁的引用计数文件"""
+
+    def __init__(self, f):
+        self._f = f
+
+    def read(self):
+        self._f.seek(0)
+        value = self._f.read().strip()
+        return int(value) if value else 0
+
+    def write(self, count):
+        self._f.seek(0)
+        self._f.truncate()
+        self._f.write(str(count))
+        self._f.flush()
+
+
+# 全局存储实例
+upload_storage = UploadStorage(UPLOAD_ROOT, create_blob_store(STORAGE_BACKEND, UPLOAD_ROOT))
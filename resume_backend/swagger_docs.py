@@ -21,9 +21,42 @@ upload_docs = {
             'type': 'string',
             'required': True,
             'description': 'User ID associated with the resume'
+        },
+        {
+            'name': 'async',
+            'in': 'query',
+            'type': 'boolean',
+            'required': False,
+            'description': 'Return 202 immediately and parse the resume in a background job (poll /api/v1/jobs/{job_id})'
+        },
+        {
+            'name': 'parser',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['local', 'llm', 'auto'],
+            'required': False,
+            'description': 'local uses the regex-based local parser, llm uses OpenAI, auto tries the local parser first and calls the LLM only when its confidence is low (default: RESUME_PARSER_MODE)'
         }
     ],
     'responses': {
+        202: {
+            'description': 'Resume uploaded and queued for background parsing',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'success'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'resume_id': {'type': 'string', 'example': '60d21b4567a8d1e6d74c2f1a'},
+                            'job_id': {'type': 'string', 'example': '3f2b9c1e8d7a4b6c9e0f1a2b3c4d5e6f'},
+                            'job_status': {'type': 'string', 'example': 'queued'},
+                            'status_url': {'type': 'string', 'example': '/api/v1/jobs/3f2b9c1e8d7a4b6c9e0f1a2b3c4d5e6f'}
+                        }
+                    }
+                }
+            }
+        },
         201: {
             'description': 'Resume uploaded and parsed successfully',
             'schema': {
@@ -71,7 +104,8 @@ upload_docs = {
                                         }
                                     }
                                 }
-                            }
+                            },
+                            'dedup_hit': {'type': 'boolean', 'example': False, 'description': 'True when an identical file was already parsed and its content and analysis were reused'}
                         }
                     }
                 }
@@ -87,6 +121,26 @@ upload_docs = {
                 }
             }
         },
+        413: {
+            'description': 'File exceeds MAX_UPLOAD_BYTES',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'error'},
+                    'message': {'type': 'string', 'example': 'File exceeds the maximum upload size of 10485760 bytes'}
+                }
+            }
+        },
+        415: {
+            'description': 'Not a PDF file (checked by extension and file signature)',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'error'},
+                    'message': {'type': 'string', 'example': 'File content does not match the .pdf file type'}
+                }
+            }
+        },
         500: {
             'description': 'Server error during parsing',
             'schema': {
@@ -113,6 +167,14 @@ parse_docs = {
             'type': 'string',
             'required': True,
             'description': 'Resume ID to parse'
+        },
+        {
+            'name': 'parser',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['local', 'llm', 'auto'],
+            'required': False,
+            'description': 'local uses the regex-based local parser, llm uses OpenAI, auto tries the local parser first and calls the LLM only when its confidence is low (default: RESUME_PARSER_MODE)'
         }
     ],
     'responses': {
@@ -362,6 +424,13 @@ get_resume_docs = {
             'type': 'string',
             'required': True,
             'description': 'Resume ID to retrieve'
+        },
+        {
+            'name': 'If-None-Match',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'ETag from a previous response; 304 is returned when it still matches'
         }
     ],
     'responses': {
@@ -393,6 +462,9 @@ get_resume_docs = {
                 }
             }
         },
+        304: {
+            'description': 'Not modified: the If-None-Match ETag still matches'
+        },
         404: {
             'description': 'Resume not found',
             'schema': {
@@ -419,6 +491,13 @@ get_analysis_docs = {
             'type': 'string',
             'required': True,
             'description': 'Resume ID to retrieve analysis for'
+        },
+        {
+            'name': 'If-None-Match',
+            'in': 'header',
+            'type': 'string',
+            'required': False,
+            'description': 'ETag from a previous response; 304 is returned when it still matches'
         }
     ],
     'responses': {
@@ -454,6 +533,9 @@ get_analysis_docs = {
                 }
             }
         },
+        304: {
+            'description': 'Not modified: the If-None-Match ETag still matches'
+        },
         404: {
             'description': 'Analysis not found',
             'schema': {
@@ -544,6 +626,22 @@ compatibility_docs = {
             'type': 'string',
             'required': True,
             'description': 'User ID associated with the resume'
+        },
+        {
+            'name': 'pipeline',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['combined', 'separate'],
+            'required': False,
+            'description': 'combined parses and analyzes the resume with a single LLM call; separate parses first, then analyzes (default: ONE_SHOT_PIPELINE)'
+        },
+        {
+            'name': 'parser',
+            'in': 'query',
+            'type': 'string',
+            'enum': ['local', 'llm', 'auto'],
+            'required': False,
+            'description': 'local uses the regex-based local parser, llm uses OpenAI, auto tries the local parser first and calls the LLM only when its confidence is low (default: RESUME_PARSER_MODE)'
         }
     ],
     'responses': {
@@ -592,6 +690,26 @@ compatibility_docs = {
                 }
             }
         },
+        413: {
+            'description': 'File exceeds MAX_UPLOAD_BYTES',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'error'},
+                    'message': {'type': 'string', 'example': 'File exceeds the maximum upload size of 10485760 bytes'}
+                }
+            }
+        },
+        415: {
+            'description': 'Not a PDF file (checked by extension and file signature)',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'error'},
+                    'message': {'type': 'string', 'example': 'File content does not match the .pdf file type'}
+                }
+            }
+        },
         500: {
             'description': 'Server error',
             'schema': {
@@ -630,4 +748,54 @@ health_check_docs = {
             }
         }
     }
-} 
\ No newline at end of file
+} 
+# Background job status endpoint
+job_status_docs = {
+    'tags': ['Resume Management'],
+    'summary': 'Get background job status',
+    'description': 'Poll the status of an asynchronous upload (queued -> parsing -> parsed/failed). '
+                   'A job that has not finished within JOB_TIMEOUT seconds is reported as failed.',
+    'produces': ['application/json'],
+    'parameters': [
+        {
+            'name': 'job_id',
+            'in': 'path',
+            'type': 'string',
+            'required': True,
+            'description': 'Job ID returned by the upload endpoint with async=1'
+        }
+    ],
+    'responses': {
+        200: {
+            'description': 'Job status retrieved successfully',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'success'},
+                    'data': {
+                        'type': 'object',
+                        'properties': {
+                            'job_id': {'type': 'string', 'example': '3f2b9c0d8e7a4b6c9d1e2f3a4b5c6d7e'},
+                            'type': {'type': 'string', 'example': 'parse'},
+                            'resume_id': {'type': 'string', 'example': '60d21b4567a8d1e6d74c2f1a'},
+                            'job_status': {'type': 'string', 'enum': ['queued', 'parsing', 'parsed', 'failed'], 'example': 'parsed'},
+                            'created_at': {'type': 'string', 'format': 'date-time', 'example': '2023-05-01T10:00:00'},
+                            'updated_at': {'type': 'string', 'format': 'date-time', 'example': '2023-05-01T10:00:05'},
+                            'error': {'type': 'string', 'example': 'Job did not finish within 900s (interrupted by a restart?)'}
+                        }
+                    }
+                }
+            }
+        },
+        404: {
+            'description': 'Job not found',
+            'schema': {
+                'type': 'object',
+                'properties': {
+                    'status': {'type': 'string', 'example': 'error'},
+                    'message': {'type': 'string', 'example': 'Job not found'}
+                }
+            }
+        }
+    }
+}
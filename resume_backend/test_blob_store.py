@@ -0,0 +1,190 @@
+"""S3 存储后端的测试：用进程内的 S3 客户端替身代替 boto3"""
+import io
+import os
+
+import pytest
+
+from blob_store import S3BlobStore
+from storage import UploadStorage
+
+PDF = b"%PDF-1.4\n" + b"0" * 1024
+
+
+class ClientError(Exception):
+    """与 botocore.exceptions.ClientError 相同的 response 结构"""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class FakeS3Client:
+    """只实现 S3BlobStore 用到的 boto3 S3 客户端方法，对象保存在字典中"""
+
+    def __init__(self):
+        self.objects = {}
+        self.downloads = 0
+
+    def upload_file(self, path, bucket, key):
+        with open(path, 'rb') as f:
+            self.objects[(bucket, key)] = f.read()
+
+    def upload_fileobj(self, stream, bucket, key):
+        self.objects[(bucket, key)] = stream.read()
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError('NoSuchKey')
+        return {'Body': io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def head_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise ClientError('404')
+        return {'ContentLength': len(self.objects[(Bucket, Key)])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def download_file(self, bucket, key, path):
+        if (bucket, key) not in self.objects:
+            raise ClientError('404')
+        self.downloads += 1
+        with open(path, 'wb') as f:
+            f.write(self.objects[(bucket, key)])
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        objects = self.objects
+
+        class Paginator:
+            def paginate(self, Bucket, Prefix):
+                keys = sorted(key for bucket, key in objects if bucket == Bucket and key.startswith(Prefix))
+                # 每页两个 key，覆盖分页
+                return [{'Contents': [{'Key': key} for key in keys[i:i + 2]]} for i in range(0, len(keys), 2)] or [{}]
+        return Paginator()
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        disposition = Params.get('ResponseContentDisposition', '')
+        return f"https://s3.test/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}&disposition={disposition}"
+
+
+@pytest.fixture
+def client():
+    return FakeS3Client()
+
+
+@pytest.fixture
+def store(tmp_path, client):
+    return S3BlobStore("resumes", str(tmp_path / "cache"), prefix="uploads", client=client)
+
+
+def write_file(tmp_path, data, name="upload.tmp"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_put_file_uploads_and_keeps_a_local_copy(tmp_path, store, client):
+    store.put_file("ab/cd/file.pdf", write_file(tmp_path, PDF))
+    assert client.objects[("resumes", "uploads/ab/cd/file.pdf")] == PDF
+    assert store.exists("ab/cd/file.pdf")
+    assert not store.exists("ab/cd/missing.pdf")
+    assert store.open("ab/cd/file.pdf").read() == PDF
+    with open(store.local_path("ab/cd/file.pdf"), 'rb') as f:
+        assert f.read() == PDF
+    assert client.downloads == 0
+
+
+def test_open_missing_raises_file_not_found(store):
+    with pytest.raises(FileNotFoundError):
+        store.open("ab/cd/missing.pdf")
+
+
+def test_local_path_downloads_once_and_caches(store, client):
+    client.objects[("resumes", "uploads/ab/cd/remote.pdf")] = PDF
+    first = store.local_path("ab/cd/remote.pdf")
+    second = store.local_path("ab/cd/remote.pdf")
+    assert first == second
+    assert client.downloads == 1
+    assert store.local_path("ab/cd/missing.pdf") is None
+
+
+def test_delete_removes_object_and_cached_copy(tmp_path, store, client):
+    store.put_file("ab/cd/file.pdf", write_file(tmp_path, PDF))
+    assert store.cache.local_path("ab/cd/file.pdf") is not None
+    store.delete("ab/cd/file.pdf")
+    assert not store.exists("ab/cd/file.pdf")
+    assert client.objects == {}
+    assert store.cache.local_path("ab/cd/file.pdf") is None
+
+
+def test_list_strips_the_prefix_across_pages(tmp_path, store):
+    for name in ("a.pdf", "a.text.gz", "a.pages.gz", "b.pdf"):
+        store.put_stream(f"ab/cd/{name}", io.BytesIO(b"x"))
+    assert store.list("ab/cd/a.") == ["ab/cd/a.pages.gz", "ab/cd/a.pdf", "ab/cd/a.text.gz"]
+    assert store.list("ef/") == []
+
+
+def test_presigned_url(store):
+    url = store.presigned_url("ab/cd/file.pdf", expires_in=60, filename="cv.pdf")
+    assert url.startswith("https://s3.test/resumes/uploads/ab/cd/file.pdf?expires=60")
+    assert 'filename="cv.pdf"' in url
+
+
+def test_upload_storage_on_s3_deletes_file_and_sidecars(tmp_path, store, client):
+    storage = UploadStorage(str(tmp_path / "root"), store)
+    digest, path = storage.save(io.BytesIO(PDF))
+    storage.write_sidecar(digest, "text", "hello")
+    assert storage.read_sidecar(digest, "text") == "hello"
+    assert len(client.objects) == 2
+
+    storage.release(digest)
+    assert client.objects == {}
+
+
+def test_download_redirects_to_presigned_url(tmp_path, store, monkeypatch):
+    import app
+    monkeypatch.setattr(app.upload_storage, 'blob_store', store)
+    digest, path = app.upload_storage.save(io.BytesIO(PDF))
+    resume_id = app.db.save_resume("cv.pdf", path, "u1", {"name": "Jane"}, file_hash=digest)
+
+    response = app.app.test_client().get(f"/api/v1/resumes/{resume_id}/download")
+    assert response.status_code == 302
+    assert response.headers['Location'].startswith(f"https://s3.test/resumes/uploads/{digest[:2]}/{digest[2:4]}/{digest}.pdf")
+    assert 'optimized_cv.pdf' in response.headers['Location']
+
+
+def test_local_cache_evicts_least_recently_used_files(tmp_path, client):
+    store = S3BlobStore("resumes", str(tmp_path / "cache"), client=client, cache_max_bytes=2 * len(PDF))
+    refs = tmp_path / "cache" / "ab" / "cd" / "held.refs"
+    refs.parent.mkdir(parents=True)
+    refs.write_text("1")
+    for name in ("a", "b", "c"):
+        client.objects[("resumes", f"ab/cd/{name}.pdf")] = PDF
+
+    a = store.local_path("ab/cd/a.pdf")
+    store.local_path("ab/cd/b.pdf")
+    os.utime(a, (0, 0))  # a 最久未使用
+    store.local_path("ab/cd/c.pdf")
+
+    assert store.cache.local_path("ab/cd/a.pdf") is None
+    assert store.cache.local_path("ab/cd/b.pdf") is not None
+    assert store.cache.local_path("ab/cd/c.pdf") is not None
+    assert refs.read_text() == "1"  # 引用计数文件不属于缓存
+
+    # 被淘汰的文件需要时重新下载
+    assert store.local_path("ab/cd/a.pdf") is not None
+    assert client.downloads == 4
+
+
+def test_cache_hit_counts_as_recent_use(tmp_path, client):
+    store = S3BlobStore("resumes", str(tmp_path / "cache"), client=client, cache_max_bytes=2 * len(PDF))
+    for name in ("a", "b", "c"):
+        client.objects[("resumes", f"ab/cd/{name}.pdf")] = PDF
+    os.utime(store.local_path("ab/cd/a.pdf"), (0, 0))
+    os.utime(store.local_path("ab/cd/b.pdf"), (1, 1))
+
+    store.local_path("ab/cd/a.pdf")  # 命中，a 变为最近使用
+    store.local_path("ab/cd/c.pdf")
+    assert store.cache.local_path("ab/cd/a.pdf") is not None
+    assert store.cache.local_path("ab/cd/b.pdf") is None
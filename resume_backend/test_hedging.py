@@ -0,0 +1,148 @@
+"""对冲分析的测试：用 register_provider 注册的本地替身代替真实模型"""
+import io
+import json
+import time
+
+import pytest
+
+import resume_analyzer
+
+ANALYSIS = {"overall_score": 80}
+
+
+def provider(delay=0, result=ANALYSIS, error=None):
+    def complete(prompt, timeout):
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return json.dumps(result)
+    return complete
+
+
+@pytest.fixture
+def hedging(monkeypatch):
+    """注册 primary/secondary 两个替身，对冲延迟 0.1 秒，截止时间 1 秒"""
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_PRIMARY", "primary")
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_SECONDARY", "secondary")
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_HEDGE_AFTER", 0.1)
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_DEADLINE", 1.0)
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_PROVIDERS", dict(resume_analyzer.ANALYZER_PROVIDERS))
+
+    def register(primary, secondary):
+        resume_analyzer.register_provider("primary", primary)
+        resume_analyzer.register_provider("secondary", secondary)
+    return register
+
+
+def test_primary_wins_without_hedging(hedging):
+    hedging(provider(), provider(result={"overall_score": 1}))
+    meta = {}
+    assert resume_analyzer.analyze_with_hedging("prompt", meta) == ANALYSIS
+    assert meta['provider'] == "primary"
+    assert meta['hedged'] is False
+
+
+def test_secondary_wins_after_hedge_delay(hedging):
+    hedging(provider(delay=0.5, result={"overall_score": 1}), provider())
+    meta = {}
+    assert resume_analyzer.analyze_with_hedging("prompt", meta) == ANALYSIS
+    assert meta['provider'] == "secondary"
+    assert meta['hedged'] is True
+    assert 100 <= meta['latency_ms'] < 500
+
+
+def test_primary_failure_hedges_immediately(hedging):
+    hedging(provider(error=RuntimeError("down")), provider())
+    meta = {}
+    assert resume_analyzer.analyze_with_hedging("prompt", meta) == ANALYSIS
+    assert meta['provider'] == "secondary"
+    assert meta['latency_ms'] < 100
+
+
+def test_all_providers_fail(hedging):
+    hedging(provider(error=RuntimeError("primary down")), provider(result=["not", "an", "object"]))
+    with pytest.raises(resume_analyzer.AnalysisUnavailable) as excinfo:
+        resume_analyzer.analyze_with_hedging("prompt", {})
+    assert "primary down" in str(excinfo.value)
+    assert excinfo.value.retry_after >= 1
+
+
+def test_deadline_passes(hedging):
+    hedging(provider(delay=2), provider(delay=2))
+    start = time.monotonic()
+    with pytest.raises(resume_analyzer.AnalysisUnavailable) as excinfo:
+        resume_analyzer.analyze_with_hedging("prompt", {})
+    assert time.monotonic() - start < 1.5
+    assert "deadline" in str(excinfo.value)
+
+
+def test_providers_receive_remaining_time(hedging):
+    seen = []
+
+    def primary(prompt, timeout):
+        seen.append(timeout)
+        return json.dumps(ANALYSIS)
+    hedging(primary, provider())
+    resume_analyzer.analyze_with_hedging("prompt", {})
+    assert 0 < seen[0] <= 1.0
+
+
+def test_combined_prompt_is_hedged_with_the_analysis_rubric(monkeypatch, hedging):
+    prompts = []
+
+    def primary(prompt, timeout):
+        prompts.append(prompt)
+        return json.dumps({"resume": {"name": "Jane"}, "analysis": ANALYSIS})
+    hedging(primary, provider())
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_HEDGING", True)
+    meta = {}
+    parsed, analysis = resume_analyzer.parse_and_analyze("Jane Doe\nPython engineer", meta)
+    assert parsed == {"name": "Jane"}
+    assert analysis == ANALYSIS
+    assert meta['provider'] == "primary"
+    assert resume_analyzer.ANALYSIS_CRITERIA in prompts[0]
+    assert resume_analyzer.ANALYSIS_ROLE in prompts[0]
+
+
+@pytest.fixture
+def one_shot(monkeypatch, hedging):
+    """兼容接口的 combined 流水线：文本提取和分步解析用替身，记录分步解析的调用"""
+    import resume_parser
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_HEDGING", True)
+    monkeypatch.setattr(resume_parser, "extract_text", lambda filepath, file_hash=None: "Jane Doe\nPython engineer")
+    separate_parses = []
+
+    def parse_resume(filepath, meta=None, parser=None, file_hash=None):
+        separate_parses.append(filepath)
+        return {"name": "Jane"}
+    monkeypatch.setattr(resume_parser, "parse_resume", parse_resume)
+
+    def upload(name):
+        from app import app
+        data = {'user_id': 'one-shot-user', 'file': (io.BytesIO(b"%PDF-1.4\n" + name.encode()), f"{name}.pdf")}
+        return app.test_client().post('/api/resumes?parser=llm&pipeline=combined', data=data,
+                                      content_type='multipart/form-data')
+    return hedging, upload, separate_parses
+
+
+def test_one_shot_unavailable_is_not_retried_as_separate_calls(one_shot):
+    register, upload, separate_parses = one_shot
+    register(provider(error=RuntimeError("primary down")), provider(error=RuntimeError("secondary down")))
+
+    response = upload("unavailable")
+    assert response.status_code == 503
+    assert 'Retry-After' in response.headers
+    assert separate_parses == []
+
+
+def test_one_shot_falls_back_when_combined_response_is_incomplete(one_shot):
+    register, upload, separate_parses = one_shot
+    register(provider(), provider())  # 只有分析结果，没有 resume 部分
+
+    response = upload("incomplete")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['data']['parsed_content'] == {"name": "Jane"}
+    assert body['data']['analysis'] == ANALYSIS
+    assert body['meta']['pipeline'] == 'separate'
+    assert len(separate_parses) == 1
@@ -0,0 +1,31 @@
+"""条件请求的测试：只有 If-None-Match 能得到 304"""
+import datetime
+
+import pytest
+from flask import Flask, request
+
+from http_cache import make_etag, not_modified
+
+app = Flask(__name__)
+
+ETAG = make_etag('resume', 'hash', 'parsed')
+UPDATED = datetime.datetime(2024, 5, 1, 10, 0, 0)
+LATER = 'Wed, 01 Jan 2031 00:00:00 GMT'
+
+
+@pytest.mark.parametrize('headers, status', [
+    ({}, None),
+    ({'If-None-Match': f'"{ETAG}"'}, 304),
+    ({'If-None-Match': '*'}, 304),
+    ({'If-None-Match': '"other"'}, None),
+    # 日期不能说明 ETag 覆盖的内容（生成器版本、配置等）是否变化
+    ({'If-Modified-Since': LATER}, None),
+    ({'If-None-Match': '"other"', 'If-Modified-Since': LATER}, None),
+])
+def test_not_modified(headers, status):
+    with app.test_request_context('/', headers=headers):
+        response = not_modified(request, ETAG, UPDATED)
+    assert (response.status_code if response else None) == status
+    if response:
+        assert response.headers['ETag'] == f'"{ETAG}"'
+        assert 'Last-Modified' in response.headers
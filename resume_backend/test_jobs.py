@@ -0,0 +1,34 @@
+"""后台任务状态查询的测试：重启后遗留的未完成任务"""
+import datetime
+
+import db
+import jobs
+from app import app
+
+
+def stale_job(job_id, status, age):
+    resume_id = db.save_resume("cv.pdf", "/tmp/cv.pdf", "u1", None, status="queued")
+    db.save_job(job_id, "parse", resume_id, status=status)
+    db.jobs.update_one({"_id": job_id}, {"$set": {"updated_at": datetime.datetime.now() - age}})
+    return resume_id
+
+
+def test_unfinished_job_past_timeout_is_reported_failed():
+    resume_id = stale_job("stale-job", "parsing", datetime.timedelta(seconds=jobs.JOB_TIMEOUT + 60))
+
+    response = app.test_client().get('/api/v1/jobs/stale-job')
+    assert response.status_code == 200
+    data = response.get_json()['data']
+    assert data['job_status'] == 'failed'
+    assert 'did not finish' in data['error']
+    assert db.get_job("stale-job")['status'] == 'failed'
+    assert db.get_resume(resume_id)['status'] == 'failed'
+
+
+def test_recent_or_finished_jobs_are_left_alone():
+    stale_job("fresh-job", "queued", datetime.timedelta(seconds=5))
+    stale_job("done-job", "parsed", datetime.timedelta(seconds=jobs.JOB_TIMEOUT + 60))
+
+    client = app.test_client()
+    assert client.get('/api/v1/jobs/fresh-job').get_json()['data']['job_status'] == 'queued'
+    assert client.get('/api/v1/jobs/done-job').get_json()['data']['job_status'] == 'parsed'
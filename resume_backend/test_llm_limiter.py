@@ -0,0 +1,142 @@
+"""LLM 限流器的测试：排队超时、429 暂停和流式调用的名额释放
+
+用替身代替 OpenAI 客户端，不发出真实请求。
+"""
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import RateLimitError
+
+import db
+import llm_provider
+import resume_analyzer
+from app import app
+from llm_limiter import LLMLimiter, LLMQueueTimeout
+
+
+class FakeOpenAI:
+    """按顺序返回预设结果的 chat.completions 替身
+
+    结果为异常时抛出，为字符串时作为补全内容，其他（流式分块的迭代器）原样返回。
+    """
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(
+            with_raw_response=SimpleNamespace(create=self._create_raw)
+        ))
+
+    def _next(self, kwargs):
+        self.calls.append((time.monotonic(), kwargs))
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _create_raw(self, **kwargs):
+        response = self._next(kwargs)
+        if isinstance(response, str):
+            response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=response))])
+        return SimpleNamespace(headers={}, status_code=200, parse=lambda: response)
+
+
+def rate_limited(retry_after):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+    return RateLimitError("rate limited", response=response, body=None)
+
+
+def chunks(*deltas, error=None):
+    for delta in deltas:
+        yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))])
+    if error is not None:
+        raise error
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """每个测试使用独立的限流器（1 个并发名额），并关闭响应缓存"""
+    limiter = LLMLimiter(max_in_flight=1, queue_timeout=0.5)
+    monkeypatch.setattr(llm_provider, "llm_limiter", limiter)
+    monkeypatch.setattr(resume_analyzer, "llm_limiter", limiter)
+    monkeypatch.setattr(llm_provider, "LLM_CACHE_ENABLED", False)
+    return limiter
+
+
+def use_client(monkeypatch, client):
+    monkeypatch.setattr(llm_provider, "openai_client", client)
+    return client
+
+
+def test_queue_timeout_makes_analyze_return_503(monkeypatch, limiter):
+    use_client(monkeypatch, FakeOpenAI())
+    monkeypatch.setattr(resume_analyzer, "USE_OPENAI", True)
+    monkeypatch.setattr(resume_analyzer, "ANALYZER_HEDGING", False)
+    resume_id = db.save_resume("cv.pdf", "/tmp/cv.pdf", "limiter-user", {"name": "Ann Lee", "skills": ["Python"]})
+
+    # 唯一的名额被占用，分析请求排队超时
+    with limiter.slot():
+        response = app.test_client().post(f'/api/v1/resumes/{resume_id}/analyze')
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert "unavailable" in response.get_json()['message']
+    assert limiter.stats()['timeouts'] == 1
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_429_retry_after_pauses_later_acquires(limiter):
+    limiter.observe({'Retry-After': '0.3'}, 429)
+    assert 0 < limiter.retry_after() <= 0.3
+    assert limiter.stats()['rate_limited'] == 1
+
+    start = time.monotonic()
+    with limiter.slot(timeout=1):
+        waited = time.monotonic() - start
+    assert waited >= 0.25
+
+    limiter.observe({'Retry-After': '5'}, 429)
+    with pytest.raises(LLMQueueTimeout):
+        with limiter.slot(timeout=0.1):
+            pass
+
+
+def test_complete_waits_out_retry_after_before_retrying(monkeypatch, limiter):
+    client = use_client(monkeypatch, FakeOpenAI(rate_limited("0.3"), "ok"))
+    monkeypatch.setattr(llm_provider, "LLM_MAX_RETRIES", 1)
+
+    assert llm_provider.complete([{"role": "user", "content": "hi"}], "gpt-4o-mini", json=False) == "ok"
+    (first, _), (second, _) = client.calls
+    assert second - first >= 0.25
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_stream_releases_slot_when_it_ends(monkeypatch, limiter):
+    use_client(monkeypatch, FakeOpenAI(chunks("Hello", " world")))
+
+    assert list(llm_provider.stream([{"role": "user", "content": "hi"}], "gpt-4o-mini")) == ["Hello", " world"]
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_stream_releases_slot_when_it_raises(monkeypatch, limiter):
+    use_client(monkeypatch, FakeOpenAI(chunks("Hello", error=RuntimeError("connection dropped"))))
+
+    received = []
+    with pytest.raises(RuntimeError):
+        for delta in llm_provider.stream([{"role": "user", "content": "hi"}], "gpt-4o-mini"):
+            received.append(delta)
+    assert received == ["Hello"]
+    assert limiter.stats()['in_flight'] == 0
+
+
+def test_stream_releases_slot_when_client_stops_reading(monkeypatch, limiter):
+    use_client(monkeypatch, FakeOpenAI(chunks("Hello", " world")))
+
+    stream = llm_provider.stream([{"role": "user", "content": "hi"}], "gpt-4o-mini")
+    assert next(stream) == "Hello"
+    assert limiter.stats()['in_flight'] == 1
+    stream.close()
+    assert limiter.stats()['in_flight'] == 0
@@ -0,0 +1,163 @@
+"""本地解析器的测试：章节标题、日期、邮箱、电话的正则和置信度"""
+import pytest
+
+import local_parser
+from local_parser import HEADING_RE, DATE_RANGE_RE, EMAIL_RE, PHONE_RE, parse_resume_text, split_sections
+
+RESUME_EN = """Jane Doe
+jane.doe@example.com | +1 (415) 555-1234 | San Francisco, CA
+linkedin.com/in/janedoe
+
+Summary
+Backend engineer with 6 years of experience.
+
+Experience
+Senior Software Engineer | Acme Technologies | Jan 2020 - Present
+- Led migration to Kubernetes
+- Cut p99 latency by 40%
+Software Engineer | Beta Labs | Jun 2016 - Dec 2019
+- Built billing APIs
+
+Education
+Stanford University | B.S. in Computer Science | 2012 - 2016
+GPA: 3.8/4.0
+
+Skills
+Languages: Python, Go, SQL
+Tools: Docker, Kubernetes
+"""
+
+RESUME_ZH = """张三
+电话：138 0013 8000  邮箱：zhangsan@example.cn
+
+工作经历
+后端工程师 | 字节跳动科技有限公司 | 2019.07 - 至今
+- 负责推荐系统服务端开发
+
+教育背景
+清华大学 | 本科 计算机科学 | 2015.09 - 2019.06
+
+专业技能
+Python、Go、MySQL
+"""
+
+
+@pytest.mark.parametrize('line, section', [
+    ('Experience', 'experience'),
+    ('WORK EXPERIENCE', 'experience'),
+    ('Professional   Experience:', 'experience'),
+    ('## Education', 'education'),
+    ('Technical Skills：', 'skills'),
+    ('Licenses & Certifications', 'certifications'),
+    ('工作经历', 'experience'),
+    ('教育背景', 'education'),
+    ('Experience at Google', None),
+    ('Skills and more', None),
+    ('Led the education team', None),
+])
+def test_heading(line, section):
+    match = HEADING_RE.match(line)
+    if section is None:
+        assert match is None
+    else:
+        assert match is not None
+        assert list(split_sections(line + "\nbody")[1]) == [section]
+
+
+@pytest.mark.parametrize('text, start, end', [
+    ('Jan 2020 - Present', 'Jan 2020', 'Present'),
+    ('Sept. 2017 — Jun 2018', 'Sept. 2017', 'Jun 2018'),
+    ('03/2019 – 12/2021', '03/2019', '12/2021'),
+    ('2015 to 2019', '2015', '2019'),
+    ('2018.09 至 2022.06', '2018.09', '2022.06'),
+    ('2020年3月 - 至今', '2020年3月', '至今'),
+    ('Acme | May 2021 ~ current', 'May 2021', 'current'),
+])
+def test_date_range(text, start, end):
+    assert DATE_RANGE_RE.search(text).groups() == (start, end)
+
+
+@pytest.mark.parametrize('text', ['Cut latency by 40%', 'Led a team of 12 engineers'])
+def test_no_date_range(text):
+    assert DATE_RANGE_RE.search(text) is None
+
+
+@pytest.mark.parametrize('text, email', [
+    ('jane.doe@example.com | +1 415', 'jane.doe@example.com'),
+    ('mail: jane.doe+cv@mail.example.co.uk', 'jane.doe+cv@mail.example.co.uk'),
+    ('邮箱：zhangsan@example.cn', 'zhangsan@example.cn'),
+    ('contact me @ twitter', None),
+])
+def test_email(text, email):
+    match = EMAIL_RE.search(text)
+    assert (match.group(0) if match else None) == email
+
+
+@pytest.mark.parametrize('text, phone', [
+    ('+1 (415) 555-1234', '+1 (415) 555-1234'),
+    ('415.555.1234', '415.555.1234'),
+    ('电话：138 0013 8000', '138 0013 8000'),
+    ('+86 138-0013-8000', '+86 138-0013-8000'),
+    ('Class of 2020-2024', None),
+    ('2019 2020', None),
+])
+def test_phone(text, phone):
+    match = PHONE_RE.search(text)
+    assert (match.group(0) if match else None) == phone
+
+
+def test_english_resume():
+    data, confidence = parse_resume_text(RESUME_EN)
+    assert data['personal_information'] == {
+        'name': 'Jane Doe',
+        'email': 'jane.doe@example.com',
+        'phone': '+1 (415) 555-1234',
+        'linkedin': 'linkedin.com/in/janedoe',
+        'address': 'San Francisco, CA'
+    }
+    assert [(job['position'], job['company'], job['dates']) for job in data['experience']] == [
+        ('Senior Software Engineer', 'Acme Technologies', 'Jan 2020 - Present'),
+        ('Software Engineer', 'Beta Labs', 'Jun 2016 - Dec 2019'),
+    ]
+    assert data['experience'][0]['responsibilities'] == ['Led migration to Kubernetes', 'Cut p99 latency by 40%']
+    assert data['education'][0]['degree'] == 'B.S.'
+    assert data['education'][0]['gpa'] == '3.8/4.0'
+    assert data['skills'] == {'languages': ['Python', 'Go', 'SQL'], 'tools': ['Docker', 'Kubernetes']}
+    assert confidence == 1.0
+
+
+def test_chinese_resume():
+    data, confidence = parse_resume_text(RESUME_ZH)
+    assert data['personal_information']['name'] == '张三'
+    assert data['personal_information']['phone'] == '138 0013 8000'
+    assert data['experience'][0]['company'] == '字节跳动科技有限公司'
+    assert data['experience'][0]['dates'] == '2019.07 - 至今'
+    assert data['education'][0]['institution'] == '清华大学'
+    assert data['skills'] == {'general': ['Python', 'Go', 'MySQL']}
+    assert confidence == 1.0
+
+
+@pytest.mark.parametrize('data, sections, expected', [
+    ({'personal_information': {}}, {}, 0.0),
+    ({'personal_information': {'name': 'Jane Doe'}}, {'summary': ['x']}, 0.15),
+    ({'personal_information': {'name': 'Jane Doe', 'phone': '415 555 1234'}}, {'summary': ['x']}, 0.3),
+    # 两条经历中只有一条有职位和公司/日期
+    ({'personal_information': {}, 'experience': [{'position': 'Engineer', 'dates': '2020'}, {'company': 'Acme'}]},
+     {'experience': ['x']}, 0.15),
+    ({'personal_information': {}, 'education': [{'institution': 'MIT'}]}, {'education': ['x']}, 0.0),
+    ({'personal_information': {}, 'education': [{'degree': 'BSc'}], 'skills': {'general': ['Go']}},
+     {'education': ['x'], 'skills': ['x']}, 0.4),
+])
+def test_confidence(data, sections, expected):
+    assert local_parser._confidence(data, sections) == expected
+
+
+def test_unstructured_text_has_no_confidence():
+    assert parse_resume_text("just some text\nwithout any headings") == ({'personal_information': {}}, 0.0)
+
+
+def test_basic_resume_string_reads_local_parser_output():
+    from app import extract_basic_resume_string
+    data, _ = parse_resume_text(RESUME_EN)
+    assert extract_basic_resume_string(data).startswith("Jane Doe - ")
+    assert extract_basic_resume_string({'personal_info': {'name': 'Ann Lee', 'title': 'PM'}}).startswith("Ann Lee - PM")
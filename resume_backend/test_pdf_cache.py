@@ -0,0 +1,54 @@
+"""PDF 缓存的测试"""
+import os
+
+from pdf_cache import PDFArtifactCache
+
+PDF = b"%PDF-1.4\n" + b"0" * 1000
+
+
+def test_read_returns_data_and_recorded_pages(tmp_path):
+    cache = PDFArtifactCache(str(tmp_path), max_bytes=10_000)
+    cache.put_bytes('content', 'fit1', PDF, pages=1)
+    cache.put_bytes('content', 'plain', PDF)
+
+    assert cache.read('content', 'fit1') == (PDF, 1)
+    assert cache.read('content', 'plain') == (PDF, None)
+    assert cache.read('content', 'other') is None
+    assert cache.read('missing', 'fit1') is None
+
+
+def test_file_removed_after_lookup_is_a_miss(tmp_path, monkeypatch):
+    cache = PDFArtifactCache(str(tmp_path), max_bytes=10_000)
+    monkeypatch.setattr(cache, '_find', lambda group, key: (str(tmp_path / "evicted.pdf"), None))
+
+    assert cache.read('content', 'key') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_invalidate_removes_every_variant_of_the_content(tmp_path):
+    cache = PDFArtifactCache(str(tmp_path), max_bytes=10_000)
+    cache.put_bytes('old', 'plain', PDF, pages=1)
+    cache.put_bytes('old', 'fit1', PDF, pages=1)
+    cache.put_bytes('new', 'plain', PDF, pages=1)
+
+    cache.invalidate('old')
+
+    assert cache.read('old', 'plain') is None
+    assert cache.read('old', 'fit1') is None
+    assert cache.read('new', 'plain') == (PDF, 1)
+
+
+def test_caches_sharing_a_directory_share_the_budget(tmp_path):
+    # 两个 worker 各自写入，总大小仍不超过上限
+    first = PDFArtifactCache(str(tmp_path), max_bytes=len(PDF) * 3)
+    second = PDFArtifactCache(str(tmp_path), max_bytes=len(PDF) * 3)
+    for i in range(4):
+        first.put_bytes(f'a{i}', 'plain', PDF)
+        second.put_bytes(f'b{i}', 'plain', PDF)
+
+    stats = first.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] <= len(PDF) * 3
+    # 最近写入的保留，组内文件都被淘汰的目录也被删除
+    assert second.read('b3', 'plain') == (PDF, None)
+    assert not os.path.exists(tmp_path / 'a0')
@@ -0,0 +1,115 @@
+"""批量导出的测试"""
+import io
+import json
+import zipfile
+from concurrent import futures
+
+import pytest
+
+import pdf_export
+from pdf_cache import pdf_cache
+
+
+def read_zip(chunks):
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    return {name: archive.read(name) for name in archive.namelist()}
+
+
+def test_cache_entry_evicted_after_lookup_is_rendered_again(tmp_path, monkeypatch):
+    # 缓存查到路径后、打开之前文件被淘汰
+    monkeypatch.setattr(pdf_cache, '_find', lambda group, key: (str(tmp_path / "evicted.pdf"), None))
+    items = [{
+        'resume_id': '1',
+        'filename': 'ann.pdf',
+        'content': {'personal_information': {'name': 'Ann Lee'}, 'summary': 'Engineer'},
+        'cache_group': 'export-test',
+        'cache_key': 'export-test'
+    }]
+
+    files = read_zip(pdf_export.export_zip(items, parallelism=1))
+    assert json.loads(files['manifest.json']) == [{'resume_id': '1', 'filename': 'ann.pdf'}]
+    assert files['ann.pdf'].startswith(b"%PDF-")
+
+
+class FakeExecutor:
+    """代替进程池：记录同时未完成的任务数，按 complete 决定提交的任务是否立即完成"""
+
+    def __init__(self, complete=lambda content: True):
+        self.complete = complete
+        self.futures = []
+        self.max_outstanding = 0
+
+    def submit(self, fn, content):
+        future = Future()
+        self.futures.append(future)
+        outstanding = sum(1 for f in self.futures if not f.consumed)
+        self.max_outstanding = max(self.max_outstanding, outstanding)
+        if self.complete(content):
+            if content.get('fail'):
+                future.set_exception(ValueError("layout failed"))
+            else:
+                future.set_result(b"%PDF-" + content['summary'].encode())
+        return future
+
+
+class Future(futures.Future):
+    consumed = False
+
+    def result(self, timeout=None):
+        self.consumed = True
+        return super().result(timeout)
+
+
+def make_items(count, prefix):
+    return [{
+        'resume_id': str(i),
+        'filename': f'{i}.pdf',
+        'content': {'summary': f'{prefix}{i}', 'fail': i == 1},
+        'cache_group': f'{prefix}{i}',
+        'cache_key': f'{prefix}{i}'
+    } for i in range(count)]
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    monkeypatch.setattr(pdf_export, 'PDF_EXPORT_WORKERS', 4)
+    monkeypatch.setattr(pdf_export, 'PDF_EXPORT_MAX_PARALLEL', 4)
+    fake = FakeExecutor()
+    monkeypatch.setattr(pdf_export, '_get_executor', lambda: fake)
+    return fake
+
+
+def test_pool_workers_are_not_forked():
+    assert pdf_export._MP_CONTEXT.get_start_method() != 'fork'
+
+
+def test_request_submits_at_most_parallelism_renders(executor):
+    files = read_zip(pdf_export.export_zip(make_items(6, 'cap'), parallelism=2))
+
+    assert len(executor.futures) == 6
+    assert executor.max_outstanding == 2
+    assert files['0.pdf'] == b"%PDF-cap0"
+
+
+def test_failed_render_is_reported_in_the_manifest(executor):
+    files = read_zip(pdf_export.export_zip(make_items(3, 'fail'), parallelism=2))
+
+    manifest = sorted(json.loads(files['manifest.json']), key=lambda entry: entry['resume_id'])
+    assert manifest == [
+        {'resume_id': '0', 'filename': '0.pdf'},
+        {'resume_id': '1', 'error': 'layout failed'},
+        {'resume_id': '2', 'filename': '2.pdf'},
+    ]
+    assert '1.pdf' not in files
+
+
+def test_client_disconnect_cancels_pending_renders(executor):
+    # 只有第一份立即完成，客户端收到它后断开
+    executor.complete = lambda content: content['summary'] == 'gone0'
+    chunks = pdf_export.export_zip(make_items(4, 'gone'), parallelism=2)
+    next(chunks)
+    chunks.close()
+
+    assert len(executor.futures) == 2
+    assert executor.futures[0].done() and not executor.futures[0].cancelled()
+    assert executor.futures[1].cancelled()
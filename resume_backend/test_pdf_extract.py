@@ -0,0 +1,65 @@
+"""PDF 文本提取的测试：进程池启动方式、文件哈希的传递和基准测试"""
+import os
+import subprocess
+import sys
+
+import pytest
+from reportlab.pdfgen import canvas
+
+import extractors
+import pdf_extract
+from hashing import file_hash
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = str(tmp_path / "resume.pdf")
+    c = canvas.Canvas(path)
+    for i in range(4):
+        c.drawString(100, 700, f"page {i}")
+        c.showPage()
+    c.save()
+    return path
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pdf_extract, "file_hash", lambda path: calls.append(path) or file_hash(path))
+    pdf_extract.page_cache.clear()
+    return calls
+
+
+def test_parallel_extraction_does_not_fork_the_server(monkeypatch, pdf, hashes):
+    monkeypatch.setattr(pdf_extract, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(pdf_extract, "PDF_EXTRACT_WORKERS", 2)
+    pdf_extract._reset_executor()
+    try:
+        assert pdf_extract.extract_pages(pdf, file_hash(pdf)) == [f"page {i}\n" for i in range(4)]
+        assert pdf_extract._executor._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        pdf_extract._reset_executor()
+
+
+def test_known_digest_is_passed_to_the_backend(pdf, hashes):
+    segments, name = extractors.extract_segments(pdf, 'pypdf2', digest=file_hash(pdf))
+    assert name == 'pypdf2'
+    assert len(segments) == 4
+    assert hashes == []
+
+    pdf_extract.page_cache.clear()
+    extractors.extract_segments(pdf, 'pypdf2')
+    assert hashes == [pdf]
+
+
+def test_benchmark_times_extraction_without_hashing(pdf, hashes):
+    results = extractors.benchmark([pdf], repeat=2)
+    assert results['.pdf']['backends']['pypdf2']['errors'] == 0
+    assert hashes == []
+
+
+def test_importing_extractors_does_not_set_up_storage():
+    code = "import sys, extractors; print('storage' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.abspath(extractors.__file__))).stdout
+    assert output.strip().splitlines()[-1] == "False"
@@ -0,0 +1,158 @@
+"""PDF 生成器的测试：共享样式表和章节缓存在多线程下复用，输出与冷启动逐字节相同；自动排版到指定页数"""
+import io
+import threading
+
+import PyPDF2
+import pytest
+from reportlab import rl_config
+
+import resume_pdf_generator
+from resume_pdf_generator import ResumePDFGenerator, RenderConfig, DEFAULT_CONFIG, get_stylesheet
+
+
+def make_resume(jobs=3):
+    return {
+        'personal_information': {'name': 'Ann Lee', 'email': 'ann@example.com', 'phone': '555-0100'},
+        'summary': 'Backend engineer building data pipelines. ' * 5,
+        'skills': {'languages': ['Python', 'Go'], 'tools': 'git, docker'},
+        'experience': [
+            {
+                'title': f'Engineer {i}',
+                'company': f'Company {i}',
+                'dates': '2020 - 2022',
+                'responsibilities': [f'<b>Shipped</b> feature {k} for team {i}. ' * 4 for k in range(4)]
+            }
+            for i in range(jobs)
+        ],
+        'education': [{'institution': 'MIT', 'degree': 'BS', 'major': 'CS', 'dates': '2014'}],
+        'awards': ['Award A', 'Award B']
+    }
+
+
+@pytest.fixture(autouse=True)
+def invariant_output(monkeypatch):
+    """固定 PDF 中的时间戳和文档 ID，相同输入生成相同字节"""
+    monkeypatch.setattr(rl_config, 'invariant', 1)
+
+
+def cold_render(generator, resume, custom_config=None):
+    """清空样式表和章节缓存后生成"""
+    resume_pdf_generator._stylesheets.clear()
+    resume_pdf_generator.section_cache.clear()
+    return generator.generate_bytes(resume, custom_config)
+
+
+def test_equal_configs_share_one_stylesheet():
+    base = RenderConfig(DEFAULT_CONFIG)
+    first = base.merged({'font_sizes': {'normal': 12}})
+    second = base.merged({'font_sizes': {'normal': 12}})
+    assert first == second and hash(first) == hash(second)
+    assert get_stylesheet(first) is get_stylesheet(second)
+    assert get_stylesheet(first) is not get_stylesheet(base)
+    with pytest.raises(TypeError):
+        first['font_sizes']['normal'] = 8
+
+
+def test_warm_render_matches_cold_render():
+    generator = ResumePDFGenerator()
+    resume = make_resume()
+    cold = cold_render(generator, resume)
+    assert generator.generate_bytes(resume) == cold
+    assert generator.generate_bytes(resume) == cold
+
+
+def test_threads_with_custom_configs_share_the_cache_safely():
+    generator = ResumePDFGenerator()
+    resume = make_resume()
+    configs = [None, {'font_sizes': {'normal': 9}}, {'layout': {'company_date_same_line': True}}]
+    expected = [cold_render(generator, resume, config) for config in configs]
+    resume_pdf_generator._stylesheets.clear()
+    resume_pdf_generator.section_cache.clear()
+
+    mismatches = []
+    def render(index):
+        for _ in range(3):
+            if generator.generate_bytes(resume, configs[index]) != expected[index]:
+                mismatches.append(index)
+    threads = [threading.Thread(target=render, args=(i % len(configs),)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mismatches == []
+    # 线程内的自定义配置不会改动共享实例的配置
+    assert generator.config == RenderConfig(DEFAULT_CONFIG)
+
+
+def test_unchanged_sections_are_reused_after_an_edit():
+    generator = ResumePDFGenerator()
+    resume = make_resume()
+    cold_render(generator, resume)
+    edited = make_resume()
+    edited['experience'][1]['responsibilities'][0] = 'Rewrote the billing service.'
+
+    before = resume_pdf_generator.section_cache.stats()
+    pdf = generator.generate_bytes(edited)
+    after = resume_pdf_generator.section_cache.stats()
+    # 只有被修改的 experience 章节重新排版
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 5
+    assert pdf == cold_render(generator, edited)
+
+
+def test_cached_sections_render_identically_across_threads():
+    generator = ResumePDFGenerator()
+    resumes = [make_resume(jobs) for jobs in (2, 4)]
+    expected = [cold_render(generator, resume) for resume in resumes]
+    resume_pdf_generator.section_cache.clear()
+
+    mismatches = []
+    def render(index):
+        for _ in range(4):
+            if generator.generate_bytes(resumes[index]) != expected[index]:
+                mismatches.append(index)
+    threads = [threading.Thread(target=render, args=(i % 2,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mismatches == []
+    assert resume_pdf_generator.section_cache.stats()['hits'] > 0
+
+
+def page_count(pdf):
+    return len(PyPDF2.PdfReader(io.BytesIO(pdf)).pages)
+
+
+@pytest.mark.parametrize('jobs, fit_pages', [(6, 1), (14, 2)])
+def test_fit_pages_reaches_the_target_page_count(jobs, fit_pages):
+    generator = ResumePDFGenerator()
+    resume = make_resume(jobs)
+    assert page_count(generator.generate_bytes(resume)) > fit_pages
+
+    meta = {}
+    pdf = generator.generate_bytes(resume, fit_pages=fit_pages, meta=meta)
+    assert page_count(pdf) == fit_pages
+    assert meta == {'pages': fit_pages, 'fits': True}
+
+
+def test_fit_probes_do_not_fill_the_shared_caches():
+    generator = ResumePDFGenerator()
+    resume = make_resume(6)
+    cold_render(generator, resume)
+    stylesheets = set(resume_pdf_generator._stylesheets)
+    entries = resume_pdf_generator.section_cache.stats()['entries']
+
+    generator.generate_bytes(resume, fit_pages=1)
+    # 只多出最终选中的缩放配置：一份样式表和它的章节
+    assert len(set(resume_pdf_generator._stylesheets) - stylesheets) == 1
+    assert resume_pdf_generator.section_cache.stats()['entries'] == entries * 2
+
+
+def test_content_that_cannot_fit_is_reported():
+    meta = {}
+    ResumePDFGenerator().generate_bytes(make_resume(40), fit_pages=1, meta=meta)
+    assert meta['pages'] > 1
+    assert meta['fits'] is False
@@ -0,0 +1,32 @@
+"""提示词预算的测试：章节优先级按规范化后的键名精确匹配"""
+import pytest
+
+from prompt_budget import section_priority, DEFAULT_SECTION_PRIORITY
+
+
+@pytest.mark.parametrize('key, priority', [
+    ('personal_information', 0),
+    ('Personal Info', 0),
+    ('contact', 0),
+    ('Work Experience', 1),
+    ('work-experience', 1),
+    ('skills', 1),
+    ('education', 2),
+    ('projects', 2),
+    ('certifications', 3),
+    ('interests', 5),
+    ('兴趣爱好', 5),
+])
+def test_known_sections(key, priority):
+    assert section_priority(key) == priority
+
+
+@pytest.mark.parametrize('key', [
+    'network',        # 包含 "work"
+    'company_name',   # 包含 "name"
+    'username',
+    'artwork',
+    'teamwork_notes',
+])
+def test_substrings_do_not_match(key):
+    assert section_priority(key) == DEFAULT_SECTION_PRIORITY
@@ -0,0 +1,79 @@
+"""single-flight 的测试：并发调用的合并和异常传递"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from resume_analyzer import AnalysisUnavailable
+from singleflight import SingleFlight
+
+
+def run_concurrently(flight, fn, followers=3):
+    """领导者进入 fn 后再发起 followers 个相同键的调用，返回所有调用的 future（领导者在前）"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def leader_fn():
+        started.set()
+        release.wait(5)
+        return fn()
+
+    with ThreadPoolExecutor(max_workers=followers + 1) as executor:
+        leader = executor.submit(flight.do, 'key', leader_fn)
+        started.wait(5)
+        others = [executor.submit(flight.do, 'key', fn) for _ in range(followers)]
+        while flight.stats()['coalesced'] < followers:
+            threading.Event().wait(0.01)
+        release.set()
+        return [leader] + others
+
+
+def test_followers_share_the_leader_result():
+    flight = SingleFlight()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        return {'score': 80}
+
+    leader, *followers = run_concurrently(flight, fn)
+    assert leader.result() == ({'score': 80}, False)
+    assert [f.result() for f in followers] == [({'score': 80}, True)] * 3
+    assert len(calls) == 1
+    assert flight.stats() == {'executed': 1, 'coalesced': 3, 'in_flight': 0}
+
+
+def test_followers_get_their_own_copy_of_the_error():
+    flight = SingleFlight()
+
+    def fn():
+        raise AnalysisUnavailable("OpenAI is unavailable", retry_after=7)
+
+    leader, *followers = run_concurrently(flight, fn)
+    with pytest.raises(AnalysisUnavailable) as leader_error:
+        leader.result()
+
+    errors = []
+    for future in followers:
+        with pytest.raises(AnalysisUnavailable) as excinfo:
+            future.result()
+        errors.append(excinfo.value)
+
+    for error in errors:
+        assert error is not leader_error.value
+        assert str(error) == "OpenAI is unavailable"
+        assert error.retry_after == 7
+        assert error.__cause__ is leader_error.value
+    assert len({id(error) for error in errors}) == len(errors)
+
+
+def test_key_is_released_after_the_call():
+    flight = SingleFlight()
+
+    def fail():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        flight.do('key', fail)
+    assert flight.do('key', lambda: 1) == (1, False)
+    assert flight.stats() == {'executed': 2, 'coalesced': 0, 'in_flight': 0}
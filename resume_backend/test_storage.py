@@ -0,0 +1,114 @@
+"""内容寻址上传存储的测试"""
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from blob_store import LocalBlobStore
+from storage import UploadStorage, fcntl
+
+PDF = b"%PDF-1.4\n"
+
+
+class SlowBlobStore(LocalBlobStore):
+    """put_file 很慢的本机存储，模拟上传到对象存储"""
+
+    def __init__(self, root, delay):
+        super().__init__(root)
+        self.delay = delay
+
+    def put_file(self, key, path):
+        time.sleep(self.delay)
+        super().put_file(key, path)
+
+
+def save_all(storage, contents):
+    results = [None] * len(contents)
+
+    def save(i):
+        results[i] = storage.save(io.BytesIO(contents[i]))
+    threads = [threading.Thread(target=save, args=(i,)) for i in range(len(contents))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_uploads_of_different_files_run_in_parallel(tmp_path):
+    storage = UploadStorage(str(tmp_path), SlowBlobStore(str(tmp_path), delay=0.3))
+    start = time.monotonic()
+    results = save_all(storage, [PDF + bytes([i]) for i in range(4)])
+    assert time.monotonic() - start < 0.9
+    assert len({digest for digest, _ in results}) == 4
+
+
+def test_concurrent_uploads_of_the_same_file_are_counted_once_each(tmp_path):
+    storage = UploadStorage(str(tmp_path), SlowBlobStore(str(tmp_path), delay=0.05))
+    results = save_all(storage, [PDF] * 4)
+    digest, path = results[0]
+    assert {result[0] for result in results} == {digest}
+
+    for remaining in (3, 2, 1):
+        assert storage.release(digest) == remaining
+    assert storage.blob_store.exists(storage.key_for(digest))
+    assert storage.release(digest) == 0
+    assert not storage.blob_store.exists(storage.key_for(digest))
+    assert storage._digest_locks == {}
+
+
+def test_sidecars_are_only_written_for_held_files(tmp_path):
+    storage = UploadStorage(str(tmp_path))
+    unknown = "f" * 64
+    assert storage.write_sidecar(unknown, "text", "legacy") is False
+    assert storage.read_sidecar(unknown, "text") is None
+    assert not (tmp_path / "ff").exists()
+
+    digest, _ = storage.save(io.BytesIO(PDF))
+    assert storage.write_sidecar(digest, "text", "hello") is True
+    assert storage.read_sidecar(digest, "text") == "hello"
+
+    storage.release(digest)
+    assert storage.read_sidecar(digest, "text") is None
+    assert storage.write_sidecar(digest, "text", "hello") is False
+    assert storage.blob_store.list(storage.key_for(digest, ".")) == []
+
+
+def test_refs_file_is_removed_when_the_count_reaches_zero(tmp_path):
+    storage = UploadStorage(str(tmp_path))
+    digest, _ = storage.save(io.BytesIO(PDF))
+    refs_path = storage.path_for(digest, ".refs")
+    storage.acquire(digest)
+    assert open(refs_path).read() == "2"
+
+    assert storage.release(digest) == 1
+    assert open(refs_path).read() == "1"
+    assert storage.release(digest) == 0
+    assert not os.path.exists(refs_path)
+
+    # 再次上传相同内容重新从 1 开始计数
+    storage.save(io.BytesIO(PDF))
+    assert open(refs_path).read() == "1"
+
+
+@pytest.mark.skipif(fcntl is None, reason="needs fcntl file locks")
+def test_refs_lock_retries_when_the_locked_file_was_removed(tmp_path):
+    storage = UploadStorage(str(tmp_path))
+    digest, _ = storage.save(io.BytesIO(PDF))
+    refs_path = storage.path_for(digest, ".refs")
+
+    # 模拟另一个进程：持有文件锁时把计数释放到 0 并删除计数文件
+    other = open(refs_path, 'a+')
+    fcntl.flock(other, fcntl.LOCK_EX)
+    acquiring = threading.Thread(target=storage.acquire, args=(digest,))
+    acquiring.start()
+    time.sleep(0.1)
+    os.remove(refs_path)
+    fcntl.flock(other, fcntl.LOCK_UN)
+    other.close()
+    acquiring.join(5)
+
+    # 计数写到了路径上新的文件里，而不是已删除的 inode
+    assert open(refs_path).read() == "1"
@@ -0,0 +1,138 @@
+"""流式上传的测试：大小上限、文件类型检查和中止时的清理"""
+import io
+import os
+
+import pytest
+from flask import Flask, request
+
+from storage import UploadStorage, InvalidFileContent, SIGNATURE_WINDOW
+from upload_stream import receive_upload, UploadError, MAX_FIELD_BYTES
+
+PDF = b"%PDF-1.4\n" + b"0" * 4096
+ALLOWED = {'pdf'}
+BOUNDARY = "test-boundary"
+
+app = Flask(__name__)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return UploadStorage(str(tmp_path))
+
+
+def receive(storage, data, max_bytes=1024 * 1024):
+    with app.test_request_context('/', method='POST', data=data, content_type='multipart/form-data'):
+        return receive_upload(request, storage, max_bytes, ALLOWED)
+
+
+def receive_raw(storage, body):
+    content_type = f'multipart/form-data; boundary={BOUNDARY}'
+    with app.test_request_context('/', method='POST', data=body, content_type=content_type):
+        return receive_upload(request, storage, 1024 * 1024, ALLOWED)
+
+
+def stored_files(storage):
+    """存储目录中除引用计数以外的所有文件"""
+    found = []
+    for directory, _, files in os.walk(storage.root):
+        found.extend(os.path.join(directory, name) for name in files if not name.endswith('.refs'))
+    return found
+
+
+def test_upload_is_stored(storage):
+    fields, upload = receive(storage, {'user_id': 'u1', 'file': (io.BytesIO(PDF), 'cv.pdf')})
+    assert fields == {'user_id': 'u1'}
+    assert upload['size'] == len(PDF)
+    with open(upload['filepath'], 'rb') as f:
+        assert f.read() == PDF
+
+
+def test_too_large_is_rejected_with_413(storage):
+    with pytest.raises(UploadError) as excinfo:
+        receive(storage, {'file': (io.BytesIO(PDF), 'cv.pdf')}, max_bytes=1024)
+    assert excinfo.value.status_code == 413
+    assert stored_files(storage) == []
+
+
+def test_wrong_extension_is_rejected_with_415(storage):
+    with pytest.raises(UploadError) as excinfo:
+        receive(storage, {'file': (io.BytesIO(PDF), 'cv.docx')})
+    assert excinfo.value.status_code == 415
+    assert stored_files(storage) == []
+
+
+def test_wrong_content_is_rejected_with_415(storage):
+    with pytest.raises(UploadError) as excinfo:
+        receive(storage, {'file': (io.BytesIO(b"MZ" + b"0" * 4096), 'cv.pdf')})
+    assert excinfo.value.status_code == 415
+    assert stored_files(storage) == []
+
+
+def test_signature_must_be_in_the_first_bytes_of_the_file(storage):
+    writer = storage.open_writer('.pdf')
+    with pytest.raises(InvalidFileContent):
+        writer.write(b"x" * (SIGNATURE_WINDOW * 2))
+        writer.write(b"%PDF-1.4\n")
+    writer.abort()
+
+
+def test_signature_split_across_chunks_is_accepted(storage):
+    writer = storage.open_writer('.pdf')
+    writer.write(b"\n" * 10 + b"%PD")
+    writer.write(b"F-1.4\n")
+    digest, path = writer.commit()
+    assert os.path.exists(path)
+
+
+def multipart(*parts):
+    """按给定顺序编码 multipart 请求体，parts 为 (字段名, 文件名或None, 内容)"""
+    body = b""
+    for name, filename, content in parts:
+        disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else '')
+        body += f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n\r\n".encode() + content + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+def test_file_before_fields_is_accepted(storage):
+    fields, upload = receive_raw(storage, multipart(('file', 'cv.pdf', PDF), ('user_id', None, b'u1')))
+    assert fields == {'user_id': 'u1'}
+    assert upload['size'] == len(PDF)
+
+
+def test_field_too_large_after_the_file_releases_the_upload(storage):
+    body = multipart(('file', 'cv.pdf', PDF), ('user_id', None, b'u' * (MAX_FIELD_BYTES + 1)))
+    with pytest.raises(UploadError) as excinfo:
+        receive_raw(storage, body)
+    assert excinfo.value.status_code == 413
+    assert stored_files(storage) == []
+
+
+def test_storage_error_cleans_up_and_propagates(storage, monkeypatch):
+    def fail(key, path):
+        raise OSError("bucket unavailable")
+    monkeypatch.setattr(storage.blob_store, 'put_file', fail)
+
+    with pytest.raises(OSError):
+        receive(storage, {'file': (io.BytesIO(PDF), 'cv.pdf')})
+    assert stored_files(storage) == []
+
+
+class DisconnectingStream(io.BytesIO):
+    """读完给定数据后像客户端断开一样抛出 OSError"""
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if not data:
+            raise OSError("client disconnected")
+        return data
+
+
+def test_disconnect_after_the_file_releases_the_upload(storage):
+    body = multipart(('file', 'cv.pdf', PDF), ('user_id', None, b'u1'))
+    partial = body[:body.index(b'u1')]
+    content_type = f'multipart/form-data; boundary={BOUNDARY}'
+    with app.test_request_context('/', method='POST', input_stream=DisconnectingStream(partial),
+                                  content_type=content_type, content_length=len(body)):
+        with pytest.raises(OSError):
+            receive_upload(request, storage, 1024 * 1024, ALLOWED)
+    assert stored_files(storage) == []
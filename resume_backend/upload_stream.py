@@ -0,0 +1,130 @@
+"""流式接收 multipart 上传
+
+不经过 request.files（Werkzeug 会先把整个 multipart 请求体缓冲下来），而是按固定大小分块读取
+请求流，用 Werkzeug 的 sans-IO MultipartDecoder 解析，文件部分直接交给存储层的写入器：
+写盘、计算哈希、检查 PDF 文件头在同一遍中完成，超过大小上限时立即中止并返回 413。
+"""
+import os
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, Field, File, Data, Epilogue, NeedData
+from werkzeug.utils import secure_filename
+
+from storage import UploadTooLarge, InvalidFileContent
+
+# 每次从请求流读取的字节数
+READ_CHUNK_SIZE = 64 * 1024
+
+# 普通表单字段（user_id 等）的大小上限
+MAX_FIELD_BYTES = 64 * 1024
+
+
+class UploadError(Exception):
+    """上传请求无效，带有应返回的 HTTP 状态码"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def receive_upload(request, storage, max_bytes, allowed_extensions, file_field='file'):
+    """流式读取 multipart 请求，把文件保存到存储中
+
+    Args:
+        request: Flask 请求对象（调用前不能访问 request.form / request.files）
+        storage: UploadStorage 实例
+        max_bytes: 文件大小上限
+        allowed_extensions: 允许的扩展名集合（不带点）
+        file_field: 文件字段名
+
+    Returns:
+        (表单字段字典, 上传信息)，上传信息包含 filename / file_hash / filepath / size，
+        请求中没有文件字段时为None
+
+    Raises:
+        UploadError: 文件为空、类型不允许、内容与类型不符或超过大小上限
+        其他异常（如存储后端的错误）清理后原样抛出
+    """
+    mimetype, options = parse_options_header(request.headers.get('Content-Type', ''))
+    if mimetype != 'multipart/form-data' or not options.get('boundary'):
+        return {}, None
+
+    decoder = MultipartDecoder(options['boundary'].encode('latin-1'))
+    fields = {}
+    upload = None
+    writer = None
+    part = None  # 当前部分：('field', 名称, 缓冲) / ('file', 文件名) / ('skip',)
+
+    try:
+        stream = request.stream
+        finished = False
+        while not finished:
+            chunk = stream.read(READ_CHUNK_SIZE)
+            decoder.receive_data(chunk or None)
+
+            event = decoder.next_event()
+            while not isinstance(event, NeedData):
+                if isinstance(event, Epilogue):
+                    finished = True
+                    break
+
+                if isinstance(event, File):
+                    filename = secure_filename(event.filename or '')
+                    if event.name != file_field or upload is not None or writer is not None:
+                        part = ('skip',)
+                    elif not filename:
+                        raise UploadError('No selected file', 400)
+                    elif '.' not in filename or filename.rsplit('.', 1)[1].lower() not in allowed_extensions:
+                        raise UploadError('Only PDF files are allowed', 415)
+                    else:
+                        writer = storage.open_writer(os.path.splitext(filename)[1].lower(), max_bytes)
+                        part = ('file', filename)
+                elif isinstance(event, Field):
+                    part = ('field', event.name, bytearray())
+                elif isinstance(event, Data):
+                    if part[0] == 'file':
+                        writer.write(event.data)
+                        if not event.more_data:
+                            file_hash, filepath = writer.commit()
+                            upload = {
+                                'filename': part[1],
+                                'file_hash': file_hash,
+                                'filepath': filepath,
+                                'size': writer.size
+                            }
+                            writer = None
+                    elif part[0] == 'field':
+                        part[2].extend(event.data)
+                        if len(part[2]) > MAX_FIELD_BYTES:
+                            raise UploadError('Form field too large', 413)
+                        if not event.more_data:
+                            fields[part[1]] = part[2].decode('utf-8', 'replace')
+
+                event = decoder.next_event()
+
+            if not chunk and not finished:
+                raise UploadError('Incomplete multipart request', 400)
+    except BaseException as e:
+        # 任何原因中止（包括存储后端的 OSError、客户端断开）都丢弃写了一半的文件，已保存的文件释放引用
+        if writer is not None:
+            writer.abort()
+        if upload is not None:
+            storage.release(upload['file_hash'], os.path.splitext(upload['filename'])[1].lower())
+        if isinstance(e, (UploadError, UploadTooLarge, InvalidFileContent, RequestEntityTooLarge, ValueError)):
+            raise _upload_error(e, max_bytes) from e
+        raise
+
+    return fields, upload
+
+
+def _upload_error(error, max_bytes):
+    """把存储层和 Werkzeug 的异常转换成 UploadError"""
+    if isinstance(error, UploadError):
+        return error
+    if isinstance(error, UploadTooLarge):
+        return UploadError(str(error), 413)
+    if isinstance(error, InvalidFileContent):
+        return UploadError(str(error), 415)
+    if isinstance(error, RequestEntityTooLarge):
+        return UploadError(f'Request exceeds the maximum upload size of {max_bytes} bytes', 413)
+    return UploadError(f'Malformed multipart request: {error}', 400)